@@ -24,6 +24,15 @@ if 'encryption_key' not in st.session_state:
 # Initialize decrypted cache (CRITICAL - must be before any imports of ui.components)
 if 'decrypted_cache' not in st.session_state:
     st.session_state.decrypted_cache = {}
+# Salinan lokal pesan per percakapan (ConversationStore)
+if 'conversation_stores' not in st.session_state:
+    st.session_state.conversation_stores = {}
+# Subscription realtime (pesan baru di-push, bukan polling)
+if 'realtime' not in st.session_state:
+    st.session_state.realtime = None
+# Kontak (orang yang pernah bertukar pesan), dimuat per halaman
+if 'contacts' not in st.session_state:
+    st.session_state.contacts = None
 
 def main():
     """Main application entry point."""
@@ -0,0 +1,23 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Benchmark tidak butuh kredensial asli: pakai .env jika ada, selain itu nilai dummy
+load_dotenv()
+for _name, _value in (
+    ('SUPABASE_URL', 'http://localhost:54321'),
+    ('SUPABASE_KEY', 'benchmark'),
+    ('DATABASE_MASTER_KEY', 'benchmark-master-key'),
+    ('HMAC_SECRET_KEY', 'benchmark-hmac-key'),
+):
+    os.environ.setdefault(_name, _value)
+
+# Selalu pakai backend SQLite in-memory agar benchmark tidak menyentuh database asli
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+
+# Lampiran besar ke direktori sementara, bukan ./blobs
+_blob_root = tempfile.mkdtemp(prefix='cryptomessenger-bench-')
+os.environ['BLOB_BACKEND'] = 'local'
+os.environ['BLOB_LOCAL_PATH'] = os.path.join(_blob_root, 'store')
+os.environ['BLOB_CACHE_PATH'] = os.path.join(_blob_root, 'cache')
@@ -0,0 +1,62 @@
+"""Benchmark: CPU saved per message by dropping the HMAC pass (envelope v3).
+
+Envelope v2 verified an HMAC-SHA256 over the whole stored string on every
+read/write on top of the ChaCha20-Poly1305 tag. v3 binds row metadata as
+associated data instead, so the HMAC pass is pure savings.
+
+    python -m benchmarks.aead_binding
+"""
+import os
+import time
+
+import benchmarks  # noqa: F401  (dummy env)
+from services.crypto_service import (
+    ENVELOPE_TEXT, ENVELOPE_IMAGE,
+    message_binding, seal_envelope, open_envelope,
+    seal_file_envelope, open_file_stream,
+    generate_hmac, verify_hmac,
+)
+
+KEY = 'benchmark-key'
+BINDING = message_binding('00000000-0000-0000-0000-000000000000', 'sender', 'receiver', 'text')
+CASES = [
+    ('text 200 B', ENVELOPE_TEXT, 200),
+    ('text 50 KB', ENVELOPE_TEXT, 50 * 1024),
+    ('image 1 MB', ENVELOPE_IMAGE, 1024 * 1024),
+    ('file 10 MB', None, 10 * 1024 * 1024),
+    ('file 100 MB', None, 100 * 1024 * 1024),
+]
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'payload':<14}{'open (v3)':>12}{'HMAC pass':>12}{'write+read saved':>20}")
+    for name, payload_type, size in CASES:
+        payload = os.urandom(size)
+        repeat = 50 if size < 1024 * 1024 else 3
+
+        if payload_type is None:
+            content = seal_file_envelope('file.bin', payload, KEY, BINDING)
+            open_time = _best_of(lambda: [c for c in open_file_stream(content, '', BINDING)[1]], repeat)
+        else:
+            content = seal_envelope(payload_type, payload, BINDING)
+            open_time = _best_of(lambda: open_envelope(content, '', BINDING), repeat)
+
+        # v2 menghitung HMAC saat tulis dan memverifikasinya lagi setiap dibaca
+        mac = generate_hmac(content)
+        hmac_time = _best_of(lambda: verify_hmac(content, mac), repeat)
+
+        print(f"{name:<14}{open_time * 1000:>10.3f}ms{hmac_time * 1000:>10.3f}ms"
+              f"{2 * hmac_time * 1000:>16.3f}ms ({hmac_time / (open_time + hmac_time) * 100:.0f}% of v2 read)")
+
+
+if __name__ == '__main__':
+    main()
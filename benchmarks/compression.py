@@ -0,0 +1,126 @@
+"""Benchmark: compression ratios per message type before encryption.
+
+Sends representative payloads through Message.send_text, Message.send_file and
+hide_message_in_image against the in-memory SQLite backend, then prints the stored size
+vs. the uncompressed size (and the smallest square carrier for stego).
+
+    python -m benchmarks.compression
+    COMPRESSION=zlib python -m benchmarks.compression
+"""
+import io
+import json
+import os
+import random
+import time
+
+import numpy as np
+from PIL import Image
+
+import benchmarks  # noqa: F401  (dummy env)
+from models.message import Message
+from models.outbox import outbox
+from config.settings import Settings
+from services.repository import message_repository
+from services.crypto_service import (
+    stego_payload_size, hide_message_in_image, STEGO_OVERHEAD,
+)
+
+KEY = 'benchmark-key'
+WORDS = ('halo apa kabar besok rapat jam sembilan tolong kirim laporan '
+         'proyek minggu ini sudah selesai belum nanti saya cek lagi').split()
+
+
+def _chat(rng, length):
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(WORDS))
+    return ' '.join(words)[:length]
+
+
+def _log(lines):
+    return ''.join(
+        f'2026-10-17T10:{i // 60 % 60:02d}:{i % 60:02d}Z INFO api request_id={i:08x} '
+        f'path=/messages status=200 duration_ms={i % 97}\n'
+        for i in range(lines)
+    ).encode()
+
+
+def _document(rows):
+    return json.dumps([
+        {'id': i, 'name': f'user-{i}', 'email': f'user{i}@example.com', 'active': i % 3 == 0}
+        for i in range(rows)
+    ], indent=2).encode()
+
+
+def _jpeg(size):
+    output = io.BytesIO()
+    pixels = np.random.default_rng(0).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def _stored_size():
+    # Baris terakhir yang dikirim di percakapan benchmark (ciphertext inline maupun di blob store)
+    outbox().flush()
+    row = message_repository().list_before('a', 'b', None, 1)[0]
+    return row['content_size']
+
+
+def main():
+    rng = random.Random(0)
+    print(f"COMPRESSION={Settings.COMPRESSION}\n")
+    totals = {}
+    print(f"{'case':<28}{'input':>12}{'stored':>12}{'uncompressed':>14}{'saved':>8}{'ms':>9}")
+
+    def report(label, name, size, send, args):
+        original = Settings.COMPRESSION
+        Settings.COMPRESSION = 'none'
+        send(*args)
+        baseline = _stored_size()
+        Settings.COMPRESSION = original
+
+        start = time.perf_counter()
+        send(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        stored = _stored_size()
+        total = totals.setdefault(label, [0, 0])
+        total[0] += stored
+        total[1] += baseline
+        print(f"{name:<28}{size:>12,}{stored:>12,}{baseline:>14,}{1 - stored / baseline:>8.0%}{elapsed:>9.1f}")
+
+    for length in (80, 500, 5000, 50000):
+        text = _chat(rng, length)
+        report('text', f'text {length} chars', length, Message.send_text, ('a', 'b', text, KEY))
+
+    files = [
+        ('file log 5 MB', 'server.log', _log(50000)),
+        ('file json 2 MB', 'export.json', _document(15000)),
+        ('file jpeg 1 MB', 'photo.jpg', _jpeg(700)),
+        ('file random 4 MB', 'backup.bin', os.urandom(4 * 1024 * 1024)),
+    ]
+    for name, filename, data in files:
+        report('file', name, len(data), Message.send_file, ('a', 'b', data, filename, KEY))
+
+    print(f"\n{'stego message':<28}{'payload':>12}{'uncompressed':>14}{'min carrier':>14}{'before':>12}")
+    for length in (1000, 10000, 50000):
+        text = _chat(rng, length)
+        payload = stego_payload_size(text)
+        uncompressed = len(text.encode('utf-8')) + STEGO_OVERHEAD
+        side = int((payload * 8 / 3) ** 0.5) + 1
+        side_before = int((uncompressed * 8 / 3) ** 0.5) + 1
+        carrier = io.BytesIO()
+        Image.new('RGB', (side, side)).save(carrier, format='PNG')
+        hide_message_in_image(carrier.getvalue(), text, KEY)
+        total = totals.setdefault('stego', [0, 0])
+        total[0] += payload
+        total[1] += uncompressed
+        print(f"{f'{length} chars':<28}{payload:>12,}{uncompressed:>14,}{f'{side}x{side}':>14}{f'{side_before}x{side_before}':>12}")
+
+    # Di aplikasi, angka yang sama tersedia lewat compression_metrics()
+    print("\nRasio per tipe pesan (stored / uncompressed):")
+    for label, (stored, baseline) in totals.items():
+        print(f"  {label:<8} {stored / baseline:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: sidebar contact page from the conversations summary vs scanning messages.
+
+Seeds the in-memory SQLite backend with messages (and their summary rows, as
+Message.send_* records them), then times one sidebar page for the busiest
+user: one indexed query on `conversations` against scanning that user's
+messages until a page of distinct peers is found, and against the full scan
+needed for per-peer message counts.
+
+    python -m benchmarks.conversations
+    python -m benchmarks.conversations --users 500 --messages 200000
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import benchmarks  # noqa: F401  (dummy env)
+from services.repository import message_repository, conversation_repository
+
+PAGE = 20
+SCAN_BATCH = 200
+COLUMNS = 'id,sender_id,receiver_id,created_at,message_type'
+
+
+def _seed(users, messages):
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    # Sebagian kecil user sangat aktif, seperti percakapan sungguhan
+    weights = [1 / (rank + 1) for rank in range(users)]
+    for i in range(messages):
+        sender, receiver = rng.choices(user_ids, weights, k=2)
+        if sender == receiver:
+            continue
+        row = message_repository().insert({
+            'id': str(uuid.uuid4()),
+            'sender_id': sender,
+            'receiver_id': receiver,
+            'message_type': 'text',
+            'encrypted_content': 'x',
+            'created_at': (start + timedelta(seconds=i)).isoformat(timespec='microseconds'),
+        })
+        conversation_repository().record_message(sender, receiver, 'text', row['created_at'])
+    return user_ids[0]
+
+
+def _scan_page(user_id):
+    # Tanpa ringkasan: pindai pesan user (terbaru dulu) sampai PAGE kontak berbeda
+    peers, cursor, read = {}, None, 0
+    while len(peers) < PAGE:
+        rows = message_repository().list_user_messages(user_id, cursor, SCAN_BATCH, COLUMNS)
+        read += len(rows)
+        for row in rows:
+            peer = row['receiver_id'] if row['sender_id'] == user_id else row['sender_id']
+            peers.setdefault(peer, row['created_at'])
+        if len(rows) < SCAN_BATCH:
+            break
+        cursor = (rows[-1]['created_at'], rows[-1]['id'])
+    return read
+
+
+def _scan_all(user_id):
+    # Jumlah pesan per kontak butuh seluruh pesan user
+    counts, cursor, read = {}, None, 0
+    while True:
+        rows = message_repository().list_user_messages(user_id, cursor, SCAN_BATCH * 10, COLUMNS)
+        read += len(rows)
+        for row in rows:
+            peer = row['receiver_id'] if row['sender_id'] == user_id else row['sender_id']
+            counts[peer] = counts.get(peer, 0) + 1
+        if len(rows) < SCAN_BATCH * 10:
+            return read
+        cursor = (rows[-1]['created_at'], rows[-1]['id'])
+
+
+def _time_ms(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    user_id = _seed(args.users, args.messages)
+    cases = [
+        ('conversations (1 query)', lambda: len(conversation_repository().list_for_user(user_id, None, PAGE + 1))),
+        ('scan messages, 1 halaman', lambda: _scan_page(user_id)),
+        ('scan messages, + jumlah pesan', lambda: _scan_all(user_id)),
+    ]
+
+    print(f"{args.messages:,} pesan, {args.users} user, halaman {PAGE} kontak (user tersibuk)\n")
+    print(f"{'sumber':<34}{'median ms':>12}{'baris dibaca':>14}")
+    for name, fn in cases:
+        elapsed, rows = _time_ms(fn, args.repeat)
+        print(f"{name:<34}{elapsed:>12.2f}{rows:>14,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Crypto primitive benchmark suite.
+
+    python -m benchmarks.crypto                          # 100 B .. 16 MB
+    python -m benchmarks.crypto --full                   # sampai 200 MB
+    python -m benchmarks.crypto --output baseline.json
+    python -m benchmarks.crypto --compare baseline.json --threshold 0.15
+
+Mode --compare keluar dengan status 1 jika ada primitive yang latency-nya
+naik lebih dari threshold dibanding baseline.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+import benchmarks  # noqa: F401  (dummy env)
+from services.crypto_service import (
+    encrypt_field, decrypt_field,
+    encrypt_for_database, decrypt_from_database,
+    encrypt_text_aes_ctr_hmac, decrypt_text_aes_ctr_hmac,
+    encrypt_text_aes_ctr_bytes, decrypt_text_aes_ctr_bytes,
+    encrypt_file_aes_gcm_bytes, decrypt_file_aes_gcm_bytes,
+    encrypt_file_stream, decrypt_file_stream,
+    encrypt_3des_bytes, decrypt_3des_bytes,
+    hide_message_in_image, extract_message_from_image,
+    _seal_stego_payload, STEGO_SUITE_AES_GCM, STEGO_SUITE_CHACHA20,
+)
+
+KEY = 'benchmark-key'
+PAYLOAD_SIZES = [100, 1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+FULL_PAYLOAD_SIZES = PAYLOAD_SIZES + [200 * 1024 * 1024]
+IMAGE_SIZES = [(256, 256), (1024, 768), (1920, 1080), (3000, 3000)]
+STEGO_MESSAGE_LENGTH = 1000
+MIN_SECONDS = 0.5
+MAX_CALLS = 10000
+
+
+def _text(size: int) -> str:
+    return 'a' * size
+
+
+def _primitives():
+    # name -> setup(size) yang mengembalikan callable tanpa argumen
+    def field_encrypt(size):
+        value = _text(size)
+        return lambda: encrypt_field(value)
+
+    def field_decrypt(size):
+        encrypted = encrypt_field(_text(size))
+        return lambda: decrypt_field(encrypted['encrypted'], encrypted['hmac'])
+
+    def database_encrypt(size):
+        value = _text(size)
+        return lambda: encrypt_for_database(value)
+
+    def database_decrypt(size):
+        encrypted = encrypt_for_database(_text(size))
+        return lambda: decrypt_from_database(encrypted['encrypted'], encrypted['hmac'])
+
+    def aes_ctr_hmac_encrypt(size):
+        value = _text(size)
+        return lambda: encrypt_text_aes_ctr_hmac(value, KEY)
+
+    def aes_ctr_hmac_decrypt(size):
+        encrypted = encrypt_text_aes_ctr_hmac(_text(size), KEY)
+        return lambda: decrypt_text_aes_ctr_hmac(encrypted, KEY)
+
+    def aes_ctr_encrypt(size):
+        value = _text(size)
+        return lambda: encrypt_text_aes_ctr_bytes(value, KEY)
+
+    def aes_ctr_decrypt(size):
+        encrypted = encrypt_text_aes_ctr_bytes(_text(size), KEY)
+        return lambda: decrypt_text_aes_ctr_bytes(encrypted, KEY)
+
+    def aes_gcm_encrypt(size):
+        data = os.urandom(size)
+        return lambda: encrypt_file_aes_gcm_bytes(data, KEY)
+
+    def aes_gcm_decrypt(size):
+        encrypted = encrypt_file_aes_gcm_bytes(os.urandom(size), KEY)
+        return lambda: decrypt_file_aes_gcm_bytes(encrypted, KEY)
+
+    def aes_gcm_stream_encrypt(size):
+        data = os.urandom(size)
+        return lambda: [c for c in encrypt_file_stream([data], KEY)]
+
+    def aes_gcm_stream_decrypt(size):
+        encrypted = b''.join(encrypt_file_stream([os.urandom(size)], KEY))
+        return lambda: [c for c in decrypt_file_stream([encrypted], KEY)]
+
+    def tdes_encrypt(size):
+        value = _text(size)
+        return lambda: encrypt_3des_bytes(value, KEY)
+
+    def tdes_decrypt(size):
+        encrypted = encrypt_3des_bytes(_text(size), KEY)
+        return lambda: decrypt_3des_bytes(encrypted, KEY)
+
+    def stego_payload(suite):
+        def setup(size):
+            value = _text(size)
+            return lambda: _seal_stego_payload(value, KEY, suite)
+        return setup
+
+    return {
+        'field.encrypt': field_encrypt,
+        'field.decrypt': field_decrypt,
+        'database.encrypt': database_encrypt,
+        'database.decrypt': database_decrypt,
+        'text.aes_ctr_hmac.encrypt': aes_ctr_hmac_encrypt,
+        'text.aes_ctr_hmac.decrypt': aes_ctr_hmac_decrypt,
+        'text.aes_ctr.encrypt': aes_ctr_encrypt,
+        'text.aes_ctr.decrypt': aes_ctr_decrypt,
+        'file.aes_gcm.encrypt': aes_gcm_encrypt,
+        'file.aes_gcm.decrypt': aes_gcm_decrypt,
+        'file.aes_gcm_stream.encrypt': aes_gcm_stream_encrypt,
+        'file.aes_gcm_stream.decrypt': aes_gcm_stream_decrypt,
+        '3des.encrypt': tdes_encrypt,
+        '3des.decrypt': tdes_decrypt,
+        'stego_payload.aes_gcm.encrypt': stego_payload(STEGO_SUITE_AES_GCM),
+        'stego_payload.chacha20.encrypt': stego_payload(STEGO_SUITE_CHACHA20),
+    }
+
+
+def _measure(func) -> dict:
+    # Ulangi sampai minimal MIN_SECONDS (atau MAX_CALLS), minimal satu kali
+    func()  # warm-up
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while calls < 1 or (elapsed < MIN_SECONDS and calls < MAX_CALLS):
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return {'calls': calls, 'latency_us': elapsed / calls * 1e6}
+
+
+def _result(name: str, size: int, measured: dict) -> dict:
+    seconds = measured['latency_us'] / 1e6
+    return {
+        'name': name,
+        'size': size,
+        'calls': measured['calls'],
+        'latency_us': round(measured['latency_us'], 3),
+        'throughput_mbps': round(size / seconds / 1024 / 1024, 3) if seconds else None
+    }
+
+
+def _stego_results(image_sizes) -> list:
+    rng = np.random.default_rng(0)
+    message = _text(STEGO_MESSAGE_LENGTH)
+    results = []
+    for width, height in image_sizes:
+        output = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), 'RGB').save(output, format='PNG')
+        carrier = output.getvalue()
+        stego = hide_message_in_image(carrier, message, KEY)
+
+        # size = jumlah byte pixel yang diproses
+        pixel_bytes = width * height * 3
+        for name, func in (
+            (f'stego.hide.{width}x{height}', lambda: hide_message_in_image(carrier, message, KEY)),
+            (f'stego.extract.{width}x{height}', lambda: extract_message_from_image(stego, KEY)),
+        ):
+            results.append(_result(name, pixel_bytes, _measure(func)))
+            _print_row(results[-1])
+    return results
+
+
+def _format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:g} {unit}" if unit == 'B' else f"{size:.0f} {unit}"
+        size /= 1024
+
+
+def _print_row(result: dict):
+    print(f"{result['name']:<34}{_format_size(result['size']):>10}{result['calls']:>8}"
+          f"{result['latency_us']:>16.1f}{result['throughput_mbps'] or 0:>12.1f}")
+
+
+def run(sizes, primitives=None) -> dict:
+    print(f"{'primitive':<34}{'size':>10}{'calls':>8}{'latency (us)':>16}{'MB/s':>12}")
+    results = []
+    for name, setup in _primitives().items():
+        if primitives and not any(name.startswith(p) for p in primitives):
+            continue
+        for size in sizes:
+            results.append(_result(name, size, _measure(setup(size))))
+            _print_row(results[-1])
+
+    if not primitives or any('stego.'.startswith(p) or p.startswith('stego.') for p in primitives):
+        results.extend(_stego_results(IMAGE_SIZES))
+
+    import cryptography
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cryptography': cryptography.__version__,
+            'numpy': np.__version__
+        },
+        'results': results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    # Regresi = latency naik lebih dari threshold (mis. 0.15 = 15%)
+    previous = {(r['name'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'primitive':<34}{'size':>10}{'baseline (us)':>16}{'current (us)':>16}{'change':>10}")
+    for result in current['results']:
+        base = previous.get((result['name'], result['size']))
+        if not base:
+            continue
+        change = result['latency_us'] / base['latency_us'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{result['name']:<34}{_format_size(result['size']):>10}{base['latency_us']:>16.1f}"
+              f"{result['latency_us']:>16.1f}{change * 100:>9.1f}%{flag}")
+        if flag:
+            regressions.append({**result, 'baseline_latency_us': base['latency_us'], 'change': change})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark primitive kriptografi CryptoMessenger')
+    parser.add_argument('--full', action='store_true', help='sertakan payload 200 MB')
+    parser.add_argument('--only', nargs='*', help='prefix nama primitive, mis. file 3des stego')
+    parser.add_argument('--output', help='simpan hasil ke file JSON')
+    parser.add_argument('--compare', help='file JSON baseline untuk deteksi regresi')
+    parser.add_argument('--threshold', type=float, default=0.15, help='batas kenaikan latency (default 0.15)')
+    args = parser.parse_args(argv)
+
+    current = run(FULL_PAYLOAD_SIZES if args.full else PAYLOAD_SIZES, args.only)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nHasil disimpan ke {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresi melebihi {args.threshold * 100:.0f}%")
+            return 1
+        print("\nTidak ada regresi")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
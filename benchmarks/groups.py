@@ -0,0 +1,81 @@
+"""Benchmark: sending one file to N people, per-recipient sends vs a group send.
+
+Sends the same payload to every member once with N Message.send_file calls
+(each encrypting and storing its own copy) and once with Message.send_group_file
+(encrypted once under a random content key, stored once, one small wrapped key
+per member), against the in-memory SQLite backend and a temporary local blob
+store. Prints send time and bytes stored in rows and blobs.
+
+    python -m benchmarks.groups
+    python -m benchmarks.groups --members 25 --size-mb 50
+"""
+import argparse
+import os
+import time
+
+import benchmarks  # noqa: F401  (dummy env)
+from config.settings import Settings
+from models.group import Group
+from models.message import Message
+from models.outbox import outbox
+from services.repository import get_repositories
+
+KEY = 'benchmark-key'
+
+
+def _blob_bytes():
+    total = 0
+    for root, _, files in os.walk(Settings.BLOB_LOCAL_PATH):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def _row_bytes():
+    database = get_repositories()[1].database
+    rows = database.query(
+        "SELECT COALESCE(SUM(LENGTH(encrypted_content) + COALESCE(LENGTH(encrypted_key), 0)"
+        " + COALESCE(LENGTH(encrypted_preview), 0)), 0) AS size, COUNT(*) AS count FROM messages"
+    )
+    return rows[0]['size'], rows[0]['count']
+
+
+def _measure(send):
+    rows_before, count_before = _row_bytes()
+    blobs_before = _blob_bytes()
+    start = time.perf_counter()
+    send()
+    outbox().flush()
+    elapsed = (time.perf_counter() - start) * 1000
+    rows_after, count_after = _row_bytes()
+    return elapsed, count_after - count_before, rows_after - rows_before, _blob_bytes() - blobs_before
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', type=int, default=10)
+    parser.add_argument('--size-mb', type=float, default=20)
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    sender = 'sender'
+    members = [f'member-{i}' for i in range(args.members - 1)]
+    ok, group = Group.create(sender, 'benchmark', members)
+    if not ok:
+        raise SystemExit(group)
+
+    def per_recipient():
+        for member in [sender] + members:
+            Message.send_file(sender, member, payload, 'payload.bin', KEY)
+
+    def group_send():
+        Message.send_group_file(sender, group['id'], payload, 'payload.bin', KEY)
+
+    print(f"File {args.size_mb:g} MB ke {args.members} anggota (termasuk pengirim)\n")
+    print(f"{'mode':<26}{'ms':>10}{'baris':>8}{'isi baris':>14}{'blob':>14}")
+    for name, send in (('send_file x N', per_recipient), ('send_group_file', group_send)):
+        elapsed, count, row_bytes, blob_bytes = _measure(send)
+        print(f"{name:<26}{elapsed:>10.0f}{count:>8}{row_bytes:>14,}{blob_bytes:>14,}")
+
+
+if __name__ == '__main__':
+    main()
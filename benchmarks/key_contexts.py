@@ -0,0 +1,90 @@
+"""Microbenchmark: cached key contexts vs. per-call key derivation.
+
+    python -m benchmarks.key_contexts
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305, AESGCM
+
+import benchmarks  # noqa: F401  (dummy env)
+from services import crypto_service
+from services.crypto_service import (
+    encrypt_field, decrypt_field,
+    encrypt_for_database, decrypt_from_database,
+    encrypt_file_aes_gcm, decrypt_file_aes_gcm,
+)
+
+ITERATIONS = 20000
+USER_KEY = 'MyEncryptionKey123'
+
+
+def _per_call_us(func, iterations: int = ITERATIONS) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+# Implementasi lama: derive key + buat AEAD object di setiap pemanggilan
+def _legacy_encrypt_field(value: str) -> dict:
+    key = hashlib.sha256(crypto_service._DATABASE_MASTER_KEY.encode('utf-8')).digest()
+    nonce = os.urandom(12)
+    ciphertext = ChaCha20Poly1305(key).encrypt(nonce, value.encode('utf-8'), None)
+    return {
+        'encrypted': base64.b64encode(nonce + ciphertext).decode('utf-8'),
+        'hmac': hmac.new(crypto_service._HMAC_KEY, value.encode('utf-8'), hashlib.sha256).hexdigest()
+    }
+
+
+def _legacy_decrypt_field(encrypted_b64: str) -> str:
+    key = hashlib.sha256(crypto_service._DATABASE_MASTER_KEY.encode('utf-8')).digest()
+    combined = base64.b64decode(encrypted_b64)
+    return ChaCha20Poly1305(key).decrypt(combined[:12], combined[12:], None).decode('utf-8')
+
+
+def _legacy_encrypt_file(data: bytes, user_key: str) -> str:
+    key = hashlib.sha256(user_key.encode('utf-8')).digest()
+    nonce = os.urandom(12)
+    return base64.b64encode(nonce + AESGCM(key).encrypt(nonce, data, None)).decode('utf-8')
+
+
+def main():
+    value = 'user@example.com'
+    payload = os.urandom(256)
+
+    field = encrypt_field(value)
+    db_row = encrypt_for_database(value)
+    file_blob = encrypt_file_aes_gcm(payload, USER_KEY)
+    legacy_field = _legacy_encrypt_field(value)
+
+    cases = [
+        ('encrypt_field', lambda: _legacy_encrypt_field(value), lambda: encrypt_field(value)),
+        ('decrypt_field', lambda: _legacy_decrypt_field(legacy_field['encrypted']),
+         lambda: decrypt_field(field['encrypted'], field['hmac'])),
+        ('encrypt_for_database', None, lambda: encrypt_for_database(value)),
+        ('decrypt_from_database', None, lambda: decrypt_from_database(db_row['encrypted'], db_row['hmac'])),
+        ('encrypt_file_aes_gcm (256 B)', lambda: _legacy_encrypt_file(payload, USER_KEY),
+         lambda: encrypt_file_aes_gcm(payload, USER_KEY)),
+        ('decrypt_file_aes_gcm (256 B)', None, lambda: decrypt_file_aes_gcm(file_blob, USER_KEY)),
+    ]
+
+    print(f"{'operation':<32}{'per-call (legacy)':>20}{'cached':>12}{'saving':>10}")
+    for name, legacy, current in cases:
+        current_us = _per_call_us(current)
+        if legacy is None:
+            print(f"{name:<32}{'-':>20}{current_us:>10.2f}us{'-':>10}")
+            continue
+        legacy_us = _per_call_us(legacy)
+        saving = (1 - current_us / legacy_us) * 100
+        print(f"{name:<32}{legacy_us:>18.2f}us{current_us:>10.2f}us{saving:>9.1f}%")
+
+    info = crypto_service._user_key_context.cache_info()
+    print(f"\nuser key context cache: hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
+
+
+if __name__ == '__main__':
+    main()
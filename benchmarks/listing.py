@@ -0,0 +1,59 @@
+"""Benchmark: bytes per conversation render, select('*') vs metadata listing.
+
+Builds a media-heavy conversation through the real Message.send_* methods
+(in-memory SQLite backend) and compares the JSON PostgREST would return for one page
+with every column against Message.LISTING_COLUMNS plus the batched text
+content fetch ChatArea does on top of it.
+
+    python -m benchmarks.listing
+"""
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+import benchmarks  # noqa: F401  (dummy env)
+from models.message import Message
+from models.outbox import outbox
+from services.repository import message_repository
+
+KEY = 'benchmark-key'
+
+
+def _payload_bytes(rows, columns):
+    if columns != '*':
+        rows = [{column: row.get(column) for column in columns.split(',')} for row in rows]
+    return len(json.dumps(rows))
+
+
+def main():
+    carrier = io.BytesIO()
+    pixels = np.random.default_rng(0).integers(0, 256, (1024, 768, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(carrier, format='PNG')
+
+    for i in range(40):
+        Message.send_text('a', 'b', f'pesan ke-{i}: sampai jumpa besok di kantor', KEY)
+    for i in range(6):
+        Message.send_image_steganography('a', 'b', carrier.getvalue(), f'rahasia {i}', KEY)
+    for i in range(4):
+        Message.send_file('a', 'b', os.urandom(2 * 1024 * 1024), f'laporan-{i}.pdf', KEY)
+
+    outbox().flush()
+    rows = message_repository().list_conversation('a', 'b')
+    full = _payload_bytes(rows, '*')
+    listing = _payload_bytes(rows, Message.LISTING_COLUMNS)
+    texts = _payload_bytes([r for r in rows if r['message_type'] == 'text'], 'id,encrypted_content')
+
+    print(f"{len(rows)} pesan (40 teks, 6 gambar 1024x768, 4 file 2 MB)\n")
+    print(f"{'query':<44}{'bytes':>14}")
+    print(f"{'select(*) - per rerun sebelumnya':<44}{full:>14,}")
+    print(f"{'listing metadata':<44}{listing:>14,}")
+    print(f"{'+ isi teks (in_, sekali per pesan)':<44}{texts:>14,}")
+    print(f"\nPengurangan: {full / (listing + texts):,.0f}x pada render pertama, "
+          f"{full / listing:,.0f}x pada rerun berikutnya")
+
+
+if __name__ == '__main__':
+    main()
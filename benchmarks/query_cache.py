@@ -0,0 +1,97 @@
+"""Benchmark: round trips per burst of reruns, with and without the query cache.
+
+Replays the read queries of a chat-page rerun (conversation sync, summary row,
+peer lookups, one of them issued twice) for a burst of rapid reruns, as when
+typing or opening expanders, against the in-memory SQLite backend with a
+simulated round trip per query. Every few reruns a message is sent, which
+invalidates the cached `messages` and `conversations` results. Modes: no query
+layer, coalescing only (QUERY_CACHE_TTL_SECONDS=0), and coalescing + TTL cache.
+
+    python -m benchmarks.query_cache
+    python -m benchmarks.query_cache --reruns 50 --latency-ms 80 --interval-ms 100
+"""
+import argparse
+import time
+
+import benchmarks  # noqa: F401  (dummy env)
+from config.settings import Settings
+from models.message import Message
+from models.outbox import outbox
+from services.database_service import QueryCache, run_concurrently
+from services.repository import get_repositories
+
+KEY = 'benchmark-key'
+
+
+class _Remote:
+    # Query repository dengan round trip jaringan tersimulasi
+    def __init__(self, latency):
+        self.latency = latency
+        self.round_trips = 0
+
+    def __call__(self, fetch):
+        def call():
+            self.round_trips += 1
+            time.sleep(self.latency)
+            return fetch()
+        return call
+
+
+def _rerun(cache, remote, me, peer):
+    users, messages, conversations, _ = get_repositories()
+    since = ('1970-01-01T00:00:00+00:00', None)
+
+    def read(table, key, fetch):
+        fetch = remote(fetch)
+        return cache.get(table, key, fetch) if cache else fetch()
+
+    run_concurrently(
+        lambda: read('messages', ('after', me, peer, since, 100),
+                     lambda: messages.list_after(me, peer, since, 100)),
+        lambda: read('conversations', ('pair', me, peer), lambda: conversations.get(me, peer)),
+        # Header chat dan sidebar sama-sama mencari user lawan bicara
+        lambda: read('users', ('id', peer), lambda: users.find_by_id(peer, 'id,username')),
+        lambda: read('users', ('id', peer), lambda: users.find_by_id(peer, 'id,username')),
+    )
+
+
+def _burst(cache, args):
+    remote = _Remote(args.latency_ms / 1000)
+    start = time.perf_counter()
+    for i in range(args.reruns):
+        if i and i % args.send_every == 0:
+            Message.send_text('bench-peer', 'bench-me', f'pesan ke-{i}', KEY)
+            outbox().flush()
+            if cache:
+                cache.invalidate('messages', 'conversations')
+        _rerun(cache, remote, 'bench-me', 'bench-peer')
+        time.sleep(args.interval_ms / 1000)
+    return remote.round_trips, (time.perf_counter() - start) * 1000 - args.reruns * args.interval_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reruns', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=60)
+    parser.add_argument('--interval-ms', type=float, default=150)
+    parser.add_argument('--send-every', type=int, default=10)
+    args = parser.parse_args()
+
+    Settings.OUTBOX_ENABLED = False
+    print(f"{args.reruns} rerun tiap {args.interval_ms:.0f} ms, round trip {args.latency_ms:.0f} ms, "
+          f"kirim pesan tiap {args.send_every} rerun\n")
+    print(f"{'mode':<22}{'round trip':>12}{'hit':>7}{'gabung':>8}{'query ms':>11}")
+    for name, cache in (
+        ('tanpa cache', None),
+        ('gabung saja (ttl 0)', QueryCache(0, Settings.QUERY_CACHE_MAX_ENTRIES)),
+        (f'cache ttl {Settings.QUERY_CACHE_TTL_SECONDS:g} s',
+         QueryCache(Settings.QUERY_CACHE_TTL_SECONDS, Settings.QUERY_CACHE_MAX_ENTRIES)),
+    ):
+        round_trips, elapsed = _burst(cache, args)
+        hits = cache.hits if cache else 0
+        coalesced = cache.coalesced if cache else 0
+        print(f"{name:<22}{round_trips:>12}{hits:>7}{coalesced:>8}{elapsed:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
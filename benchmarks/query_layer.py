@@ -0,0 +1,182 @@
+"""Benchmark: query-layer cost of the message repository, without network latency.
+
+Seeds the in-memory SQLite backend with many conversations and times the
+queries the chat page issues (latest page, older page, empty incremental sync,
+batched content fetch), plus the SQLite query plan for each. With --check it
+exits with status 1 if a conversation listing or an HMAC user lookup does not
+use its index (full scan or temporary sort), or if the Postgres migrations in
+migrations/ do not create that same index on the same columns, so it can run
+in CI. The Postgres plans themselves are checked manually (see README).
+
+    python -m benchmarks.query_layer
+    python -m benchmarks.query_layer --users 200 --messages 100000
+    python -m benchmarks.query_layer --messages 5000 --repeat 5 --check
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import statistics
+import time
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import benchmarks  # noqa: F401  (dummy env)
+from models.message import Message
+from services.repository import message_repository, user_repository
+
+# Index yang wajib dipakai setiap query (lihat migrations/0003_lookup_indexes.sql)
+EXPECTED_INDEXES = {
+    'list_before': 'messages_conversation_id_idx',
+    'list_after': 'messages_conversation_id_idx',
+    'list_conversation': 'messages_conversation_id_idx',
+    'find_by_email_hmac': 'users_email_hmac_idx',
+    'find_by_username_hmac': 'users_username_hmac_idx',
+}
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+_CREATE_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+ON\s+(\w+)\s*\(([^)]*)\)',
+    re.IGNORECASE
+)
+
+
+def _indexes(sql):
+    # {nama: (tabel, kolom)}; arah ASC/DESC diabaikan (btree bisa dipindai dua arah)
+    sql = re.sub(r'--[^\n]*', '', sql)
+    return {
+        name: (table, tuple(column.split()[0] for column in columns.split(',')))
+        for name, table, columns in _CREATE_INDEX.findall(sql)
+    }
+
+
+def _check_migrations(database):
+    # Index yang diperiksa di query plan SQLite harus juga dibuat migrasi Postgres
+    sqlite = _indexes(';'.join(
+        row['sql'] for row in database.query("SELECT sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    ))
+    postgres = {}
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS, '*.sql'))):
+        with open(path, encoding='utf-8') as handle:
+            postgres.update(_indexes(handle.read()))
+
+    failures = []
+    for index in sorted(set(EXPECTED_INDEXES.values())):
+        if index not in postgres:
+            failures.append(f"migrations/: {index} tidak dibuat")
+        elif postgres[index] != sqlite.get(index):
+            failures.append(f"migrations/: {index} {postgres[index]} berbeda dari sqlite {sqlite.get(index)}")
+        else:
+            table, columns = postgres[index]
+            print(f"  {index:<30} {table} ({', '.join(columns)})")
+    return failures
+
+
+def _seed(repository, users, messages):
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    for i in range(messages):
+        sender, receiver = rng.sample(user_ids, 2)
+        repository.insert({
+            'id': str(uuid.uuid4()),
+            'sender_id': sender,
+            'receiver_id': receiver,
+            'message_type': 'text',
+            'encrypted_content': 'x' * rng.randint(80, 400),
+            'content_size': 0,
+            'created_at': (start + timedelta(seconds=i)).isoformat(timespec='microseconds'),
+        })
+    # Percakapan tersibuk jadi objek pengukuran
+    pairs = repository.database.query(
+        'SELECT sender_id, receiver_id, COUNT(*) AS n FROM messages '
+        'GROUP BY conversation_id ORDER BY n DESC LIMIT 1'
+    )
+    return pairs[0]['sender_id'], pairs[0]['receiver_id']
+
+
+def _plan(database, method, params):
+    # EXPLAIN QUERY PLAN untuk SQL yang dikirim method ke database
+    captured = []
+    query = database.query
+    database.query = lambda sql, values=(): captured.append((sql, values)) or []
+    try:
+        method(*params)
+    finally:
+        database.query = query
+    sql, values = captured[0]
+    return [row['detail'] for row in database.query(f'EXPLAIN QUERY PLAN {sql}', values)]
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--check', action='store_true', help='exit 1 jika ada query tanpa index')
+    args = parser.parse_args()
+
+    repository = message_repository()
+    a, b = _seed(repository, args.users, args.messages)
+    latest, _ = Message.get_messages_page(a, b, columns=Message.LISTING_COLUMNS)
+    newest = Message.page_cursor(latest[-1])
+    oldest = Message.page_cursor(latest[0])
+    ids = [row['id'] for row in latest]
+
+    cases = [
+        ('halaman terbaru', lambda: Message.get_messages_page(a, b, columns=Message.LISTING_COLUMNS)),
+        ('halaman lebih lama', lambda: Message.get_messages_page(a, b, before=oldest, columns=Message.LISTING_COLUMNS)),
+        ('sync tanpa pesan baru', lambda: Message.get_messages_after(a, b, after=newest, columns=Message.LISTING_COLUMNS)),
+        ('isi pesan satu halaman', lambda: repository.get_contents(ids)),
+        ('isi satu pesan', lambda: repository.get_content(ids[-1])),
+    ]
+
+    print(f"{args.messages:,} pesan, {args.users} user, backend sqlite :memory:\n")
+    print(f"{'query':<28}{'median us':>12}")
+    for name, fn in cases:
+        print(f"{name:<28}{_time(fn, args.repeat):>12.1f}")
+
+    # Pastikan setiap query memakai index, bukan full scan
+    print("\nQuery plan:")
+    users = user_repository()
+    plans = [
+        ('list_before', repository.list_before, (a, b, oldest, 51)),
+        ('list_after', repository.list_after, (a, b, newest, 51)),
+        ('list_conversation', repository.list_conversation, (b, a)),
+        ('find_by_email_hmac', users.find_by_email_hmac, ('0' * 64,)),
+        ('find_by_username_hmac', users.find_by_username_hmac, ('0' * 64,)),
+    ]
+    failures = []
+    for name, method, params in plans:
+        details = _plan(repository.database, method, params)
+        for detail in details:
+            print(f"  {name:<22} {detail}")
+        index = EXPECTED_INDEXES[name]
+        if not any(index in detail for detail in details):
+            failures.append(f"{name}: tidak memakai {index}")
+        if any('TEMP B-TREE' in detail for detail in details):
+            failures.append(f"{name}: butuh sort sementara")
+
+    print("\nIndex di migrasi Postgres:")
+    failures += _check_migrations(repository.database)
+
+    if args.check:
+        print(f"\nCek index: {'OK' if not failures else 'GAGAL'}")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: LSB embedding, loop per pixel (legacy) vs. NumPy.
+
+    python -m benchmarks.stego
+"""
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+import benchmarks  # noqa: F401  (dummy env)
+from services.crypto_service import _embed_lsb, encrypt_3des
+
+IMAGE_SIZES = [(256, 256), (1024, 768), (1920, 1080), (3000, 3000)]
+MESSAGE_LENGTH = 5000
+KEY = 'benchmark-key'
+
+
+def _legacy_embed(image: Image.Image, data_to_hide: str) -> Image.Image:
+    # Salinan implementasi lama hide_message_in_image (loop per pixel)
+    binary_message = ''.join(format(ord(char), '08b') for char in data_to_hide)
+    pixels = list(image.getdata())
+    new_pixels = []
+    message_index = 0
+    for pixel in pixels:
+        if message_index < len(binary_message):
+            r, g, b = pixel
+            if message_index < len(binary_message):
+                r = (r & 0xFE) | int(binary_message[message_index])
+                message_index += 1
+            if message_index < len(binary_message):
+                g = (g & 0xFE) | int(binary_message[message_index])
+                message_index += 1
+            if message_index < len(binary_message):
+                b = (b & 0xFE) | int(binary_message[message_index])
+                message_index += 1
+            new_pixels.append((r, g, b))
+        else:
+            new_pixels.append(pixel)
+    stego_image = Image.new(image.mode, image.size)
+    stego_image.putdata(new_pixels)
+    return stego_image
+
+
+def _png(image: Image.Image) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    data_to_hide = encrypt_3des('x' * MESSAGE_LENGTH, KEY) + '<<<END>>>'
+    rng = np.random.default_rng(0)
+
+    print(f"payload: {len(data_to_hide):,} bytes")
+    print(f"{'image':>12}{'legacy':>12}{'numpy':>12}{'speedup':>10}  identical")
+    for width, height in IMAGE_SIZES:
+        image = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), 'RGB')
+
+        legacy, legacy_s = _timed(lambda: _legacy_embed(image, data_to_hide))
+        current, current_s = _timed(lambda: _embed_lsb(image, data_to_hide.encode('ascii')))
+        identical = _png(legacy) == _png(current)
+
+        print(f"{f'{width}x{height}':>12}{legacy_s * 1000:>10.1f}ms{current_s * 1000:>10.1f}ms"
+              f"{legacy_s / current_s:>9.1f}x  {identical}")
+
+
+if __name__ == '__main__':
+    main()
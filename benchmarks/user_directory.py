@@ -0,0 +1,74 @@
+"""Benchmark: sidebar user list, User.get_all() vs the cached UserDirectory.
+
+Seeds the in-memory SQLite backend with encrypted user rows and times what a
+sidebar rerun costs with each approach (cold = first rerun after TTL expiry
+or registration, warm = every other rerun).
+
+    python -m benchmarks.user_directory
+    python -m benchmarks.user_directory --users 5000
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+import benchmarks  # noqa: F401  (dummy env)
+from models.user import User
+from models.user_directory import UserDirectory
+from services.crypto_service import encrypt_field
+from services.repository import user_repository
+
+
+def _seed(users):
+    repository = user_repository()
+    for i in range(users):
+        email = encrypt_field(f'user{i}@example.com')
+        username = encrypt_field(f'user-{i}')
+        repository.insert({
+            'id': str(uuid.uuid4()),
+            'email': email['encrypted'],
+            'email_hmac': email['hmac'],
+            'username': username['encrypted'],
+            'username_hmac': username['hmac'],
+            'password_hash': 'x',
+            'password_hmac': 'x',
+        })
+
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    _seed(args.users)
+    directory = UserDirectory()
+    directory.list_users()
+
+    def cold():
+        # TTL habis: query ulang, username yang tidak berubah tidak didekripsi lagi
+        directory.invalidate()
+        directory.list_users()
+
+    def first_load():
+        UserDirectory().list_users()
+
+    print(f"{args.users:,} user, backend sqlite :memory:\n")
+    print(f"{'per rerun':<36}{'median ms':>12}")
+    print(f"{'User.get_all()':<36}{_time_ms(User.get_all, args.repeat):>12.2f}")
+    print(f"{'UserDirectory (proses baru)':<36}{_time_ms(first_load, args.repeat):>12.2f}")
+    print(f"{'UserDirectory (TTL habis)':<36}{_time_ms(cold, args.repeat):>12.2f}")
+    print(f"{'UserDirectory (cache)':<36}{_time_ms(directory.list_users, args.repeat):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -32,8 +33,25 @@ SUPABASE_KEY = _secrets['SUPABASE_KEY']
 DATABASE_MASTER_KEY = _secrets['DATABASE_MASTER_KEY']
 HMAC_SECRET_KEY = _secrets['HMAC_SECRET_KEY']
 
+# Storage backend: 'supabase' (default) atau 'sqlite' (lokal/offline, benchmark)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'cryptomessenger.db')  # ':memory:' untuk database sementara
+
+# Connection pool HTTP ke Supabase (satu per proses, dipakai semua sesi)
+DB_HTTP2 = os.getenv('DB_HTTP2', 'true').lower() in ('1', 'true', 'yes')  # Butuh httpx[http2]
+DB_POOL_MAX_CONNECTIONS = int(os.getenv('DB_POOL_MAX_CONNECTIONS', '20'))
+DB_POOL_MAX_KEEPALIVE = int(os.getenv('DB_POOL_MAX_KEEPALIVE', '10'))
+DB_KEEPALIVE_EXPIRY_SECONDS = 30
+DB_TIMEOUT_SECONDS = 60
+DB_CONCURRENT_QUERIES = 4  # Query independen satu render yang dijalankan bersamaan
+QUERY_CACHE_TTL_SECONDS = float(os.getenv('QUERY_CACHE_TTL_SECONDS', '2'))  # 0 = hanya gabungkan query identik
+QUERY_CACHE_MAX_ENTRIES = 2000
+
 # Validation
-if not all([SUPABASE_URL, SUPABASE_KEY, DATABASE_MASTER_KEY, HMAC_SECRET_KEY]):
+_required = [DATABASE_MASTER_KEY, HMAC_SECRET_KEY]
+if STORAGE_BACKEND == 'supabase':
+    _required += [SUPABASE_URL, SUPABASE_KEY]
+if not all(_required):
     raise ValueError("Missing required environment variables. Please check .env file or Streamlit Secrets.")
 
 # Encryption Configuration
@@ -54,10 +72,70 @@ PAGE_CONFIG = {
 MAX_FILE_SIZE_MB = 200
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
+# Chat
+MESSAGE_PAGE_SIZE = 50  # Jumlah pesan per halaman (keyset pagination)
+SYNC_OVERLAP_SECONDS = 5  # Jendela sebelum high-water mark yang dipindai ulang (baris yang commit terlambat)
+SYNC_RESCAN_SECONDS = 60  # Pindai ulang jendela overlap paling sering sekali per interval ini
+IMAGE_AUTOLOAD_BYTES = 1024 * 1024  # Gambar (terenkripsi) sampai ukuran ini dimuat otomatis
+USER_DIRECTORY_TTL_SECONDS = 60  # Daftar user di sidebar di-cache per proses selama ini
+CONTACT_PAGE_SIZE = 20  # Jumlah kontak per halaman di sidebar
+GROUP_MAX_MEMBERS = 100  # Satu baris content key per anggota untuk setiap pesan grup
+
+# Realtime (push pesan baru lewat websocket, pengganti polling per rerun)
+REALTIME_ENABLED = os.getenv('REALTIME_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+REALTIME_URL = os.getenv('REALTIME_URL', '')  # Kosong: dari SUPABASE_URL, atau stand-in lokal untuk sqlite
+REALTIME_HEARTBEAT_SECONDS = 25
+REALTIME_RECONNECT_MAX_SECONDS = 30  # Batas backoff reconnect
+RERUN_POLL_SECONDS = 1.0  # Interval fragment yang memeriksa permintaan rerun dari thread background
+RERUN_WATCHER_TIMEOUT_SECONDS = 600  # Fragment tidak berjalan selama ini -> sesi dianggap ditutup
+
+# Outbox (pengiriman pesan di background, batch + retry)
+OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OUTBOX_BATCH_SIZE = 50  # Maksimal baris per insert
+OUTBOX_BATCH_BYTES = 8 * 1024 * 1024  # Maksimal total encrypted_content per insert (baris lebih besar dikirim sendiri)
+OUTBOX_FLUSH_DELAY_SECONDS = 0.02  # Jendela untuk mengumpulkan kiriman yang berdekatan
+OUTBOX_RETRY_BASE_SECONDS = 0.5
+OUTBOX_RETRY_MAX_SECONDS = 30
+OUTBOX_MAX_ATTEMPTS = 8  # Setelah ini (atau langsung untuk error permanen) pesan ditandai gagal
+
+# Object storage untuk lampiran besar (file, gambar stego), dialamatkan per SHA-256
+BLOB_BACKEND = os.getenv('BLOB_BACKEND', '')  # Kosong: supabase -> Supabase Storage, sqlite -> local
+BLOB_BUCKET = os.getenv('BLOB_BUCKET', 'attachments')  # Bucket Supabase Storage (private)
+BLOB_LOCAL_PATH = os.getenv('BLOB_LOCAL_PATH', 'blobs')  # Direktori untuk BLOB_BACKEND=local
+BLOB_CACHE_PATH = os.getenv('BLOB_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'cryptomessenger-blobs'))
+BLOB_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Cache unduhan di disk, LRU
+BLOB_MIN_SIZE = 64 * 1024  # Ciphertext lebih kecil tetap disimpan inline di tabel messages
+
+# Crypto Configuration
+KEY_CONTEXT_CACHE_SIZE = 64  # Jumlah user key yang cipher context-nya di-cache (LRU)
+DECRYPT_WORKERS = os.cpu_count() or 4  # Thread pool untuk dekripsi batch
+STREAM_CHUNK_SIZE = 64 * 1024  # Ukuran segmen AEAD untuk file besar
+STEGO_CIPHER_SUITE = os.getenv('STEGO_CIPHER_SUITE', 'aes-256-gcm')  # atau 'chacha20-poly1305'
+
+# Kompresi sebelum enkripsi (teks, file, stego)
+COMPRESSION = os.getenv('COMPRESSION', 'auto')  # auto (zstd jika terpasang, selain itu zlib) | zstd | zlib | none
+COMPRESSION_MIN_SIZE = 256  # Payload lebih kecil tidak dikompresi
+COMPRESSION_MAX_ENTROPY = 7.5  # bit/byte; sampel di atas ini dianggap sudah terkompresi/acak
+
+# Password Hashing (Bcrypt)
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))  # Hash lama otomatis di-rehash saat login
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))  # Maks hashing bersamaan
+PASSWORD_HASH_QUEUE_LIMIT = 32  # Permintaan di atas ini langsung ditolak (server sibuk)
+
 # Settings class for backward compatibility
 class Settings:
     SUPABASE_URL = SUPABASE_URL
     SUPABASE_KEY = SUPABASE_KEY
+    STORAGE_BACKEND = STORAGE_BACKEND
+    SQLITE_PATH = SQLITE_PATH
+    DB_HTTP2 = DB_HTTP2
+    DB_POOL_MAX_CONNECTIONS = DB_POOL_MAX_CONNECTIONS
+    DB_POOL_MAX_KEEPALIVE = DB_POOL_MAX_KEEPALIVE
+    DB_KEEPALIVE_EXPIRY_SECONDS = DB_KEEPALIVE_EXPIRY_SECONDS
+    DB_TIMEOUT_SECONDS = DB_TIMEOUT_SECONDS
+    DB_CONCURRENT_QUERIES = DB_CONCURRENT_QUERIES
+    QUERY_CACHE_TTL_SECONDS = QUERY_CACHE_TTL_SECONDS
+    QUERY_CACHE_MAX_ENTRIES = QUERY_CACHE_MAX_ENTRIES
     DATABASE_MASTER_KEY = DATABASE_MASTER_KEY
     HMAC_SECRET_KEY = HMAC_SECRET_KEY
     ENCRYPTION_KEY_DB = ENCRYPTION_KEY_DB
@@ -67,3 +145,39 @@ class Settings:
     PAGE_CONFIG = PAGE_CONFIG
     MAX_FILE_SIZE_MB = MAX_FILE_SIZE_MB
     MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_BYTES
+    MESSAGE_PAGE_SIZE = MESSAGE_PAGE_SIZE
+    SYNC_OVERLAP_SECONDS = SYNC_OVERLAP_SECONDS
+    SYNC_RESCAN_SECONDS = SYNC_RESCAN_SECONDS
+    IMAGE_AUTOLOAD_BYTES = IMAGE_AUTOLOAD_BYTES
+    USER_DIRECTORY_TTL_SECONDS = USER_DIRECTORY_TTL_SECONDS
+    CONTACT_PAGE_SIZE = CONTACT_PAGE_SIZE
+    GROUP_MAX_MEMBERS = GROUP_MAX_MEMBERS
+    OUTBOX_ENABLED = OUTBOX_ENABLED
+    OUTBOX_BATCH_SIZE = OUTBOX_BATCH_SIZE
+    OUTBOX_BATCH_BYTES = OUTBOX_BATCH_BYTES
+    OUTBOX_FLUSH_DELAY_SECONDS = OUTBOX_FLUSH_DELAY_SECONDS
+    OUTBOX_RETRY_BASE_SECONDS = OUTBOX_RETRY_BASE_SECONDS
+    OUTBOX_RETRY_MAX_SECONDS = OUTBOX_RETRY_MAX_SECONDS
+    OUTBOX_MAX_ATTEMPTS = OUTBOX_MAX_ATTEMPTS
+    BLOB_BACKEND = BLOB_BACKEND
+    BLOB_BUCKET = BLOB_BUCKET
+    BLOB_LOCAL_PATH = BLOB_LOCAL_PATH
+    BLOB_CACHE_PATH = BLOB_CACHE_PATH
+    BLOB_CACHE_MAX_BYTES = BLOB_CACHE_MAX_BYTES
+    BLOB_MIN_SIZE = BLOB_MIN_SIZE
+    REALTIME_ENABLED = REALTIME_ENABLED
+    REALTIME_URL = REALTIME_URL
+    REALTIME_HEARTBEAT_SECONDS = REALTIME_HEARTBEAT_SECONDS
+    REALTIME_RECONNECT_MAX_SECONDS = REALTIME_RECONNECT_MAX_SECONDS
+    RERUN_POLL_SECONDS = RERUN_POLL_SECONDS
+    RERUN_WATCHER_TIMEOUT_SECONDS = RERUN_WATCHER_TIMEOUT_SECONDS
+    KEY_CONTEXT_CACHE_SIZE = KEY_CONTEXT_CACHE_SIZE
+    DECRYPT_WORKERS = DECRYPT_WORKERS
+    STREAM_CHUNK_SIZE = STREAM_CHUNK_SIZE
+    STEGO_CIPHER_SUITE = STEGO_CIPHER_SUITE
+    COMPRESSION = COMPRESSION
+    COMPRESSION_MIN_SIZE = COMPRESSION_MIN_SIZE
+    COMPRESSION_MAX_ENTROPY = COMPRESSION_MAX_ENTROPY
+    BCRYPT_ROUNDS = BCRYPT_ROUNDS
+    PASSWORD_HASH_WORKERS = PASSWORD_HASH_WORKERS
+    PASSWORD_HASH_QUEUE_LIMIT = PASSWORD_HASH_QUEUE_LIMIT
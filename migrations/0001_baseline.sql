@@ -0,0 +1,126 @@
+-- 0001: skema sebelum migrasi berversi (tabel dasar + semua perubahan yang
+-- sebelumnya ditulis di README). Aman dijalankan di database yang sudah ada.
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version text PRIMARY KEY,
+    applied_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    email text NOT NULL,
+    email_hmac text NOT NULL,
+    username text NOT NULL,
+    username_hmac text NOT NULL,
+    password_hash text NOT NULL,
+    password_hmac text NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    sender_id uuid NOT NULL,
+    receiver_id uuid NOT NULL,
+    message_type text NOT NULL DEFAULT 'text',
+    encrypted_content text NOT NULL,
+    encrypted_hmac text,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Listing percakapan hanya mengambil metadata
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_size integer;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS encrypted_preview text;
+
+-- Pencarian username dan daftar kontak
+CREATE INDEX IF NOT EXISTS users_username_hmac_idx ON users (username_hmac);
+CREATE INDEX IF NOT EXISTS messages_sender_idx ON messages (sender_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS messages_receiver_idx ON messages (receiver_id, created_at DESC, id DESC);
+
+-- Ringkasan percakapan: satu baris per peserta
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id text NOT NULL,
+    peer_id text NOT NULL,
+    last_message_at timestamptz NOT NULL,
+    last_message_type text NOT NULL,
+    last_sender_id text NOT NULL,
+    message_count integer NOT NULL DEFAULT 0,
+    unread_count integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, peer_id)
+);
+CREATE INDEX IF NOT EXISTS conversations_recent_idx ON conversations (user_id, last_message_at DESC, peer_id DESC);
+
+CREATE OR REPLACE FUNCTION record_message(p_sender text, p_receiver text, p_type text, p_created_at timestamptz)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO conversations AS c (user_id, peer_id, last_message_at, last_message_type, last_sender_id, message_count, unread_count)
+    SELECT p.user_id, p.peer_id, p_created_at, p_type, p_sender, 1, p.unread
+    FROM (VALUES (p_sender, p_receiver, 0), (p_receiver, p_sender, 1)) AS p(user_id, peer_id, unread)
+    WHERE p.unread = 0 OR p_sender <> p_receiver
+    ON CONFLICT (user_id, peer_id) DO UPDATE SET
+        message_count = c.message_count + 1,
+        unread_count = c.unread_count + EXCLUDED.unread_count,
+        last_message_at = GREATEST(c.last_message_at, EXCLUDED.last_message_at),
+        last_message_type = CASE WHEN EXCLUDED.last_message_at >= c.last_message_at
+                                 THEN EXCLUDED.last_message_type ELSE c.last_message_type END,
+        last_sender_id = CASE WHEN EXCLUDED.last_message_at >= c.last_message_at
+                              THEN EXCLUDED.last_sender_id ELSE c.last_sender_id END;
+$$;
+
+-- Ringkasan untuk pesan yang sudah ada (unread dianggap 0), hanya jika tabel masih kosong
+INSERT INTO conversations (user_id, peer_id, last_message_at, last_message_type, last_sender_id, message_count, unread_count)
+SELECT DISTINCT ON (user_id, peer_id) user_id, peer_id, created_at, message_type, sender_id,
+       COUNT(*) OVER (PARTITION BY user_id, peer_id), 0
+FROM (
+    SELECT sender_id::text AS user_id, receiver_id::text AS peer_id, created_at, message_type, sender_id::text AS sender_id FROM messages
+    UNION ALL
+    SELECT receiver_id::text, sender_id::text, created_at, message_type, sender_id::text FROM messages WHERE receiver_id <> sender_id
+) m
+WHERE NOT EXISTS (SELECT 1 FROM conversations)
+ORDER BY user_id, peer_id, created_at DESC
+ON CONFLICT DO NOTHING;
+
+-- Lampiran besar di Supabase Storage (bucket private `attachments`)
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS blob_ref text;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS blob_digest text;
+
+-- Grup: satu baris pesan kecil per anggota, isi dienkripsi sekali
+CREATE TABLE IF NOT EXISTS groups (
+    id uuid PRIMARY KEY,
+    name text NOT NULL,
+    name_hmac text NOT NULL,
+    created_by uuid NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS group_members (
+    group_id uuid NOT NULL REFERENCES groups (id),
+    user_id uuid NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (group_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS group_members_user_idx ON group_members (user_id);
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS group_id uuid;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS encrypted_key text;
+CREATE INDEX IF NOT EXISTS messages_group_idx ON messages (group_id, receiver_id, created_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION record_group_message(p_user text, p_group text, p_sender text, p_type text, p_created_at timestamptz)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO conversations AS c (user_id, peer_id, last_message_at, last_message_type, last_sender_id, message_count, unread_count)
+    VALUES (p_user, p_group, p_created_at, p_type, p_sender, 1, CASE WHEN p_user = p_sender THEN 0 ELSE 1 END)
+    ON CONFLICT (user_id, peer_id) DO UPDATE SET
+        message_count = c.message_count + 1,
+        unread_count = c.unread_count + EXCLUDED.unread_count,
+        last_message_at = GREATEST(c.last_message_at, EXCLUDED.last_message_at),
+        last_message_type = CASE WHEN EXCLUDED.last_message_at >= c.last_message_at
+                                 THEN EXCLUDED.last_message_type ELSE c.last_message_type END,
+        last_sender_id = CASE WHEN EXCLUDED.last_message_at >= c.last_message_at
+                              THEN EXCLUDED.last_sender_id ELSE c.last_sender_id END;
+$$;
+
+-- Push pesan baru lewat Supabase Realtime
+DO $$
+BEGIN
+    ALTER PUBLICATION supabase_realtime ADD TABLE messages;
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+INSERT INTO schema_migrations (version) VALUES ('0001') ON CONFLICT DO NOTHING;
@@ -0,0 +1,49 @@
+-- 0002: conversation_id kanonik untuk pesan pribadi (pasangan peserta terurut,
+-- lihat conversation_id() di services/repository.py). Listing percakapan
+-- memfilter satu kolom ini, bukan OR dua arah sender/receiver. Pesan grup: NULL.
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS conversation_id text;
+
+CREATE OR REPLACE FUNCTION conversation_key(p_user1 text, p_user2 text)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$
+    -- Urutan byte (COLLATE "C") sama dengan sorted() di Python
+    SELECT CASE WHEN p_user1 COLLATE "C" <= p_user2 COLLATE "C"
+                THEN p_user1 || ':' || p_user2 ELSE p_user2 || ':' || p_user1 END;
+$$;
+
+-- Aplikasi menulis conversation_id saat kirim; trigger mengisi insert dari
+-- versi lama aplikasi selama deploy
+CREATE OR REPLACE FUNCTION messages_fill_conversation_id()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.conversation_id IS NULL AND NEW.group_id IS NULL THEN
+        NEW.conversation_id := conversation_key(NEW.sender_id::text, NEW.receiver_id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS messages_conversation_id_fill ON messages;
+CREATE TRIGGER messages_conversation_id_fill BEFORE INSERT ON messages
+FOR EACH ROW EXECUTE FUNCTION messages_fill_conversation_id();
+
+-- Backfill baris lama per batch (dipanggil berulang oleh
+-- `python -m migrations.backfill_conversation_ids` sampai return 0)
+CREATE OR REPLACE FUNCTION backfill_conversation_ids(p_batch integer DEFAULT 5000)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    updated integer;
+BEGIN
+    UPDATE messages m SET conversation_id = conversation_key(m.sender_id::text, m.receiver_id::text)
+    WHERE m.id IN (
+        SELECT id FROM messages
+        WHERE conversation_id IS NULL AND group_id IS NULL
+        LIMIT p_batch
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+INSERT INTO schema_migrations (version) VALUES ('0002') ON CONFLICT DO NOTHING;
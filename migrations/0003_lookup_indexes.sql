@@ -0,0 +1,17 @@
+-- 0003: index untuk listing percakapan dan lookup HMAC User.login / register.
+-- CONCURRENTLY tidak mengunci tabel untuk tulis, tapi tidak bisa dijalankan di
+-- dalam transaksi: jalankan dengan `psql -f` (tanpa -1/--single-transaction).
+-- Jalankan sebelum backfill: baris yang belum diisi dicari lewat index ini.
+
+-- list_conversation / list_before / list_after: eq(conversation_id) + urut (created_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_conversation_id_idx
+    ON messages (conversation_id, created_at, id);
+
+-- User.login dan cek email terdaftar di User.register: eq(email_hmac).
+-- Gagal jika ada email ganda (registrasi bersamaan sebelum index ini ada)
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_email_hmac_idx ON users (email_hmac);
+
+-- Pencarian username (sudah ada sejak 0001, di sini untuk database yang dibuat manual)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_username_hmac_idx ON users (username_hmac);
+
+INSERT INTO schema_migrations (version) VALUES ('0003') ON CONFLICT DO NOTHING;
@@ -0,0 +1,36 @@
+"""Backfill messages.conversation_id for rows written before migration 0002.
+
+Fills private messages without a conversation_id in small batches so writes to
+`messages` are never blocked for long, and can be stopped and restarted at any
+time. Run after migrations 0002 and 0003, against the configured STORAGE_BACKEND:
+
+    python -m migrations.backfill_conversation_ids
+    python -m migrations.backfill_conversation_ids --batch-size 2000 --pause 0.5
+"""
+import argparse
+import time
+
+from services.repository import message_repository
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--pause', type=float, default=0.1, help='jeda antar batch (detik)')
+    args = parser.parse_args()
+
+    repository = message_repository()
+    total = 0
+    start = time.perf_counter()
+    while True:
+        updated = repository.backfill_conversation_ids(args.batch_size)
+        total += updated
+        if not updated:
+            break
+        print(f"{total:,} baris diisi ({time.perf_counter() - start:.1f} s)")
+        time.sleep(args.pause)
+    print(f"Selesai: {total:,} baris diisi")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
 from .user import User
 from .message import Message
-
+from .conversation_store import ConversationStore
+from .user_directory import UserDirectory, user_directory
+from .contact_list import ContactList
+from .group import Group
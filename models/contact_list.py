@@ -0,0 +1,91 @@
+from typing import List, Dict, Optional, Tuple
+from models.user_directory import user_directory
+from models.group import Group
+from services.repository import conversation_repository
+from config.settings import Settings
+
+
+class ContactList:
+    # Orang yang pernah bertukar pesan dengan user, urut pesan terakhir
+    # terbaru, beserta jumlah pesan belum dibaca (disimpan di session_state).
+    # Satu query berindeks per halaman ke ringkasan `conversations`;
+    # tabel users hanya diakses per id. Grup tampil sebagai kontak dengan
+    # is_group=True ('username' = nama grup).
+
+    def __init__(self, user_id: str, page_size: int = None):
+        self.user_id = user_id
+        self.page_size = page_size or Settings.CONTACT_PAGE_SIZE
+        # {'id', 'username', 'last_message_at', 'last_message_type', 'unread_count'}
+        self.contacts: List[Dict] = []
+        self.has_more = True
+        self._cursor: Optional[Tuple[str, str]] = None
+
+    @staticmethod
+    def _lookup(peer_ids: List[str]) -> List[Dict]:
+        # User dulu (cache direktori); id yang bukan user dicari di tabel grup.
+        # Urutan hasil = urutan peer_ids
+        found = {user['id']: user for user in user_directory().get_users(peer_ids)}
+        missing = [peer_id for peer_id in peer_ids if peer_id not in found]
+        if missing:
+            found.update((group['id'], group) for group in Group.get_groups(missing))
+        return [found[peer_id] for peer_id in peer_ids if peer_id in found]
+
+    def load_more(self) -> List[Dict]:
+        if not self.has_more:
+            return []
+
+        rows = conversation_repository().list_for_user(self.user_id, before=self._cursor, limit=self.page_size + 1)
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if rows:
+            self._cursor = (rows[-1]['last_message_at'], rows[-1]['peer_id'])
+
+        # Kontak yang sudah naik lewat touch() tidak diulang
+        known = {contact['id'] for contact in self.contacts}
+        rows = [row for row in rows if row['peer_id'] != self.user_id and row['peer_id'] not in known]
+        summaries = {row['peer_id']: row for row in rows}
+        added = [
+            dict(
+                user,
+                last_message_at=summaries[user['id']]['last_message_at'],
+                last_message_type=summaries[user['id']]['last_message_type'],
+                unread_count=summaries[user['id']]['unread_count'],
+            )
+            for user in self._lookup(list(summaries))
+        ]
+        self.contacts.extend(added)
+        return added
+
+    def get(self, peer_id: str) -> Optional[Dict]:
+        return next((contact for contact in self.contacts if contact['id'] == peer_id), None)
+
+    @property
+    def unread_total(self) -> int:
+        return sum(contact['unread_count'] for contact in self.contacts)
+
+    def touch(self, peer_id: str, created_at: str, message_type: str = 'text', unread: bool = False):
+        # Pesan baru (terkirim / dari realtime): kontak naik ke urutan teratas
+        if peer_id == self.user_id:
+            return
+        contact = self.get(peer_id)
+        if contact is None:
+            users = self._lookup([peer_id])
+            if not users:
+                return
+            contact = dict(users[0], last_message_at=created_at, last_message_type=message_type, unread_count=0)
+        else:
+            self.contacts.remove(contact)
+            if created_at >= contact['last_message_at']:
+                contact['last_message_at'] = created_at
+                contact['last_message_type'] = message_type
+        if unread:
+            contact['unread_count'] += 1
+        self.contacts.insert(0, contact)
+
+    def mark_read(self, peer_id: str, force: bool = False):
+        # force: ada pesan masuk yang mungkin belum tercatat di salinan lokal
+        contact = self.get(peer_id)
+        if force or (contact and contact['unread_count']):
+            conversation_repository().mark_read(self.user_id, peer_id)
+        if contact:
+            contact['unread_count'] = 0
@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from models.message import Message
+from config.settings import Settings
+
+
+class ConversationStore:
+    # Salinan lokal satu percakapan (disimpan di session_state). sync() hanya
+    # mengambil pesan setelah high-water mark (created_at, id), jadi polling
+    # percakapan yang diam cukup satu query kecil yang mengembalikan 0 baris.
+    # Jendela overlap sebelum high-water mark hanya dipindai ulang berkala
+    # (SYNC_RESCAN_SECONDS) atau setelah realtime tersambung ulang. Hanya kolom
+    # metadata yang diambil; encrypted_content dimuat per pesan oleh Message.
+    # group=True: other_id adalah id grup (salinan pesan grup milik user)
+
+    def __init__(self, user_id: str, other_id: str, page_size: int = None, overlap_seconds: float = None,
+                 group: bool = False):
+        self.user_id = user_id
+        self.other_id = other_id
+        self.group = group
+        self.page_size = page_size or Settings.MESSAGE_PAGE_SIZE
+        self.overlap = timedelta(
+            seconds=Settings.SYNC_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+        )
+        self.messages: List[Dict] = []
+        self.has_older = False
+        self.stale = True  # Perlu sync() (belum pernah, pesan sendiri terkirim, atau realtime tersambung ulang)
+        self.rescan = False  # sync() berikutnya memindai ulang jendela overlap (realtime tersambung ulang)
+        self._rescanned_at = time.monotonic()
+        self._ids = set()
+
+    @property
+    def high_water_mark(self) -> Optional[Tuple[str, str]]:
+        return Message.page_cursor(self.messages[-1]) if self.messages else None
+
+    def _merge(self, rows: List[Dict]) -> List[Dict]:
+        # Dedupe berdasarkan id; return baris yang benar-benar baru
+        new_rows = [row for row in rows if row['id'] not in self._ids]
+        if new_rows:
+            self._ids.update(row['id'] for row in new_rows)
+            self.messages.extend(new_rows)
+            self.messages.sort(key=Message.page_cursor)
+        return new_rows
+
+    def _overlap_start(self) -> str:
+        # Baris dengan created_at sedikit lebih lama dari high-water mark bisa
+        # commit belakangan; ambil ulang jendela kecil ini dan dedupe per id
+        created_at = self.high_water_mark[0]
+        try:
+            timestamp = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        except ValueError:
+            return created_at
+        return (timestamp - self.overlap).isoformat()
+
+    def _page(self, before: Optional[Tuple[str, str]] = None) -> Tuple[List[Dict], bool]:
+        if self.group:
+            return Message.get_group_messages_page(
+                self.other_id, self.user_id, before=before, limit=self.page_size, columns=Message.LISTING_COLUMNS
+            )
+        return Message.get_messages_page(
+            self.user_id, self.other_id, before=before, limit=self.page_size, columns=Message.LISTING_COLUMNS
+        )
+
+    def _after(self, after: Tuple[str, Optional[str]]) -> Tuple[List[Dict], bool]:
+        if self.group:
+            return Message.get_group_messages_after(
+                self.other_id, self.user_id, after=after, limit=self.page_size, columns=Message.LISTING_COLUMNS
+            )
+        return Message.get_messages_after(
+            self.user_id, self.other_id, after=after, limit=self.page_size, columns=Message.LISTING_COLUMNS
+        )
+
+    def _fetch_after(self, after: Tuple[str, Optional[str]]) -> List[Dict]:
+        added = []
+        while True:
+            rows, more = self._after(after)
+            added += self._merge(rows)
+            if not more or not rows:
+                return added
+            after = Message.page_cursor(rows[-1])
+
+    def push(self, rows: List[Dict]) -> List[Dict]:
+        # Baris dari realtime berisi semua kolom: simpan metadata saja, plus isi
+        # pesan teks (kecil) agar tidak perlu query lagi saat dirender
+        if self.stale:
+            return []  # sync() berikutnya akan mengambilnya
+        listed = []
+        for row in rows:
+            item = {column: row.get(column) for column in Message.LISTING_COLUMNS.split(',')}
+            if item['message_type'] == 'text' and row.get('encrypted_content'):
+                item['encrypted_content'] = row['encrypted_content']
+            listed.append(item)
+        return self._merge(listed)
+
+    def sync(self) -> List[Dict]:
+        # Return pesan baru sejak sync sebelumnya (urut lama -> baru)
+        self.stale = False
+        if not self.messages:
+            # Belum ada pesan lokal: halaman terbaru saja
+            page, more = self._page()
+            self.has_older = more
+            return self._merge(page)
+
+        if self.rescan or time.monotonic() - self._rescanned_at >= Settings.SYNC_RESCAN_SECONDS:
+            self.rescan = False
+            self._rescanned_at = time.monotonic()
+            return self._fetch_after((self._overlap_start(), None))
+
+        return self._fetch_after(self.high_water_mark)
+
+    def load_older(self) -> List[Dict]:
+        if not self.messages:
+            return self.sync()
+
+        page, more = self._page(before=Message.page_cursor(self.messages[0]))
+        self.has_older = more
+        return self._merge(page)
+
+    def resync(self) -> List[Dict]:
+        # Buang salinan lokal lalu ambil ulang seluruh rentang yang sudah dimuat
+        oldest = Message.page_cursor(self.messages[0]) if self.messages else None
+        self.messages = []
+        self._ids = set()
+        if oldest is None:
+            return self.sync()
+
+        return self._fetch_after((oldest[0], None))
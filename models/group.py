@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Tuple, List, Dict, Union
+from services.repository import group_repository, conversation_repository
+from services.crypto_service import encrypt_field, decrypt_field
+from config.settings import Settings
+
+
+class Group:
+    # Grup percakapan. Pesan grup disimpan sebagai satu baris kecil per anggota
+    # (content key terbungkus) dengan isi terenkripsi sekali, lihat Message.send_group_*
+
+    @staticmethod
+    def create(creator_id: str, name: str, member_ids: List[str]) -> Tuple[bool, Union[Dict, str]]:
+        try:
+            name = (name or '').strip()
+            if not name:
+                raise ValueError('Nama grup harus diisi')
+
+            members = list(dict.fromkeys([creator_id] + list(member_ids)))
+            if len(members) < 2:
+                raise ValueError('Pilih minimal satu anggota lain')
+            if len(members) > Settings.GROUP_MAX_MEMBERS:
+                raise ValueError(f'Anggota grup maksimal {Settings.GROUP_MAX_MEMBERS} orang')
+
+            # Nama grup dienkripsi seperti username
+            name_enc = encrypt_field(name)
+            group = {
+                'id': str(uuid.uuid4()),
+                'name': name_enc['encrypted'],
+                'name_hmac': name_enc['hmac'],
+                'created_by': creator_id,
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+            }
+            if not group_repository().insert(group):
+                raise Exception('Gagal membuat grup')
+            group_repository().add_members(group['id'], members)
+
+            # Grup langsung muncul di daftar kontak semua anggota
+            for member_id in members:
+                conversation_repository().record_message(
+                    creator_id, member_id, 'group', group['created_at'], group_id=group['id']
+                )
+
+            return True, {'id': group['id'], 'username': name, 'is_group': True}
+
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def members(group_id: str) -> List[str]:
+        return group_repository().list_members(group_id)
+
+    @staticmethod
+    def get_groups(group_ids: List[str]) -> List[Dict]:
+        # Format sama dengan kontak user ('username' = nama grup); urutan = group_ids
+        groups = {}
+        for row in group_repository().find_by_ids(group_ids, columns='id,name,name_hmac'):
+            try:
+                groups[row['id']] = decrypt_field(row['name'], row['name_hmac'])
+            except Exception:
+                continue
+        return [
+            {'id': group_id, 'username': groups[group_id], 'is_group': True}
+            for group_id in group_ids if group_id in groups
+        ]
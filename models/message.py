@@ -1,136 +1,520 @@
 import json
 import base64
-from typing import Tuple, List, Dict
-from services.database_service import db
+import uuid
+from itertools import chain
+from typing import Tuple, List, Dict, Optional, Iterator, Iterable, Union, BinaryIO, Callable
+from models.outbox import outbox, Notify
+from services.repository import message_repository, conversation_repository, group_repository, conversation_id
+from services.blob_store import put_blob_stream, read_blob
 from services.crypto_service import (
-    encrypt_text_aes_ctr_hmac, decrypt_text_aes_ctr_hmac,
+    decrypt_text_aes_ctr_hmac,
+    encrypt_text_aes_ctr_bytes, decrypt_text_aes_ctr_bytes, decrypt_text_aes_ctr_hmac_bytes,
     hide_message_in_image, extract_message_from_image,
-    encrypt_file_aes_gcm, decrypt_file_aes_gcm,
-    encrypt_for_database, decrypt_from_database
+    decrypt_file_aes_gcm_bytes, decrypt_file_stream,
+    decrypt_from_database,
+    message_binding, seal_envelope, open_envelope, is_envelope, envelope_info, unpack_file_payload,
+    envelope_compression, compress_payload, decompress_stream, b64_decode_chunks,
+    seal_file_stream, iter_file_chunks, open_file_stream, read_file_stream_name,
+    generate_content_key, wrap_content_key, unwrap_content_key, content_key_origin,
+    ENVELOPE_PREFIX, ENVELOPE_VERSION_HMAC, ENVELOPE_TEXT, ENVELOPE_IMAGE, ENVELOPE_FILE, ENVELOPE_FILE_STREAM, ENVELOPE_PREVIEW,
+    map_parallel
 )
+from config.settings import Settings
 
 
 class Message:
+    # Kolom untuk listing percakapan: tanpa encrypted_content, yang dimuat per
+    # pesan saat dibutuhkan (load_content / load_contents)
+    LISTING_COLUMNS = ('id,sender_id,receiver_id,message_type,created_at,content_size,encrypted_preview,'
+                       'encrypted_hmac,blob_ref,blob_digest,group_id,encrypted_key')
+    
+    @staticmethod
+    def _binding(msg: Dict) -> bytes:
+        # id, sender, receiver dan tipe diikat ke ciphertext (associated data)
+        return message_binding(msg['id'], msg['sender_id'], msg['receiver_id'], msg.get('message_type', 'text'))
+    
+    @staticmethod
+    def _content_binding(msg: Dict) -> bytes:
+        # Pesan grup: isi (dan preview) diikat ke pesan asal yang sama untuk semua
+        # anggota; id pesan asal dibaca dari record content key baris ini
+        if not msg.get('group_id'):
+            return Message._binding(msg)
+        origin_id = content_key_origin(msg['encrypted_key'], Message._binding(msg))
+        return message_binding(origin_id, msg['sender_id'], msg['group_id'], msg.get('message_type', 'text'))
+    
+    @staticmethod
+    def _content_key(msg: Dict, encryption_key: str) -> str:
+        # Kunci layer 1: user key, atau content key pesan grup yang dibuka dengan user key
+        if not msg.get('group_id'):
+            return encryption_key
+        return unwrap_content_key(msg['encrypted_key'], encryption_key, Message._binding(msg))
+    
     @staticmethod
-    def send_text(sender_id: str, receiver_id: str, message: str, encryption_key: str) -> Tuple[bool, str]:
+    def _new_message(sender_id: str, receiver_id: str, message_type: str) -> Dict:
+        # ID dibuat di client agar bisa ikut diautentikasi sebelum insert
+        return {
+            'id': str(uuid.uuid4()),
+            'sender_id': sender_id,
+            'receiver_id': receiver_id,
+            'conversation_id': conversation_id(sender_id, receiver_id),
+            'message_type': message_type,
+            # Kolom HMAC hanya dipakai baris lama; integritas dari tag AEAD
+            'encrypted_hmac': ''
+        }
+    
+    @staticmethod
+    def _store(message_data: Dict) -> Dict:
+        row = message_repository().insert(message_data)
+        if not row:
+            raise Exception('Gagal mengirim pesan')
+        
+        # Ringkasan percakapan (urutan kontak, unread). Pesan sudah tersimpan:
+        # kegagalan di sini tidak boleh membuat pengirim mengirim ulang
         try:
-            # Layer 1: Enkripsi message dengan AES-256-CTR + HMAC-SHA256
-            encrypted_aes = encrypt_text_aes_ctr_hmac(message, encryption_key)
+            conversation_repository().record_message(
+                row['sender_id'], row['receiver_id'], row['message_type'], row['created_at'], row.get('group_id')
+            )
+        except Exception:
+            pass
+        return row
+    
+    @staticmethod
+    def _set_content(message_data: Dict, content: Union[str, Iterable[bytes]]):
+        # Ciphertext besar (file, gambar stego) ke object storage sebagai envelope
+        # biner (tanpa '$' + base64), dialamatkan dengan SHA-256; baris pesan hanya
+        # menyimpan ref + digest. content: teks envelope, atau chunk envelope biner
+        # (file) yang di-stream ke storage tanpa disatukan di memori
+        if isinstance(content, str):
+            if len(content) < Settings.BLOB_MIN_SIZE:
+                message_data['encrypted_content'] = content
+                message_data['content_size'] = len(content)
+                return
+            head, chunks = [base64.b64decode(content[len(ENVELOPE_PREFIX):])], iter(())
+        else:
+            chunks = iter(content)
+            head, size = [], 0
+            for chunk in chunks:
+                head.append(chunk)
+                size += len(chunk)
+                if size >= Settings.BLOB_MIN_SIZE:
+                    break
+            else:
+                # Isi kecil tetap inline sebagai teks envelope
+                message_data['encrypted_content'] = ENVELOPE_PREFIX + base64.b64encode(b''.join(head)).decode('ascii')
+                message_data['content_size'] = len(message_data['encrypted_content'])
+                return
+        
+        message_data['blob_ref'], message_data['blob_digest'], message_data['content_size'] = put_blob_stream(
+            chain(head, chunks)
+        )
+        message_data['encrypted_content'] = ''
+    
+    @staticmethod
+    def _submit(message_data: Dict, notify: Notify = None):
+        # Dengan outbox: insert di background (batch + retry), notify dipanggil
+        # setelah tersimpan. Tanpa outbox: insert langsung
+        if Settings.OUTBOX_ENABLED:
+            outbox().enqueue(message_data, notify)
+        else:
+            Message._store(message_data)
+    
+    @staticmethod
+    def _submit_many(rows: List[Dict], notify: Notify = None):
+        # Baris pesan grup: lewat outbox ikut satu batch insert
+        if Settings.OUTBOX_ENABLED:
+            for row in rows:
+                outbox().enqueue(row, notify)
+            return
+        
+        inserted = message_repository().insert_many(rows)
+        if len(inserted) != len(rows):
+            raise Exception('Gagal mengirim pesan')
+        for row in inserted:
+            try:
+                conversation_repository().record_message(
+                    row['sender_id'], row['receiver_id'], row['message_type'], row['created_at'], row.get('group_id')
+                )
+            except Exception:
+                pass
+    
+    @staticmethod
+    def _send_group(sender_id: str, group_id: str, message_type: str, encryption_key: str,
+                    seal: Callable[[str, bytes], Dict], notify: Notify = None):
+        # Encrypt-once fan-out: seal(content_key, binding) mengenkripsi isi sekali
+        # (kolom bersama), lalu setiap anggota (termasuk pengirim) mendapat baris
+        # dengan content key yang dibungkus user key dan diikat ke baris itu
+        members = group_repository().list_members(group_id)
+        if sender_id not in members:
+            raise Exception('Anda bukan anggota grup ini')
+        
+        origin = Message._new_message(sender_id, group_id, message_type)
+        content_key = generate_content_key()
+        shared = seal(content_key, Message._binding(origin))
+        # Isi besar disimpan sekali di object storage; isi kecil disalin ke setiap baris
+        Message._set_content(shared, shared['encrypted_content'])
+        
+        rows = []
+        for member_id in members:
+            row = Message._new_message(sender_id, member_id, message_type)
+            row.update(shared)
+            row['group_id'] = group_id
+            row['conversation_id'] = None
+            row['encrypted_key'] = wrap_content_key(content_key, origin['id'], encryption_key, Message._binding(row))
+            rows.append(row)
+        Message._submit_many(rows, notify)
+    
+    @staticmethod
+    def send_text(sender_id: str, receiver_id: str, message: str, encryption_key: str,
+                  notify: Notify = None) -> Tuple[bool, str]:
+        try:
+            message_data = Message._new_message(sender_id, receiver_id, 'text')
             
-            # Layer 2: Enkripsi dengan ChaCha20-Poly1305 untuk database
-            encrypted_db = encrypt_for_database(encrypted_aes)
+            # Kompresi opsional (dicatat di flags envelope)
+            compression, plaintext = compress_payload(message.encode('utf-8'), 'text')
             
-            # Prepare message data
-            message_data = {
-                'sender_id': sender_id,
-                'receiver_id': receiver_id,
-                'message_type': 'text',
-                'encrypted_content': encrypted_db['encrypted'],
-                'encrypted_hmac': encrypted_db['hmac']
-            }
+            # Layer 1: Enkripsi message dengan AES-256-CTR
+            encrypted_aes = encrypt_text_aes_ctr_bytes(plaintext, encryption_key)
             
-            # Insert ke database
-            response = db.from_('messages').insert(message_data).execute()
+            # Layer 2: ChaCha20-Poly1305 untuk database, metadata baris sebagai associated data
+            message_data['encrypted_content'] = seal_envelope(
+                ENVELOPE_TEXT, encrypted_aes, Message._binding(message_data), flags=compression
+            )
+            message_data['content_size'] = len(message_data['encrypted_content'])
             
-            if not response.data:
-                raise Exception('Gagal mengirim pesan')
+            # Insert ke database (lewat outbox)
+            Message._submit(message_data, notify)
             
             return True, "Pesan teks berhasil dikirim"
-            
+        
         except Exception as e:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def decrypt_text(encrypted_content: str, encrypted_hmac: str, encryption_key: str) -> str:
+    def load_content(msg: Dict, keep: bool = True) -> Union[str, bytes]:
+        # encrypted_content diambil per pesan saat dibutuhkan; keep=False untuk
+        # isi yang tidak perlu disimpan di memori sesi. Isi di object storage
+        # dimuat utuh (envelope biner; blob lama: teks envelope), hanya untuk isi
+        # yang memang dipakai utuh (gambar); file dibaca per chunk (_file_content)
+        if msg.get('encrypted_content') or ('encrypted_content' in msg and not msg.get('blob_ref')):
+            return msg['encrypted_content']
+        
+        if msg.get('blob_ref'):
+            # Diverifikasi terhadap digest saat dibaca
+            encrypted_content = b''.join(read_blob(msg['blob_ref'], msg['blob_digest']))
+            if encrypted_content.startswith(ENVELOPE_PREFIX.encode('ascii')):
+                encrypted_content = encrypted_content.decode('ascii')
+        else:
+            encrypted_content = message_repository().get_content(msg['id'])
+            if encrypted_content is None:
+                raise Exception('Pesan tidak ditemukan')
+        
+        if keep:
+            msg['encrypted_content'] = encrypted_content
+        return encrypted_content
+    
+    @staticmethod
+    def load_contents(rows: List[Dict]):
+        # Satu query `in` untuk semua pesan yang belum punya encrypted_content;
+        # pesan dengan isi di object storage dibaca per blob
+        pending = {row['id']: row for row in rows if 'encrypted_content' not in row and not row.get('blob_ref')}
+        for row in rows:
+            if row.get('blob_ref'):
+                Message.load_content(row)
+        if not pending:
+            return
+        
+        for message_id, encrypted_content in message_repository().get_contents(pending).items():
+            pending[message_id]['encrypted_content'] = encrypted_content
+    
+    @staticmethod
+    def _open_payload(msg: Dict, expected_type: int, encrypted_content: Union[str, bytes] = None) -> bytes:
+        payload_type, payload = open_envelope(
+            encrypted_content or Message.load_content(msg), msg.get('encrypted_hmac', ''), Message._content_binding(msg)
+        )
+        if payload_type != expected_type:
+            raise ValueError('Tipe pesan tidak sesuai')
+        return payload
+    
+    @staticmethod
+    def decrypt_text(msg: Dict, encryption_key: str) -> str:
+        encrypted_content = Message.load_content(msg)
+        
+        if is_envelope(encrypted_content):
+            payload = Message._open_payload(msg, ENVELOPE_TEXT, encrypted_content)
+            if envelope_info(encrypted_content)[0] == ENVELOPE_VERSION_HMAC:
+                return decrypt_text_aes_ctr_hmac_bytes(payload, encryption_key)
+            return decrypt_text_aes_ctr_bytes(
+                payload, Message._content_key(msg, encryption_key), envelope_compression(encrypted_content)
+            )
+        
+        # Format v1 (legacy)
         # Layer 1: Decrypt dari ChaCha20-Poly1305
-        decrypted_db = decrypt_from_database(encrypted_content, encrypted_hmac)
+        decrypted_db = decrypt_from_database(encrypted_content, msg.get('encrypted_hmac', ''))
         
         # Layer 2: Decrypt dari AES-256-CTR + HMAC
         return decrypt_text_aes_ctr_hmac(decrypted_db, encryption_key)
     
     @staticmethod
-    def send_image_steganography(sender_id: str, receiver_id: str, image_bytes: bytes, 
-                                  secret_message: str, encryption_key: str) -> Tuple[bool, str]:
+    def decrypt_many(rows: List[Dict], encryption_key: str) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        # Dekripsi banyak pesan teks sekaligus di thread pool; urutan hasil = urutan rows
+        Message.load_contents(rows)
+        return map_parallel(lambda row: Message.decrypt_text(row, encryption_key), rows)
+    
+    @staticmethod
+    def send_image_steganography(sender_id: str, receiver_id: str, image_bytes: bytes,
+                                  secret_message: str, encryption_key: str,
+                                  notify: Notify = None) -> Tuple[bool, str]:
         try:
-            # Layer 1: Hide message in image (LSB + 3DES)
-            stego_image = hide_message_in_image(image_bytes, secret_message, encryption_key)
-            
-            # Convert to base64
-            image_base64 = base64.b64encode(stego_image).decode('utf-8')
+            message_data = Message._new_message(sender_id, receiver_id, 'image')
             
-            # Layer 2: Enkripsi dengan ChaCha20-Poly1305 untuk database
-            encrypted_db = encrypt_for_database(image_base64)
+            # Layer 1: Hide message in image (LSB + AES-256-GCM / ChaCha20-Poly1305)
+            stego_image = hide_message_in_image(image_bytes, secret_message, encryption_key)
             
-            # Simpan ke database dengan message_type = 'image'
-            message_data = {
-                'sender_id': sender_id,
-                'receiver_id': receiver_id,
-                'message_type': 'image',
-                'encrypted_content': encrypted_db['encrypted'],
-                'encrypted_hmac': encrypted_db['hmac']
-            }
+            # Layer 2: Enkripsi dengan ChaCha20-Poly1305 untuk database (PNG mentah)
+            Message._set_content(message_data, seal_envelope(
+                ENVELOPE_IMAGE, stego_image, Message._binding(message_data)
+            ))
             
-            response = db.from_('messages').insert(message_data).execute()
+            Message._submit(message_data, notify)
             
             return True, "Pesan gambar dengan pesan tersembunyi berhasil dikirim"
-            
+        
         except Exception as e:
             return False, f"Error sending image: {str(e)}"
     
     @staticmethod
-    def extract_from_image(encrypted_content: str, encrypted_hmac: str, encryption_key: str) -> str:
+    def get_image_bytes(msg: Dict) -> bytes:
         # Layer 1: Decrypt dari ChaCha20-Poly1305
-        image_base64 = decrypt_from_database(encrypted_content, encrypted_hmac)
+        encrypted_content = Message.load_content(msg)
+        if is_envelope(encrypted_content):
+            return Message._open_payload(msg, ENVELOPE_IMAGE, encrypted_content)
         
-        # Convert from base64 to bytes
-        image_data = base64.b64decode(image_base64)
+        # Format v1 (legacy): PNG di-base64 sebelum dienkripsi
+        image_base64 = decrypt_from_database(encrypted_content, msg.get('encrypted_hmac', ''))
+        return base64.b64decode(image_base64)
+    
+    @staticmethod
+    def extract_from_image(msg: Dict, encryption_key: str) -> str:
+        image_data = Message.get_image_bytes(msg)
         
-        # Layer 2: Extract message dari image (LSB + 3DES)
-        return extract_message_from_image(image_data, encryption_key)
+        # Layer 2: Extract message dari image (LSB + AEAD; gambar lama 3DES)
+        return extract_message_from_image(image_data, Message._content_key(msg, encryption_key))
     
     @staticmethod
-    def send_file(sender_id: str, receiver_id: str, file_bytes: bytes, 
-                  filename: str, encryption_key: str) -> Tuple[bool, str]:
+    def send_file(sender_id: str, receiver_id: str, file_bytes: Union[bytes, BinaryIO],
+                  filename: str, encryption_key: str, notify: Notify = None) -> Tuple[bool, str]:
         try:
-            # Layer 1: Enkripsi file dengan AES-256-GCM
-            encrypted_aes = encrypt_file_aes_gcm(file_bytes, encryption_key)
+            message_data = Message._new_message(sender_id, receiver_id, 'file')
             
-            # Simpan filename dan encrypted content sebagai JSON
-            file_data = {
-                'filename': filename,
-                'encrypted_content': encrypted_aes
-            }
+            # Kompresi opsional (kecuali format yang sudah terkompresi),
+            # Layer 1: AES-256-GCM tersegmentasi, Layer 2: ChaCha20-Poly1305 tersegmentasi
+            # file_bytes boleh berupa bytes atau file-like (dibaca per chunk)
+            Message._set_content(message_data, seal_file_stream(
+                filename, iter_file_chunks(file_bytes), encryption_key, Message._binding(message_data)
+            ))
             
-            file_json = json.dumps(file_data)
+            # Filename terenkripsi terpisah agar listing tidak perlu isi file
+            message_data['encrypted_preview'] = seal_envelope(
+                ENVELOPE_PREVIEW, filename.encode('utf-8'), Message._binding(message_data)
+            )
             
-            # Layer 2: Enkripsi dengan ChaCha20-Poly1305 untuk database
-            encrypted_db = encrypt_for_database(file_json)
+            Message._submit(message_data, notify)
             
-            # Simpan ke database dengan message_type = 'file'
-            message_data = {
-                'sender_id': sender_id,
-                'receiver_id': receiver_id,
-                'message_type': 'file',
-                'encrypted_content': encrypted_db['encrypted'],
-                'encrypted_hmac': encrypted_db['hmac']
-            }
+            return True, "Pesan file berhasil dikirim"
+        
+        except Exception as e:
+            return False, f"Error sending file: {str(e)}"
+    
+    @staticmethod
+    def send_group_text(sender_id: str, group_id: str, message: str, encryption_key: str,
+                        notify: Notify = None) -> Tuple[bool, str]:
+        try:
+            def seal(content_key: str, binding: bytes) -> Dict:
+                compression, plaintext = compress_payload(message.encode('utf-8'), 'text')
+                encrypted_aes = encrypt_text_aes_ctr_bytes(plaintext, content_key)
+                return {'encrypted_content': seal_envelope(ENVELOPE_TEXT, encrypted_aes, binding, flags=compression)}
             
-            response = db.from_('messages').insert(message_data).execute()
+            Message._send_group(sender_id, group_id, 'text', encryption_key, seal, notify)
+            return True, "Pesan teks berhasil dikirim ke grup"
+        
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def send_group_image_steganography(sender_id: str, group_id: str, image_bytes: bytes,
+                                        secret_message: str, encryption_key: str,
+                                        notify: Notify = None) -> Tuple[bool, str]:
+        try:
+            def seal(content_key: str, binding: bytes) -> Dict:
+                stego_image = hide_message_in_image(image_bytes, secret_message, content_key)
+                return {'encrypted_content': seal_envelope(ENVELOPE_IMAGE, stego_image, binding)}
             
-            return True, "Pesan file berhasil dikirim"
+            Message._send_group(sender_id, group_id, 'image', encryption_key, seal, notify)
+            return True, "Pesan gambar dengan pesan tersembunyi berhasil dikirim ke grup"
+        
+        except Exception as e:
+            return False, f"Error sending image: {str(e)}"
+    
+    @staticmethod
+    def send_group_file(sender_id: str, group_id: str, file_bytes: Union[bytes, BinaryIO],
+                        filename: str, encryption_key: str, notify: Notify = None) -> Tuple[bool, str]:
+        try:
+            def seal(content_key: str, binding: bytes) -> Dict:
+                return {
+                    'encrypted_content': seal_file_stream(filename, iter_file_chunks(file_bytes), content_key, binding),
+                    'encrypted_preview': seal_envelope(ENVELOPE_PREVIEW, filename.encode('utf-8'), binding),
+                }
             
+            Message._send_group(sender_id, group_id, 'file', encryption_key, seal, notify)
+            return True, "Pesan file berhasil dikirim ke grup"
+        
         except Exception as e:
             return False, f"Error sending file: {str(e)}"
     
+    @staticmethod
+    def _is_file_stream(encrypted_content: Union[str, bytes]) -> bool:
+        return is_envelope(encrypted_content) and envelope_info(encrypted_content)[1] == ENVELOPE_FILE_STREAM
+    
+    @staticmethod
+    def get_filename(msg: Dict) -> str:
+        # Dari kolom encrypted_preview, isi file tidak perlu diambil
+        if msg.get('encrypted_preview'):
+            payload_type, payload = open_envelope(msg['encrypted_preview'], '', Message._content_binding(msg))
+            if payload_type != ENVELOPE_PREVIEW:
+                raise ValueError('Tipe pesan tidak sesuai')
+            return payload.decode('utf-8')
+        
+        # Baris lama tanpa preview: baca dari isi file sekali, simpan di dict pesan
+        if 'filename' not in msg:
+            head, encrypted_content = Message._file_content(msg)
+            if Message._is_file_stream(head):
+                # File stream: cukup dekripsi metadata, isi file tidak disentuh
+                msg['filename'] = read_file_stream_name(encrypted_content, Message._content_binding(msg))
+            else:
+                msg['filename'] = Message._open_file_content(msg, encrypted_content)[0]
+        return msg['filename']
+    
+    @staticmethod
+    def _file_content(msg: Dict) -> Tuple[Union[str, bytes], Union[str, bytes, Iterator[bytes]]]:
+        # (awal isi, isi) pesan file. Isi inline: teks envelope. Isi di object
+        # storage: chunk envelope biner langsung dari read_blob (blob lama berisi
+        # teks envelope didekode per blok), tidak disatukan di memori. Awal isi
+        # (chunk pertama) untuk membaca header envelope
+        if not msg.get('blob_ref'):
+            encrypted_content = Message.load_content(msg, keep=False)
+            return encrypted_content, encrypted_content
+        
+        chunks = read_blob(msg['blob_ref'], msg['blob_digest'])
+        first = next(chunks, b'')
+        if first.startswith(ENVELOPE_PREFIX.encode('ascii')):
+            chunks = b64_decode_chunks(chain([first[len(ENVELOPE_PREFIX):]], chunks))
+            first = next(chunks, b'')
+        if not Message._is_file_stream(first):
+            # File satu-blok dipakai utuh
+            encrypted_content = first + b''.join(chunks)
+            return encrypted_content, encrypted_content
+        return first, chain([first], chunks)
+    
+    @staticmethod
+    def _open_file_stream(msg: Dict, encrypted_content: Union[str, Iterator[bytes]]) -> Iterator[bytes]:
+        # Layer database dibuka per segmen -> stream AES-GCM terenkripsi user key
+        return open_file_stream(encrypted_content, msg.get('encrypted_hmac', ''), Message._content_binding(msg))[1]
+    
+    @staticmethod
+    def encrypted_file_chunks(msg: Dict) -> Iterator[bytes]:
+        # File yang masih terenkripsi user key (AES-GCM)
+        head, encrypted_content = Message._file_content(msg)
+        if Message._is_file_stream(head):
+            yield from Message._open_file_stream(msg, encrypted_content)
+            return
+        
+        yield Message._open_file_content(msg, encrypted_content)[1]
+    
+    @staticmethod
+    def _open_file_content(msg: Dict, encrypted_content: Union[str, bytes]) -> Tuple[str, bytes]:
+        # File satu-blok (v1 / ENVELOPE_FILE). Layer 1: Decrypt ChaCha20 -> (filename, file terenkripsi AES-GCM)
+        encrypted_hmac = msg.get('encrypted_hmac', '')
+        
+        if is_envelope(encrypted_content):
+            return unpack_file_payload(Message._open_payload(msg, ENVELOPE_FILE, encrypted_content))
+        
+        # Format v1 (legacy): JSON berisi filename + AES-GCM base64
+        file_data = json.loads(decrypt_from_database(encrypted_content, encrypted_hmac))
+        return file_data['filename'], base64.b64decode(file_data['encrypted_content'])
+    
+    @staticmethod
+    def decrypt_file_chunks(msg: Dict, encryption_key: str) -> Iterator[bytes]:
+        head, encrypted_content = Message._file_content(msg)
+        if Message._is_file_stream(head):
+            # Layer 1 + 2 didekripsi per segmen (memori terbatas ukuran chunk)
+            yield from decompress_stream(
+                envelope_compression(head),
+                decrypt_file_stream(
+                    Message._open_file_stream(msg, encrypted_content), Message._content_key(msg, encryption_key)
+                )
+            )
+            return
+        
+        # File satu-blok (v1 / ENVELOPE_FILE)
+        _, encrypted_file = Message._open_file_content(msg, encrypted_content)
+        yield decrypt_file_aes_gcm_bytes(encrypted_file, Message._content_key(msg, encryption_key))
+    
     @staticmethod
     def get_messages(user1_id: str, user2_id: str) -> List[Dict]:
         try:
             # Query messages antara dua user (both directions)
-            response = db.from_('messages').select('*').or_(
-                f'and(sender_id.eq.{user1_id},receiver_id.eq.{user2_id}),and(sender_id.eq.{user2_id},receiver_id.eq.{user1_id})'
-            ).order('created_at', desc=False).execute()
-            
-            return response.data if response.data else []
-            
+            return message_repository().list_conversation(user1_id, user2_id)
+        
         except:
             return []
+    
+    @staticmethod
+    def page_cursor(msg: Dict) -> Tuple[str, str]:
+        # Posisi pesan dalam urutan (created_at, id)
+        return msg['created_at'], msg['id']
+    
+    @staticmethod
+    def get_messages_page(user1_id: str, user2_id: str, before: Optional[Tuple[str, str]] = None,
+                          limit: int = 50, columns: str = '*') -> Tuple[List[Dict], bool]:
+        # Keyset (seek) pagination: halaman `limit` pesan terbaru sebelum `before`.
+        # Return (pesan urut lama -> baru, masih ada pesan lebih lama)
+        try:
+            # Ambil satu baris ekstra untuk mengetahui apakah masih ada halaman berikutnya
+            rows = message_repository().list_before(user1_id, user2_id, before, limit + 1, columns)
+            return list(reversed(rows[:limit])), len(rows) > limit
+        
+        except:
+            return [], False
+    
+    @staticmethod
+    def get_group_messages_page(group_id: str, user_id: str, before: Optional[Tuple[str, str]] = None,
+                                limit: int = 50, columns: str = '*') -> Tuple[List[Dict], bool]:
+        # Seperti get_messages_page, lewat salinan pesan grup milik user
+        try:
+            rows = message_repository().list_group_before(group_id, user_id, before, limit + 1, columns)
+            return list(reversed(rows[:limit])), len(rows) > limit
+        
+        except:
+            return [], False
+    
+    @staticmethod
+    def get_messages_after(user1_id: str, user2_id: str, after: Tuple[str, Optional[str]],
+                           limit: int = 50, columns: str = '*') -> Tuple[List[Dict], bool]:
+        # Kebalikan get_messages_page: pesan setelah `after`, urut lama -> baru.
+        # after = (created_at, None) mengambil semua pesan sejak created_at (inklusif)
+        try:
+            rows = message_repository().list_after(user1_id, user2_id, after, limit + 1, columns)
+            return rows[:limit], len(rows) > limit
+        
+        except:
+            return [], False
+    
+    @staticmethod
+    def get_group_messages_after(group_id: str, user_id: str, after: Tuple[str, Optional[str]],
+                                 limit: int = 50, columns: str = '*') -> Tuple[List[Dict], bool]:
+        try:
+            rows = message_repository().list_group_after(group_id, user_id, after, limit + 1, columns)
+            return rows[:limit], len(rows) > limit
+        
+        except:
+            return [], False
@@ -0,0 +1,225 @@
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from services.repository import message_repository, conversation_repository
+from config.settings import Settings
+
+PENDING = 'pending'
+RETRYING = 'retrying'
+SENT = 'sent'
+FAILED = 'failed'
+
+# notify(None) setelah pesan tersimpan, notify(error) jika pesan gagal permanen
+Notify = Callable[[Optional[str]], None]
+
+
+def _is_permanent(error: Exception) -> bool:
+    # Error yang tidak hilang dengan retry: payload/kolom tidak valid, constraint,
+    # skema. PostgREST APIError membawa SQLSTATE (22 data, 23 constraint,
+    # 42 skema) atau kode PGRST1xx/2xx (request/skema tidak valid)
+    if isinstance(error, (ValueError, TypeError, KeyError, sqlite3.IntegrityError)):
+        return True
+    code = str(getattr(error, 'code', None) or '')
+    return code[:2] in ('22', '23', '42') or code.startswith(('PGRST1', 'PGRST2'))
+
+
+class Outbox:
+    # Antrian pesan terenkripsi yang belum tersimpan, satu per proses. send_*
+    # hanya mengenkripsi lalu enqueue(); thread flusher menggabungkan baris
+    # yang berdekatan menjadi satu insert batch. Error sementara (jaringan) ->
+    # retry dengan exponential backoff, maksimal OUTBOX_MAX_ATTEMPTS; insert
+    # idempotent per id sehingga retry setelah timeout tidak menggandakan pesan.
+    # Error permanen -> batch dibagi dua sampai baris yang bermasalah terisolasi,
+    # baris lain tetap terkirim. Baris yang gagal dipindah ke daftar gagal dan
+    # notify(error) dipanggil. Antrian hanya di memori: pesan yang belum
+    # terkirim hilang jika proses berhenti.
+
+    SENT_HISTORY = 1000  # id terkirim yang diingat untuk status()
+    FAILED_HISTORY = 200  # pesan gagal yang masih ditampilkan (sampai dismiss())
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue: List[Dict] = []  # {'row', 'status', 'attempts', 'error', 'notify', 'queued_at'}
+        self._sent: OrderedDict = OrderedDict()
+        self._failed: OrderedDict = OrderedDict()  # id -> entri dengan status FAILED
+        self._retry_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows_sent = 0
+        self.retries = 0
+        self.failures = 0
+
+    def enqueue(self, row: Dict, notify: Notify = None):
+        # notify dipanggil dari thread flusher setelah baris tersimpan atau gagal permanen
+        with self._condition:
+            self._queue.append({
+                'row': row, 'status': PENDING, 'attempts': 0, 'error': None,
+                'notify': notify, 'queued_at': time.monotonic(),
+            })
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='outbox-flusher', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self, sender_id: str, peer_id: str) -> List[Dict]:
+        # Entri yang belum tersimpan untuk satu percakapan (urut kirim), termasuk
+        # yang gagal (status FAILED, sampai dismiss()); pesan grup diwakili
+        # salinan milik pengirim
+        def in_conversation(row: Dict) -> bool:
+            if row.get('group_id'):
+                return row['group_id'] == peer_id and row['receiver_id'] == sender_id
+            return row['receiver_id'] == peer_id
+
+        with self._condition:
+            entries = list(self._failed.values()) + self._queue
+            entries.sort(key=lambda entry: entry['queued_at'])
+            return [
+                dict(entry) for entry in entries
+                if entry['row']['sender_id'] == sender_id and in_conversation(entry['row'])
+            ]
+
+    def dismiss(self, message_id: str):
+        # Hapus pesan gagal dari daftar (sudah dilihat user)
+        with self._condition:
+            self._failed.pop(message_id, None)
+
+    def status(self, message_id: str) -> Optional[str]:
+        with self._condition:
+            if message_id in self._sent:
+                return SENT
+            if message_id in self._failed:
+                return FAILED
+            for entry in self._queue:
+                if entry['row']['id'] == message_id:
+                    return entry['status']
+        return None
+
+    def flush(self, timeout: float = None) -> bool:
+        # Tunggu sampai antrian kosong (benchmark, shutdown). False jika timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._retry_at = 0.0
+            self._condition.notify_all()
+            while self._queue:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _next_batch(self) -> List[Dict]:
+        batch, size = [], 0
+        for entry in self._queue:
+            row_size = len(entry['row'].get('encrypted_content') or '')
+            if batch and (len(batch) >= Settings.OUTBOX_BATCH_SIZE or size + row_size > Settings.OUTBOX_BATCH_BYTES):
+                break
+            batch.append(entry)
+            size += row_size
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or time.monotonic() < self._retry_at:
+                    wait = None if not self._queue else self._retry_at - time.monotonic()
+                    self._condition.wait(wait)
+            # Beri kesempatan kiriman berikutnya ikut batch yang sama
+            time.sleep(Settings.OUTBOX_FLUSH_DELAY_SECONDS)
+            with self._condition:
+                batch = self._next_batch()
+            self._send(batch)
+
+    def _send(self, batch: List[Dict]):
+        try:
+            inserted = message_repository().insert_many([entry['row'] for entry in batch])
+        except Exception as e:
+            if not _is_permanent(e):
+                self._retry(batch, e)
+            elif len(batch) > 1:
+                # Insert batch atomik: satu baris buruk menggagalkan semuanya.
+                # Bagi dua agar baris lain tetap terkirim
+                middle = len(batch) // 2
+                self._send(batch[:middle])
+                self._send(batch[middle:])
+            else:
+                self._fail(batch, e)
+            return
+        self._delivered(batch, inserted)
+
+    def _retry(self, batch: List[Dict], error: Exception):
+        with self._condition:
+            for entry in batch:
+                entry['attempts'] += 1
+                entry['status'] = RETRYING
+                entry['error'] = str(error)
+            exhausted = [entry for entry in batch if entry['attempts'] >= Settings.OUTBOX_MAX_ATTEMPTS]
+            attempts = max(entry['attempts'] for entry in batch)
+            self.retries += 1
+            delay = min(Settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), Settings.OUTBOX_RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay * random.uniform(0.8, 1.2)
+        if exhausted:
+            self._fail(exhausted, error)
+
+    def _fail(self, batch: List[Dict], error: Exception):
+        # Keluarkan dari antrian agar tidak menahan pesan lain; UI diberi tahu lewat notify(error)
+        message = str(error) or error.__class__.__name__
+        with self._condition:
+            for entry in batch:
+                self._queue.remove(entry)
+                entry['status'] = FAILED
+                entry['error'] = message
+                self._failed[entry['row']['id']] = entry
+            while len(self._failed) > self.FAILED_HISTORY:
+                self._failed.popitem(last=False)
+            self.failures += len(batch)
+            self._condition.notify_all()
+        self._notify(batch, message)
+
+    def _delivered(self, batch: List[Dict], inserted: List[Dict]):
+        # Ringkasan percakapan hanya untuk baris baru (retry tidak menghitung dua kali)
+        for row in inserted:
+            try:
+                conversation_repository().record_message(
+                    row['sender_id'], row['receiver_id'], row['message_type'], row['created_at'], row.get('group_id')
+                )
+            except Exception:
+                pass
+
+        with self._condition:
+            for entry in batch:
+                self._queue.remove(entry)
+                self._sent[entry['row']['id']] = True
+            while len(self._sent) > self.SENT_HISTORY:
+                self._sent.popitem(last=False)
+            self.batches += 1
+            self.rows_sent += len(batch)
+            self._retry_at = 0.0
+            self._condition.notify_all()
+        self._notify(batch, None)
+
+    @staticmethod
+    def _notify(batch: List[Dict], error: Optional[str]):
+        notified = set()
+        for entry in batch:
+            if entry['notify'] and entry['notify'] not in notified:
+                notified.add(entry['notify'])
+                try:
+                    entry['notify'](error)
+                except Exception:
+                    pass
+
+
+_OUTBOX: Optional[Outbox] = None
+_OUTBOX_LOCK = threading.Lock()
+
+
+def outbox() -> Outbox:
+    global _OUTBOX
+    if _OUTBOX is None:
+        with _OUTBOX_LOCK:
+            if _OUTBOX is None:
+                _OUTBOX = Outbox()
+    return _OUTBOX
@@ -1,10 +1,11 @@
 import uuid
 from datetime import datetime
 from typing import Tuple, List, Dict
-from services.database_service import db
+from services.repository import user_repository
+from models.user_directory import UserDirectory, user_directory
 from services.crypto_service import (
     encrypt_field, decrypt_field, generate_hmac,
-    hash_password_bcrypt, verify_password_bcrypt,
+    hash_password, verify_password, password_needs_rehash, rehash_password_async,
     encrypt_for_database, decrypt_from_database
 )
 
@@ -22,17 +23,17 @@ class User:
             
             # Check apakah email sudah terdaftar
             email_hmac_check = generate_hmac(email)
-            existing = db.from_('users').select('id').eq('email_hmac', email_hmac_check).execute()
+            existing = user_repository().find_by_email_hmac(email_hmac_check, columns='id')
             
-            if existing.data:
+            if existing:
                 raise Exception('Email sudah terdaftar')
             
             # Enkripsi data
             email_enc = encrypt_field(email)
             username_enc = encrypt_field(username)
             
-            # Password: Hash dengan Bcrypt, lalu enkripsi hash-nya
-            password_bcrypt = hash_password_bcrypt(password)
+            # Password: Hash dengan Bcrypt (di pool hashing), lalu enkripsi hash-nya
+            password_bcrypt = hash_password(password)
             password_db = encrypt_for_database(password_bcrypt)
             
             # Generate user ID
@@ -51,11 +52,11 @@ class User:
             }
             
             # Insert ke database
-            response = db.from_('users').insert(user_data).execute()
-            
-            if not response.data:
+            if not user_repository().insert(user_data):
                 raise Exception('Gagal membuat user')
             
+            user_directory().invalidate()
+            
             return True, "Registrasi berhasil! Silakan login."
             
         except Exception as e:
@@ -66,22 +67,24 @@ class User:
         try:
             # Cari user by email HMAC
             email_hmac_check = generate_hmac(email)
-            response = db.from_('users').select('*').eq('email_hmac', email_hmac_check).execute()
+            user_row = user_repository().find_by_email_hmac(email_hmac_check)
             
-            if not response.data:
+            if not user_row:
                 raise Exception('Email atau password salah')
             
-            user_row = response.data[0]
-            
             # Dekripsi password hash dari database
             encrypted_password = user_row['password_hash']
             password_hmac = user_row['password_hmac']
             stored_hash = decrypt_from_database(encrypted_password, password_hmac)
             
-            # Verify password dengan Bcrypt
-            if not verify_password_bcrypt(password, stored_hash):
+            # Verify password dengan Bcrypt (di pool hashing)
+            if not verify_password(password, stored_hash):
                 raise Exception('Email atau password salah')
             
+            # Cost factor berubah: rehash transparan di background
+            if password_needs_rehash(stored_hash):
+                rehash_password_async(password, lambda new_hash: User._update_password_hash(user_row['id'], new_hash))
+            
             # Dekripsi data user
             decrypted_email = decrypt_field(
                 user_row['email'],
@@ -107,15 +110,39 @@ class User:
             return False, str(e)
     
     @staticmethod
-    def get_all() -> List[Dict]:
+    def _update_password_hash(user_id: str, password_bcrypt: str):
+        password_db = encrypt_for_database(password_bcrypt)
+        user_repository().update(user_id, {
+            'password_hash': password_db['encrypted'],
+            'password_hmac': password_db['hmac']
+        })
+    
+    @staticmethod
+    def find(query: str) -> List[Dict]:
+        # Exact match lewat kolom HMAC (tanpa scan tabel users):
+        # email jika mengandung '@', selain itu username
         try:
-            response = db.from_('users').select('*').execute()
-            
-            if not response.data:
+            query = query.strip()
+            if not query:
                 return []
             
+            query_hmac = generate_hmac(query)
+            if '@' in query:
+                row = user_repository().find_by_email_hmac(query_hmac, columns=UserDirectory.COLUMNS)
+                rows = [row] if row else []
+            else:
+                rows = user_repository().find_by_username_hmac(query_hmac, columns=UserDirectory.COLUMNS)
+            
+            return user_directory().remember(rows)
+            
+        except:
+            return []
+    
+    @staticmethod
+    def get_all() -> List[Dict]:
+        try:
             users = []
-            for user_row in response.data:
+            for user_row in user_repository().list_all():
                 try:
                     decrypted_email = decrypt_field(
                         user_row['email'],
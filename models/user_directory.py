@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from services.repository import user_repository
+from services.crypto_service import decrypt_field
+from config.settings import Settings
+
+
+class UserDirectory:
+    # Data user untuk sidebar, dipakai bersama semua sesi dalam satu proses.
+    # Hanya kolom username yang diambil dan username didekripsi sekali per
+    # user; email diambil per user saat diminta. list_users() (seluruh tabel)
+    # di-cache per TTL; get_users() hanya mengambil id yang belum dikenal.
+
+    COLUMNS = 'id,username,username_hmac'
+
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl = Settings.USER_DIRECTORY_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._rows: List[Dict] = []
+        self._users: Optional[List[Dict]] = None  # Hasil dekripsi _rows
+        self._loaded_at: Optional[float] = None
+        self._usernames: Dict[str, Tuple[str, str]] = {}  # id -> (ciphertext, username)
+        self._emails: Dict[str, str] = {}
+
+    def invalidate(self):
+        # Dipanggil setelah registrasi; proses lain menyusul setelah TTL
+        with self._lock:
+            self._loaded_at = None
+
+    def _rows_fresh(self) -> List[Dict]:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            self.hits += 1
+            return self._rows
+
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self.misses += 1
+                self._rows = user_repository().list_all(columns=self.COLUMNS)
+                self._users = None
+                self._loaded_at = time.monotonic()
+            return self._rows
+
+    def _username(self, row: Dict) -> Optional[str]:
+        # Ciphertext sama dengan sebelumnya -> pakai hasil dekripsi yang lama
+        cached = self._usernames.get(row['id'])
+        if cached and cached[0] == row['username']:
+            return cached[1]
+        try:
+            username = decrypt_field(row['username'], row['username_hmac'])
+        except Exception:
+            return None
+        self._usernames[row['id']] = (row['username'], username)
+        return username
+
+    def list_users(self, exclude_id: str = None) -> List[Dict]:
+        rows = self._rows_fresh()
+        users = self._users
+        if users is None:
+            users = self.remember(rows)
+            self._users = users
+        return [dict(user) for user in users if user['id'] != exclude_id]
+
+    def remember(self, rows: List[Dict]) -> List[Dict]:
+        # Baris users (kolom COLUMNS) -> [{'id', 'username'}], username di-cache
+        users = []
+        for row in rows:
+            username = self._username(row)
+            if username is not None:
+                users.append({'id': row['id'], 'username': username})
+        return users
+
+    def get_users(self, user_ids: List[str]) -> List[Dict]:
+        # Urutan hasil = urutan user_ids; id yang tidak ada dilewati
+        missing = [user_id for user_id in user_ids if user_id not in self._usernames]
+        if missing:
+            self.misses += 1
+            self.remember(user_repository().find_by_ids(missing, columns=self.COLUMNS))
+        else:
+            self.hits += 1
+        return [
+            {'id': user_id, 'username': self._usernames[user_id][1]}
+            for user_id in user_ids if user_id in self._usernames
+        ]
+
+    def email(self, user_id: str) -> Optional[str]:
+        if user_id not in self._emails:
+            row = user_repository().find_by_id(user_id, columns='email,email_hmac')
+            if not row:
+                return None
+            try:
+                self._emails[user_id] = decrypt_field(row['email'], row['email_hmac'])
+            except Exception:
+                return None
+        return self._emails[user_id]
+
+
+_DIRECTORY: Optional[UserDirectory] = None
+_DIRECTORY_LOCK = threading.Lock()
+
+
+def user_directory() -> UserDirectory:
+    global _DIRECTORY
+    if _DIRECTORY is None:
+        with _DIRECTORY_LOCK:
+            if _DIRECTORY is None:
+                _DIRECTORY = UserDirectory()
+    return _DIRECTORY
@@ -1,2 +1,8 @@
-from .database_service import db
 from .crypto_service import *
+
+def __getattr__(name):
+    # `db` dibuat saat pertama diakses, lihat database_service
+    if name == 'db':
+        from .database_service import db
+        return db
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,258 @@
+import hashlib
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from config.settings import Settings
+
+# Payload besar (file, gambar stego) disimpan sebagai objek terpisah, dialamatkan
+# dengan SHA-256 dari ciphertext-nya: upload ulang payload yang sama tidak
+# menambah objek, dan isi yang diunduh bisa diverifikasi terhadap digest.
+
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_ref(digest: str) -> str:
+    # Dua karakter pertama sebagai prefix agar satu direktori tidak terlalu besar
+    return f'{digest[:2]}/{digest}'
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def put(self, ref: str, data: bytes):
+        # Idempotent: ref yang sama selalu berisi data yang sama
+        ...
+
+    @abstractmethod
+    def put_file(self, ref: str, path: str):
+        # Seperti put, isi dibaca dari file lokal (payload besar tidak dimuat ke memori)
+        ...
+
+    @abstractmethod
+    def stream(self, ref: str) -> Iterator[bytes]:
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    # Stand-in filesystem untuk backend sqlite dan pengujian offline
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.root, *ref.split('/'))
+
+    def put(self, ref: str, data: bytes):
+        path = self._path(ref)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, [data])
+
+    def put_file(self, ref: str, path: str):
+        target = self._path(ref)
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(path, 'rb') as source:
+            _write_atomic(target, iter(lambda: source.read(Settings.STREAM_CHUNK_SIZE), b''))
+
+    def stream(self, ref: str) -> Iterator[bytes]:
+        try:
+            handle = open(self._path(ref), 'rb')
+        except FileNotFoundError:
+            raise Exception('Lampiran tidak ditemukan di storage')
+        with handle:
+            while True:
+                chunk = handle.read(Settings.STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class SupabaseBlobStore(BlobStore):
+    # Bucket Supabase Storage (private); download di-stream lewat REST API
+    # memakai connection pool yang sama dengan client database
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def put(self, ref: str, data: Union[bytes, BinaryIO]):
+        from services.database_service import DatabaseService
+        DatabaseService().client.storage.from_(self.bucket).upload(
+            ref, data, {'content-type': 'application/octet-stream', 'upsert': 'true'}
+        )
+
+    def put_file(self, ref: str, path: str):
+        # Handle dibuka (dan ditutup) di sini: storage3 tidak menutup file yang
+        # dibukanya sendiri dari path. BufferedReader di-upload sebagai stream
+        with open(path, 'rb') as source:
+            self.put(ref, source)
+
+    def stream(self, ref: str) -> Iterator[bytes]:
+        url = f"{Settings.SUPABASE_URL.rstrip('/')}/storage/v1/object/{self.bucket}/{ref}"
+        headers = {'apikey': Settings.SUPABASE_KEY, 'Authorization': f'Bearer {Settings.SUPABASE_KEY}'}
+        from services.database_service import http_client
+        with http_client().stream('GET', url, headers=headers) as response:
+            if response.status_code == 404:
+                raise Exception('Lampiran tidak ditemukan di storage')
+            response.raise_for_status()
+            yield from response.iter_bytes(Settings.STREAM_CHUNK_SIZE)
+
+
+def _write_atomic(path: str, chunks) -> int:
+    # Tulis ke file sementara di direktori yang sama lalu rename (tidak ada file setengah jadi)
+    handle = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False)
+    size = 0
+    try:
+        with handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                size += len(chunk)
+        os.replace(handle.name, path)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return size
+
+
+class BlobCache:
+    # Cache lokal per digest untuk store remote. Unduhan di-stream ke disk,
+    # diverifikasi terhadap digest, lalu dibaca per chunk. Jika melebihi
+    # max_bytes, file yang paling lama tidak dipakai dihapus.
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    def fetch(self, store: BlobStore, ref: str, digest: str) -> str:
+        # Return path file lokal yang isinya sudah terverifikasi
+        path = self._path(digest)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            return path
+
+        self.misses += 1
+        hasher = hashlib.sha256()
+
+        def verified_chunks():
+            for chunk in store.stream(ref):
+                hasher.update(chunk)
+                yield chunk
+            if hasher.hexdigest() != digest:
+                raise Exception('Digest lampiran tidak cocok - data mungkin telah diubah')
+
+        _write_atomic(path, verified_chunks())
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.is_file() and len(entry.name) == 64 and entry.path != keep:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    # Sudah dihapus, atau (Windows) masih dibuka sesi lain: lewati
+                    pass
+
+
+_STORE: Optional[BlobStore] = None
+_CACHE: Optional[BlobCache] = None
+_LOCK = threading.Lock()
+
+
+def _backend() -> str:
+    # Default mengikuti STORAGE_BACKEND: supabase -> Supabase Storage, sqlite -> filesystem lokal
+    return Settings.BLOB_BACKEND or ('local' if Settings.STORAGE_BACKEND == 'sqlite' else 'supabase')
+
+
+def blob_store() -> BlobStore:
+    global _STORE
+    with _LOCK:
+        if _STORE is None:
+            backend = _backend()
+            if backend == 'supabase':
+                _STORE = SupabaseBlobStore(Settings.BLOB_BUCKET)
+            elif backend == 'local':
+                _STORE = LocalBlobStore(Settings.BLOB_LOCAL_PATH)
+            else:
+                raise ValueError(f"BLOB_BACKEND tidak dikenal: {backend}")
+        return _STORE
+
+
+def blob_cache() -> BlobCache:
+    global _CACHE
+    with _LOCK:
+        if _CACHE is None:
+            _CACHE = BlobCache(Settings.BLOB_CACHE_PATH, Settings.BLOB_CACHE_MAX_BYTES)
+        return _CACHE
+
+
+def put_blob(data: bytes) -> Tuple[str, str]:
+    # Return (ref, digest)
+    digest = blob_digest(data)
+    ref = blob_ref(digest)
+    blob_store().put(ref, data)
+    return ref, digest
+
+
+def put_blob_stream(chunks: Iterable[bytes]) -> Tuple[str, str, int]:
+    # Seperti put_blob untuk payload yang dihasilkan per chunk: ditulis ke file
+    # sementara sambil di-hash, lalu di-upload dari file. Return (ref, digest, size)
+    hasher = hashlib.sha256()
+
+    def hashed():
+        for chunk in chunks:
+            hasher.update(chunk)
+            yield chunk
+
+    handle = tempfile.NamedTemporaryFile(delete=False)
+    handle.close()
+    try:
+        size = _write_atomic(handle.name, hashed())
+        digest = hasher.hexdigest()
+        ref = blob_ref(digest)
+        blob_store().put_file(ref, handle.name)
+    finally:
+        if os.path.exists(handle.name):
+            os.unlink(handle.name)
+    return ref, digest, size
+
+
+def read_blob(ref: str, digest: str) -> Iterator[bytes]:
+    # Digest selalu diperiksa sebelum chunk pertama diberikan ke pemanggil.
+    # Store lokal: file di-hash dulu lalu dibaca ulang (objek tidak pernah
+    # ditulis ulang, memori tetap sebesar satu chunk); store remote: diunduh
+    # dan diverifikasi ke cache disk oleh BlobCache.fetch
+    store = blob_store()
+    if isinstance(store, LocalBlobStore):
+        hasher = hashlib.sha256()
+        for chunk in store.stream(ref):
+            hasher.update(chunk)
+        if hasher.hexdigest() != digest:
+            raise Exception('Digest lampiran tidak cocok - data mungkin telah diubah')
+        yield from store.stream(ref)
+        return
+
+    with open(blob_cache().fetch(store, ref, digest), 'rb') as handle:
+        while chunk := handle.read(Settings.STREAM_CHUNK_SIZE):
+            yield chunk
@@ -2,13 +2,25 @@ import base64
 import os
 import hmac
 import hashlib
-from typing import Dict, Optional
+import threading
+import time
+import zlib
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305, AESGCM
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidTag
 import bcrypt
 from config.settings import Settings
 
+try:
+    import zstandard
+except ImportError:  # opsional, fallback ke zlib
+    zstandard = None
+
 # Load keys from environment variables
 _HMAC_KEY = Settings.HMAC_SECRET_KEY.encode('utf-8')
 _DATABASE_MASTER_KEY = Settings.DATABASE_MASTER_KEY
@@ -23,6 +35,29 @@ def _sha256_bytes(text: str) -> bytes:
 def _bytes_equal(a: bytes, b: bytes) -> bool:
     return hmac.compare_digest(a, b)
 
+# ============================================================================
+# KEY CONTEXT REGISTRY
+# ============================================================================
+
+# Key database di-derive sekali saat import (bukan di setiap pemanggilan)
+_DATABASE_KEY = _sha256_bytes(_DATABASE_MASTER_KEY)
+_DATABASE_AEAD = ChaCha20Poly1305(_DATABASE_KEY)
+_HMAC_BASE = hmac.new(_HMAC_KEY, digestmod=hashlib.sha256)
+
+
+class _UserKeyContext(NamedTuple):
+    aes_key: bytes   # SHA-256(user_key) - AES-256-CTR / AES-256-GCM
+    aesgcm: AESGCM   # AES-256-GCM object siap pakai
+    chacha: ChaCha20Poly1305  # ChaCha20-Poly1305 (suite stego alternatif)
+    des_key: bytes   # SHA-256(user_key)[:24] - 3DES (stego lama)
+
+
+@lru_cache(maxsize=Settings.KEY_CONTEXT_CACHE_SIZE)
+def _user_key_context(user_key: str) -> _UserKeyContext:
+    # LRU terbatas: satu render percakapan memakai kunci yang sama berkali-kali
+    key = _sha256_bytes(user_key)
+    return _UserKeyContext(aes_key=key, aesgcm=AESGCM(key), chacha=ChaCha20Poly1305(key), des_key=key[:24])
+
 # ============================================================================
 # HMAC-SHA256 (DATABASE INTEGRITY)
 # ============================================================================
@@ -31,12 +66,10 @@ def generate_hmac(data: str) -> str:
     if not data:
         raise ValueError('Data tidak boleh kosong')
 
-    mac = hmac.new(
-        _HMAC_KEY,
-        data.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-    return mac
+    # Copy dari state HMAC yang sudah di-key (hemat key schedule per panggilan)
+    mac = _HMAC_BASE.copy()
+    mac.update(data.encode('utf-8'))
+    return mac.hexdigest()
 
 def verify_hmac(data: str, hmac_value: str) -> bool:
     try:
@@ -49,14 +82,14 @@ def verify_hmac(data: str, hmac_value: str) -> bool:
 # BCRYPT PASSWORD HASHING
 # ============================================================================
 
-def hash_password_bcrypt(password: str) -> str:
+def hash_password_bcrypt(password: str, rounds: int = None) -> str:
     if not password or len(password) < 6:
         raise ValueError('Password harus minimal 6 karakter')
 
-    # Bcrypt dengan cost factor 12 (2^12 iterations)
+    # Bcrypt dengan cost factor dari konfigurasi (default 12 = 2^12 iterations)
     hashed = bcrypt.hashpw(
         password.encode('utf-8'),
-        bcrypt.gensalt(rounds=12)
+        bcrypt.gensalt(rounds=rounds or Settings.BCRYPT_ROUNDS)
     )
     return hashed.decode('utf-8')
 
@@ -69,6 +102,109 @@ def verify_password_bcrypt(password: str, hashed: str) -> bool:
     except:
         return False
 
+def bcrypt_cost(hashed: str) -> int:
+    # Format: $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        raise ValueError('Format hash bcrypt tidak valid')
+
+def password_needs_rehash(hashed: str) -> bool:
+    return bcrypt_cost(hashed) != Settings.BCRYPT_ROUNDS
+
+
+class _PasswordHashPool:
+    # Bcrypt melepas GIL, jadi thread pool kecil cukup. Jumlah worker membatasi
+    # berapa core yang boleh dipakai hashing sekaligus, sehingga lonjakan login
+    # tidak memperlambat rerun sesi lain di proses yang sama.
+    def __init__(self, workers: int, queue_limit: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._workers = workers
+        self._queue_limit = queue_limit
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._max_pending = 0
+        self._rejected = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, name: str, wait: float, run: float):
+        stats = self._stats.setdefault(name, {'count': 0, 'wait_total': 0.0, 'run_total': 0.0, 'run_max': 0.0})
+        stats['count'] += 1
+        stats['wait_total'] += wait
+        stats['run_total'] += run
+        stats['run_max'] = max(stats['run_max'], run)
+
+    def submit(self, name: str, func: Callable, *args):
+        with self._lock:
+            if self._pending >= self._queue_limit:
+                self._rejected += 1
+                raise Exception('Server sedang sibuk, silakan coba lagi sebentar lagi')
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+        queued_at = time.perf_counter()
+
+        def _task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._record(name, started_at - queued_at, finished_at - started_at)
+
+        return self._executor.submit(_task)
+
+    def run(self, name: str, func: Callable, *args):
+        return self.submit(name, func, *args).result()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {
+                name: {
+                    'count': int(stats['count']),
+                    'avg_wait_ms': stats['wait_total'] / stats['count'] * 1000,
+                    'avg_run_ms': stats['run_total'] / stats['count'] * 1000,
+                    'max_run_ms': stats['run_max'] * 1000
+                }
+                for name, stats in self._stats.items()
+            }
+            return {
+                'workers': self._workers,
+                'bcrypt_rounds': Settings.BCRYPT_ROUNDS,
+                'queue_depth': self._pending - self._running,
+                'running': self._running,
+                'max_queue_depth': max(0, self._max_pending - self._workers),
+                'rejected': self._rejected,
+                'operations': operations
+            }
+
+
+_PASSWORD_POOL = _PasswordHashPool(Settings.PASSWORD_HASH_WORKERS, Settings.PASSWORD_HASH_QUEUE_LIMIT)
+
+def hash_password(password: str) -> str:
+    # Hashing di pool terbatas, bukan langsung di thread script Streamlit
+    return _PASSWORD_POOL.run('hash', hash_password_bcrypt, password)
+
+def verify_password(password: str, hashed: str) -> bool:
+    return _PASSWORD_POOL.run('verify', verify_password_bcrypt, password, hashed)
+
+def rehash_password_async(password: str, on_done: Callable[[str], None]):
+    # Rehash di background (cost factor berubah); login tidak menunggu hasilnya
+    def _rehash():
+        on_done(hash_password_bcrypt(password))
+    try:
+        _PASSWORD_POOL.submit('rehash', _rehash)
+    except Exception:
+        pass  # pool penuh: coba lagi di login berikutnya
+
+def password_pool_metrics() -> Dict[str, Any]:
+    return _PASSWORD_POOL.metrics()
+
 # ============================================================================
 # CHACHA20-POLY1305 (FIELD-LEVEL ENCRYPTION)
 # ============================================================================
@@ -77,11 +213,8 @@ def encrypt_field(plain_value: str) -> Dict[str, str]:
     if plain_value == '':
         return {'encrypted': '', 'hmac': ''}
 
-    # Generate 256-bit key dari database master key
-    key = _sha256_bytes(_DATABASE_MASTER_KEY)
-
-    # ChaCha20-Poly1305 AEAD
-    aead = ChaCha20Poly1305(key)
+    # ChaCha20-Poly1305 AEAD (key dari registry)
+    aead = _DATABASE_AEAD
 
     # Generate random 96-bit nonce (12 bytes)
     nonce = os.urandom(12)
@@ -109,9 +242,7 @@ def decrypt_field(encrypted_b64: str, hmac_value: str) -> str:
     if not encrypted_b64 or not hmac_value:
         return ''
 
-    # Generate key
-    key = _sha256_bytes(_DATABASE_MASTER_KEY)
-    aead = ChaCha20Poly1305(key)
+    aead = _DATABASE_AEAD
 
     # Decode Base64
     combined = base64.b64decode(encrypted_b64)
@@ -136,9 +267,7 @@ def encrypt_for_database(data: str) -> Dict[str, str]:
     if not data:
         raise ValueError('Data tidak boleh kosong')
 
-    # Generate 256-bit key
-    key = _sha256_bytes(_DATABASE_MASTER_KEY)
-    chacha = ChaCha20Poly1305(key)
+    chacha = _DATABASE_AEAD
 
     # Generate random nonce (12 bytes untuk ChaCha20-Poly1305)
     nonce = os.urandom(12)
@@ -169,9 +298,7 @@ def decrypt_from_database(encrypted_b64: str, hmac_value: str) -> str:
     # Verify HMAC first
     if not verify_hmac(encrypted_b64, hmac_value):
         raise Exception('Verifikasi HMAC gagal - data mungkin telah diubah')
-    # Generate key
-    key = _sha256_bytes(_DATABASE_MASTER_KEY)
-    chacha = ChaCha20Poly1305(key)
+    chacha = _DATABASE_AEAD
 
     # Decode
     combined = base64.b64decode(encrypted_b64)
@@ -188,6 +315,355 @@ def decrypt_from_database(encrypted_b64: str, hmac_value: str) -> str:
 
     return plaintext.decode('utf-8')
 
+# ============================================================================
+# COMPRESSION (SEBELUM ENKRIPSI)
+# ============================================================================
+
+# Algoritma dicatat di byte flags envelope v3 / header stego v3 (bit 0-1).
+# Ciphertext tidak bisa dikompresi, jadi kompresi harus sebelum enkripsi.
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_FLAG_MASK = 0x03
+
+_COMPRESSION_NAMES = {'zlib': COMPRESSION_ZLIB, 'zstd': COMPRESSION_ZSTD, 'none': COMPRESSION_NONE}
+_ENTROPY_SAMPLE_SIZE = 4096
+
+# Format yang isinya sudah terkompresi
+_COMPRESSED_EXTENSIONS = frozenset({
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst', '.br',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac',
+    '.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.jar', '.apk'
+})
+_COMPRESSED_MAGIC = (
+    b'PK\x03\x04', b'\x1f\x8b', b'BZh', b'\xfd7zXZ', b'7z\xbc\xaf', b'Rar!', b'\x28\xb5\x2f\xfd',
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF8'
+)
+
+_COMPRESSION_STATS: Dict[str, Dict[str, int]] = {}
+_COMPRESSION_STATS_LOCK = threading.Lock()
+
+def _compression_algorithm() -> int:
+    name = Settings.COMPRESSION
+    if name == 'auto':
+        return COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_ZLIB
+    if name not in _COMPRESSION_NAMES:
+        raise ValueError(f'Algoritma kompresi tidak dikenal: {name}')
+    if name == 'zstd' and zstandard is None:
+        raise ValueError('COMPRESSION=zstd membutuhkan paket zstandard')
+    return _COMPRESSION_NAMES[name]
+
+def _sample_entropy(sample: bytes) -> float:
+    import numpy as np
+
+    counts = np.bincount(np.frombuffer(sample, dtype=np.uint8), minlength=256)
+    probabilities = counts[counts > 0] / len(sample)
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+def should_compress(data: bytes, filename: Optional[str] = None) -> bool:
+    # Heuristik murah: ukuran minimum, format yang sudah terkompresi, entropi sampel awal
+    if len(data) < Settings.COMPRESSION_MIN_SIZE:
+        return False
+    if filename and os.path.splitext(filename)[1].lower() in _COMPRESSED_EXTENSIONS:
+        return False
+    if data.startswith(_COMPRESSED_MAGIC):
+        return False
+    return _sample_entropy(data[:_ENTROPY_SAMPLE_SIZE]) <= Settings.COMPRESSION_MAX_ENTROPY
+
+def _compressor(algorithm: int):
+    if algorithm == COMPRESSION_ZLIB:
+        return zlib.compressobj()
+    return zstandard.ZstdCompressor().compressobj()
+
+def _decompressor(algorithm: int):
+    if algorithm == COMPRESSION_ZLIB:
+        return zlib.decompressobj()
+    if algorithm == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError('Data dikompresi dengan zstd - install paket zstandard')
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f'Algoritma kompresi tidak dikenal: {algorithm}')
+
+def _record_compression(label: str, original_size: int, stored_size: int):
+    with _COMPRESSION_STATS_LOCK:
+        stats = _COMPRESSION_STATS.setdefault(
+            label, {'count': 0, 'compressed': 0, 'original_bytes': 0, 'stored_bytes': 0}
+        )
+        stats['count'] += 1
+        stats['compressed'] += stored_size < original_size
+        stats['original_bytes'] += original_size
+        stats['stored_bytes'] += stored_size
+
+def compression_metrics() -> Dict[str, Dict[str, Any]]:
+    # Rasio per tipe pesan (text / file / stego) sejak proses dimulai
+    with _COMPRESSION_STATS_LOCK:
+        return {
+            label: {
+                **stats,
+                'ratio': round(stats['stored_bytes'] / stats['original_bytes'], 3) if stats['original_bytes'] else 1.0
+            }
+            for label, stats in _COMPRESSION_STATS.items()
+        }
+
+def compress_payload(data: bytes, label: Optional[str] = None,
+                     filename: Optional[str] = None) -> Tuple[int, bytes]:
+    # Return (algoritma, data); data asli dipakai jika kompresi tidak menghemat
+    algorithm = _compression_algorithm()
+    result = COMPRESSION_NONE, data
+    if algorithm != COMPRESSION_NONE and should_compress(data, filename):
+        compressor = _compressor(algorithm)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            result = algorithm, compressed
+
+    if label:
+        _record_compression(label, len(data), len(result[1]))
+    return result
+
+def decompress_payload(algorithm: int, data: bytes) -> bytes:
+    if algorithm == COMPRESSION_NONE:
+        return data
+    decompressor = _decompressor(algorithm)
+    return decompressor.decompress(data) + decompressor.flush()
+
+def compress_stream(algorithm: int, chunks: Iterable[bytes], label: Optional[str] = None) -> Iterator[bytes]:
+    original_size = stored_size = 0
+    compressor = _compressor(algorithm) if algorithm != COMPRESSION_NONE else None
+    for chunk in chunks:
+        original_size += len(chunk)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        stored_size += len(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        tail = compressor.flush()
+        stored_size += len(tail)
+        yield tail
+
+    if label:
+        _record_compression(label, original_size, stored_size)
+
+def decompress_stream(algorithm: int, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    if algorithm == COMPRESSION_NONE:
+        yield from chunks
+        return
+    decompressor = _decompressor(algorithm)
+    for chunk in chunks:
+        output = decompressor.decompress(chunk)
+        if output:
+            yield output
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+# ============================================================================
+# BINARY MESSAGE ENVELOPE
+# ============================================================================
+
+# Format biner untuk messages.encrypted_content:
+#   v2: '$' + base64( version(1) | type(1) | nonce(12) | ChaCha20-Poly1305(payload) )
+#       integritas baris dari HMAC di kolom encrypted_hmac
+#   v3: '$' + base64( version(1) | type(1) | flags(1) | nonce(12) | ChaCha20-Poly1305(payload) )
+#       tanpa HMAC: header + metadata baris (id, sender, receiver, type) menjadi
+#       associated data, sehingga tag AEAD sekaligus mencegah baris ditukar
+#       flags bit 0-1: algoritma kompresi plaintext (COMPRESSION_*)
+# Payload disimpan sebagai bytes mentah (tanpa base64/JSON bertingkat). '$' bukan
+# karakter base64 sehingga baris v1 (base64 polos) selalu bisa dibedakan.
+# Di object storage envelope v3 disimpan biner (tanpa '$' + base64); fungsi
+# di bawah menerima kedua bentuk (str = teks envelope, bytes = envelope biner).
+ENVELOPE_PREFIX = '$'
+ENVELOPE_VERSION_HMAC = 2
+ENVELOPE_VERSION = 3
+
+ENVELOPE_TEXT = 1
+ENVELOPE_IMAGE = 2
+ENVELOPE_FILE = 3         # file satu-blok (hanya dibaca, baris lama)
+ENVELOPE_FILE_STREAM = 4  # file tersegmentasi, lihat seal_file_stream()
+ENVELOPE_PREVIEW = 5      # metadata kecil (filename) di kolom encrypted_preview
+ENVELOPE_KEY = 6          # content key pesan grup per penerima (kolom encrypted_key)
+
+def is_envelope(encrypted_content: Union[str, bytes]) -> bool:
+    if isinstance(encrypted_content, (bytes, bytearray)):
+        return bool(encrypted_content)
+    return bool(encrypted_content) and encrypted_content.startswith(ENVELOPE_PREFIX)
+
+def message_binding(message_id: str, sender_id: str, receiver_id: str, message_type: str) -> bytes:
+    # Metadata baris yang diikat ke ciphertext sebagai associated data
+    return '|'.join([str(message_id), str(sender_id), str(receiver_id), message_type]).encode('utf-8')
+
+def _envelope_header_size(version: int) -> int:
+    if version == ENVELOPE_VERSION_HMAC:
+        return 2
+    if version == ENVELOPE_VERSION:
+        return 3
+    raise ValueError(f'Versi envelope tidak didukung: {version}')
+
+def _envelope_head(encrypted_content: Union[str, bytes]) -> bytes:
+    # 3 byte pertama envelope (4 karakter pertama teks envelope) tanpa dekripsi
+    if not is_envelope(encrypted_content):
+        raise ValueError('Format envelope tidak valid')
+    if isinstance(encrypted_content, (bytes, bytearray)):
+        return bytes(encrypted_content[:3])
+    return base64.b64decode(encrypted_content[len(ENVELOPE_PREFIX):len(ENVELOPE_PREFIX) + 4])
+
+def _check_binary_version(version: int):
+    # v2 diverifikasi HMAC atas teks envelope; envelope biner selalu v3
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f'Versi envelope biner tidak didukung: {version}')
+
+def envelope_info(encrypted_content: Union[str, bytes]) -> Tuple[int, int]:
+    # (version, type)
+    head = _envelope_head(encrypted_content)
+    return head[0], head[1]
+
+def envelope_type(encrypted_content: Union[str, bytes]) -> int:
+    return envelope_info(encrypted_content)[1]
+
+def envelope_compression(encrypted_content: Union[str, bytes]) -> int:
+    # v2 tidak punya byte flags (byte ketiga sudah nonce)
+    head = _envelope_head(encrypted_content)
+    if head[0] != ENVELOPE_VERSION:
+        return COMPRESSION_NONE
+    return head[2] & COMPRESSION_FLAG_MASK
+
+def _envelope_aad(header: bytes, binding: Optional[bytes]) -> bytes:
+    if header[0] == ENVELOPE_VERSION_HMAC:
+        return header
+    if not binding:
+        raise ValueError('Metadata pesan diperlukan untuk dekripsi')
+    return header + binding
+
+def seal_envelope(payload_type: int, payload: bytes, binding: bytes, flags: int = 0) -> str:
+    if not payload:
+        raise ValueError('Data tidak boleh kosong')
+    if not binding:
+        raise ValueError('Metadata pesan tidak boleh kosong')
+
+    header = bytes([ENVELOPE_VERSION, payload_type, flags])
+    nonce = os.urandom(12)
+    ciphertext = _DATABASE_AEAD.encrypt(nonce, payload, header + binding)
+
+    # Satu-satunya base64 ada di sisi terluar
+    return ENVELOPE_PREFIX + base64.b64encode(header + nonce + ciphertext).decode('ascii')
+
+def open_envelope(encrypted_content: Union[str, bytes], hmac_value: str,
+                  binding: Optional[bytes] = None) -> Tuple[int, bytes]:
+    version, _ = envelope_info(encrypted_content)
+    header_size = _envelope_header_size(version)
+
+    if isinstance(encrypted_content, (bytes, bytearray)):
+        _check_binary_version(version)
+        data = bytes(encrypted_content)
+    else:
+        # HMAC terpisah hanya untuk baris v2
+        if version == ENVELOPE_VERSION_HMAC and not verify_hmac(encrypted_content, hmac_value or ''):
+            raise Exception('Verifikasi HMAC gagal - data mungkin telah diubah')
+        data = base64.b64decode(encrypted_content[len(ENVELOPE_PREFIX):])
+    if len(data) < header_size + 12 + 16:
+        raise ValueError('Data terenkripsi tidak valid')
+
+    header = data[:header_size]
+    nonce = data[header_size:header_size + 12]
+    ciphertext = data[header_size + 12:]
+
+    return header[1], _DATABASE_AEAD.decrypt(nonce, ciphertext, _envelope_aad(header, binding))
+
+def unpack_file_payload(payload: bytes) -> Tuple[str, bytes]:
+    # Format ENVELOPE_FILE: name_len(2) | filename (UTF-8) | encrypted file
+    if len(payload) < 2:
+        raise ValueError('Payload file tidak valid')
+    name_len = int.from_bytes(payload[:2], 'big')
+    filename = payload[2:2 + name_len].decode('utf-8')
+    return filename, payload[2 + name_len:]
+
+# ============================================================================
+# CONTENT KEY (PESAN GRUP)
+# ============================================================================
+# Pesan grup dienkripsi sekali dengan content key acak (dipakai seperti user
+# key oleh fungsi enkripsi biasa) dan diikat ke pesan asal. Setiap penerima
+# mendapat record kecil ENVELOPE_KEY yang diikat ke barisnya sendiri:
+#   origin_len(1) | origin_id | nonce(12) | AES-256-GCM(user key, content key)
+# origin_id bisa dibaca tanpa user key (cukup layer database), sehingga gambar
+# dan nama file tetap bisa dibuka sebelum kunci dimasukkan.
+
+def generate_content_key() -> str:
+    return base64.b64encode(os.urandom(32)).decode('ascii')
+
+def wrap_content_key(content_key: str, origin_id: str, encryption_key: str, binding: bytes) -> str:
+    origin = origin_id.encode('utf-8')
+    nonce = os.urandom(12)
+    wrapped = _user_key_context(encryption_key).aesgcm.encrypt(nonce, content_key.encode('ascii'), binding)
+    return seal_envelope(ENVELOPE_KEY, bytes([len(origin)]) + origin + nonce + wrapped, binding)
+
+def _open_content_key(wrapped: str, binding: bytes) -> Tuple[str, bytes, bytes]:
+    payload_type, payload = open_envelope(wrapped, '', binding)
+    if payload_type != ENVELOPE_KEY or not payload:
+        raise ValueError('Format content key tidak valid')
+    origin_end = 1 + payload[0]
+    return payload[1:origin_end].decode('utf-8'), payload[origin_end:origin_end + 12], payload[origin_end + 12:]
+
+def content_key_origin(wrapped: str, binding: bytes) -> str:
+    return _open_content_key(wrapped, binding)[0]
+
+def unwrap_content_key(wrapped: str, encryption_key: str, binding: bytes) -> str:
+    _, nonce, ciphertext = _open_content_key(wrapped, binding)
+    try:
+        return _user_key_context(encryption_key).aesgcm.decrypt(nonce, ciphertext, binding).decode('ascii')
+    except InvalidTag:
+        raise ValueError('Gagal membuka content key: kunci salah atau data rusak')
+
+# ============================================================================
+# BATCH DECRYPTION (THREAD POOL)
+# ============================================================================
+
+# OpenSSL melepas GIL selama operasi cipher, jadi thread pool cukup untuk
+# mendekripsi banyak baris secara paralel di semua core
+_DECRYPT_POOL: Optional[ThreadPoolExecutor] = None
+_DECRYPT_POOL_LOCK = threading.Lock()
+
+def _decrypt_pool() -> ThreadPoolExecutor:
+    global _DECRYPT_POOL
+    if _DECRYPT_POOL is None:
+        with _DECRYPT_POOL_LOCK:
+            if _DECRYPT_POOL is None:
+                _DECRYPT_POOL = ThreadPoolExecutor(
+                    max_workers=Settings.DECRYPT_WORKERS,
+                    thread_name_prefix='decrypt'
+                )
+    return _DECRYPT_POOL
+
+def _apply_each(func: Callable, items: Sequence) -> List[Tuple[Any, Optional[Exception]]]:
+    results = []
+    for item in items:
+        try:
+            results.append((func(item), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+def map_parallel(func: Callable, items: Sequence) -> List[Tuple[Any, Optional[Exception]]]:
+    # Hasil per item: (result, None) jika berhasil, (None, error) jika gagal
+    items = list(items)
+    if len(items) < 2 or Settings.DECRYPT_WORKERS < 2:
+        return _apply_each(func, items)
+
+    # Bagi menjadi beberapa batch agar overhead submit tidak mendominasi
+    batch_size = max(1, -(-len(items) // (Settings.DECRYPT_WORKERS * 4)))
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    futures = [_decrypt_pool().submit(_apply_each, func, batch) for batch in batches]
+
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+def decrypt_from_database_many(rows: Sequence[Tuple[str, str]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+    # rows: list of (encrypted_b64, hmac_value)
+    return map_parallel(lambda row: decrypt_from_database(row[0], row[1]), rows)
+
 # ============================================================================
 # AES-256-CTR + HMAC (TEXT MESSAGES)
 # ============================================================================
@@ -198,8 +674,8 @@ def encrypt_text_aes_ctr_hmac(plain_text: str, user_key: str) -> str:
     if not user_key:
         raise ValueError('Kunci enkripsi tidak boleh kosong')
 
-    # Generate key dari user key (SHA-256 = 32 bytes untuk AES-256)
-    key = _sha256_bytes(user_key)
+    # Key dari user key (SHA-256 = 32 bytes untuk AES-256)
+    key = _user_key_context(user_key).aes_key
 
     # Generate random IV (16 bytes untuk AES-CTR)
     iv = os.urandom(16)
@@ -242,8 +718,8 @@ def decrypt_text_aes_ctr_hmac(encrypted_text: str, user_key: str) -> str:
     if not verify_hmac(encrypted_b64, hmac_value):
         raise Exception('Verifikasi HMAC gagal - data mungkin telah diubah')
 
-    # Generate key
-    key = _sha256_bytes(user_key)
+    # Key dari registry
+    key = _user_key_context(user_key).aes_key
 
     # Decode
     combined = base64.b64decode(encrypted_b64)
@@ -268,13 +744,72 @@ def decrypt_text_aes_ctr_hmac(encrypted_text: str, user_key: str) -> str:
 
     return plaintext.decode('utf-8')
 
+def decrypt_text_aes_ctr_hmac_bytes(data: bytes, user_key: str) -> str:
+    # Envelope v2 (baris lama): IV(16) | ciphertext | HMAC(32)
+    if not data:
+        raise ValueError('Teks terenkripsi tidak boleh kosong')
+    if not user_key:
+        raise ValueError('Kunci dekripsi tidak boleh kosong')
+    if len(data) < 16 + 32:
+        raise ValueError('Data terenkripsi tidak valid')
+
+    iv, ciphertext, hmac_tag = data[:16], data[16:-32], data[-32:]
+
+    # Verify HMAC first
+    mac = _HMAC_BASE.copy()
+    mac.update(iv + ciphertext)
+    if not _bytes_equal(mac.digest(), hmac_tag):
+        raise Exception('Verifikasi HMAC gagal - data mungkin telah diubah')
+
+    key = _user_key_context(user_key).aes_key
+    decryptor = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend()).decryptor()
+    plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+
+    return plaintext.decode('utf-8')
+
+def encrypt_text_aes_ctr_bytes(plain_text: Union[str, bytes], user_key: str) -> bytes:
+    # Envelope v3: IV(16) | ciphertext; integritas dari tag AEAD envelope
+    # plain_text boleh bytes (UTF-8 yang sudah dikompresi)
+    if not plain_text:
+        raise ValueError('Plaintext tidak boleh kosong')
+    if not user_key:
+        raise ValueError('Kunci enkripsi tidak boleh kosong')
+
+    if isinstance(plain_text, str):
+        plain_text = plain_text.encode('utf-8')
+
+    key = _user_key_context(user_key).aes_key
+    iv = os.urandom(16)
+
+    encryptor = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend()).encryptor()
+    return iv + encryptor.update(plain_text) + encryptor.finalize()
+
+def decrypt_text_aes_ctr_bytes(data: bytes, user_key: str, compression: int = COMPRESSION_NONE) -> str:
+    if not data:
+        raise ValueError('Teks terenkripsi tidak boleh kosong')
+    if not user_key:
+        raise ValueError('Kunci dekripsi tidak boleh kosong')
+    if len(data) < 16:
+        raise ValueError('Data terenkripsi tidak valid')
+
+    key = _user_key_context(user_key).aes_key
+    decryptor = Cipher(algorithms.AES(key), modes.CTR(data[:16]), backend=default_backend()).decryptor()
+    plaintext = decryptor.update(data[16:]) + decryptor.finalize()
+
+    # Layer user key v3 tanpa tag sendiri (integritas baris dari AEAD envelope):
+    # kunci salah menghasilkan bytes acak yang gagal didekompresi / di-decode
+    try:
+        return decompress_payload(compression, plaintext).decode('utf-8')
+    except Exception as e:
+        raise ValueError("Gagal mendekripsi pesan: kunci salah atau data rusak") from e
+
 # ============================================================================
 # 3DES ENCRYPTION (STEGANOGRAPHY)
 # ============================================================================
 
-def encrypt_3des(plaintext: str, encryption_key: str) -> str:
-    # Generate 192-bit key untuk 3DES (24 bytes)
-    key_bytes = hashlib.sha256(encryption_key.encode()).digest()[:24]
+def encrypt_3des_bytes(plaintext: str, encryption_key: str) -> bytes:
+    # 192-bit key untuk 3DES (24 bytes)
+    key_bytes = _user_key_context(encryption_key).des_key
     
     # Generate random IV (8 bytes untuk DES/3DES)
     iv = os.urandom(8)
@@ -300,22 +835,20 @@ def encrypt_3des(plaintext: str, encryption_key: str) -> str:
     hmac_tag = h.digest()
     
     # Format: IV(8) + Ciphertext + HMAC(32)
-    encrypted_data = iv + ciphertext + hmac_tag
-    
-    return base64.b64encode(encrypted_data).decode('utf-8')
+    return iv + ciphertext + hmac_tag
 
 
-def decrypt_3des(encrypted_data: str, encryption_key: str) -> str:
-    # Decode dari base64
-    data = base64.b64decode(encrypted_data)
+def decrypt_3des_bytes(data: bytes, encryption_key: str) -> str:
+    if len(data) < 8 + 8 + 32:
+        raise ValueError("Data 3DES tidak valid")
     
     # Parse components
     iv = data[:8]
     hmac_tag = data[-32:]
     ciphertext = data[8:-32]
     
-    # Generate key
-    key_bytes = hashlib.sha256(encryption_key.encode()).digest()[:24]
+    # Key dari registry
+    key_bytes = _user_key_context(encryption_key).des_key
     
     # Verify HMAC
     h = hmac.new(key_bytes, iv + ciphertext, hashlib.sha256)
@@ -340,63 +873,120 @@ def decrypt_3des(encrypted_data: str, encryption_key: str) -> str:
     return plaintext.decode('utf-8')
 
 
-# ============================================================================
-# TESTING/DEBUG FUNCTIONS
-# ============================================================================
+def encrypt_3des(plaintext: str, encryption_key: str) -> str:
+    return base64.b64encode(encrypt_3des_bytes(plaintext, encryption_key)).decode('utf-8')
 
-if __name__ == '__main__':
-    # Test encrypt/decrypt field
-    print("Testing bagian Enkripsi (ChaCha20-Poly1305)...")
-    test_email = "test@example.com"
-    encrypted = encrypt_field(test_email)
-    print(f"Encrypted: {encrypted['encrypted'][:50]}...")
-    print(f"HMAC: {encrypted['hmac']}")
 
-    decrypted = decrypt_field(encrypted['encrypted'], encrypted['hmac'])
-    print(f"Decrypted: {decrypted}")
-    assert decrypted == test_email, "Tes enkripsi field gagal!"
-    print("✅ Field enkripsi OK\n")
+def decrypt_3des(encrypted_data: str, encryption_key: str) -> str:
+    # Decode dari base64
+    return decrypt_3des_bytes(base64.b64decode(encrypted_data), encryption_key)
 
-    # Test bcrypt
-    print("Testing Bcrypt Password Hashing...")
-    password = "MySecurePass123"
-    hashed = hash_password_bcrypt(password)
-    print(f"Hashed: {hashed}")
 
-    is_valid = verify_password_bcrypt(password, hashed)
-    print(f"Verification: {is_valid}")
-    assert is_valid, "Bcrypt tes gagal!"
-    print("✅ Bcrypt OK\n")
+# ============================================================================
+# STEGANOGRAPHY - LSB (LEAST SIGNIFICANT BIT)
+# ============================================================================
 
-    # Test text message encryption
-    print("Testing bagian Enkripsi Pesan Teks (AES-CTR-HMAC)...")
-    message = "Hello, this is a secret message!"
-    user_key = "MyEncryptionKey123"
-    encrypted_msg = encrypt_text_aes_ctr_hmac(message, user_key)
-    print(f"Encrypted: {encrypted_msg[:80]}...")
+def _embed_lsb(image, payload: bytes):
+    from PIL import Image
+    import numpy as np
+    
+    # Salinan pixel sebagai array (H, W, 3); view datar R,G,B,R,G,B,...
+    pixels = np.array(image, dtype=np.uint8)
+    flat = pixels.reshape(-1)
+    
+    # Bit payload MSB-first, sama dengan format(byte, '08b')
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    
+    # Hanya channel yang dipakai payload yang diubah
+    target = flat[:bits.size]
+    target &= 0xFE
+    target |= bits
+    
+    return Image.fromarray(pixels, 'RGB')
+
+
+# Format payload stego:
+#   v3: MAGIC(4) | version(1) | suite(1) | flags(1) | length(4, big-endian) | nonce(12) | CT+tag
+#       header ikut diautentikasi sebagai associated data; flags bit 0-1 = kompresi
+#   v2: seperti v3 tanpa byte flags (tidak terkompresi)
+#   v1: MAGIC(4) | version(1) | length(4, big-endian) | payload 3DES mentah (IV|CT|HMAC)
+# Ekstraksi cukup membaca header lalu tepat `length` byte. Format lama
+# (base64 + "<<<END>>>") tetap didukung sebagai fallback.
+_STEGO_MAGIC = b'CMSG'
+_STEGO_VERSION_3DES = 1
+_STEGO_VERSION_AEAD = 2
+_STEGO_VERSION = 3
+_STEGO_HEADER_SIZE_3DES = 9
+_STEGO_HEADER_SIZE_AEAD = 10
+_STEGO_HEADER_SIZE = 11
+_STEGO_LEGACY_DELIMITER = b'<<<END>>>'
+_BASE64_ALPHABET = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
+
+STEGO_SUITE_AES_GCM = 1
+STEGO_SUITE_CHACHA20 = 2
+STEGO_SUITES = {
+    'aes-256-gcm': STEGO_SUITE_AES_GCM,
+    'chacha20-poly1305': STEGO_SUITE_CHACHA20
+}
+STEGO_OVERHEAD = _STEGO_HEADER_SIZE + 12 + 16  # header + nonce + tag
+
+
+def _stego_aead(suite: int, encryption_key: str):
+    context = _user_key_context(encryption_key)
+    if suite == STEGO_SUITE_AES_GCM:
+        return context.aesgcm
+    if suite == STEGO_SUITE_CHACHA20:
+        return context.chacha
+    raise ValueError(f"Cipher suite steganografi tidak didukung: {suite}")
+
+
+def _stego_suite_id(suite: Union[int, str, None]) -> int:
+    if suite is None:
+        suite = Settings.STEGO_CIPHER_SUITE
+    if isinstance(suite, str):
+        if suite not in STEGO_SUITES:
+            raise ValueError(f"Cipher suite steganografi tidak dikenal: {suite}")
+        return STEGO_SUITES[suite]
+    return suite
+
+
+def _read_lsb_bytes(flat, offset: int, length: int) -> bytes:
+    import numpy as np
+    
+    # Ambil LSB dari channel [offset*8, (offset+length)*8) lalu pack ke byte
+    bits = flat[offset * 8:(offset + length) * 8] & 1
+    return np.packbits(bits).tobytes()
 
-    decrypted_msg = decrypt_text_aes_ctr_hmac(encrypted_msg, user_key)
-    print(f"Decrypted: {decrypted_msg}")
-    assert decrypted_msg == message, "Tes enkripsi pesan teks gagal!"
-    print("✅ Enkripsi pesan teks OK\n")
 
-    print("Semua tes berhasil! ✅")
+def _seal_stego_payload(message: str, encryption_key: str, suite: int, label: Optional[str] = 'stego') -> bytes:
+    compression, plaintext = compress_payload(message.encode('utf-8'), label)
+    nonce = os.urandom(12)
+    header = (
+        _STEGO_MAGIC + bytes([_STEGO_VERSION, suite, compression])
+        + (len(nonce) + len(plaintext) + 16).to_bytes(4, 'big')
+    )
+    return header + nonce + _stego_aead(suite, encryption_key).encrypt(nonce, plaintext, header)
 
 
-# ============================================================================
-# STEGANOGRAPHY - LSB (LEAST SIGNIFICANT BIT)
-# ============================================================================
+def stego_payload_size(message: str) -> int:
+    # Ukuran byte yang akan disisipkan (setelah kompresi), untuk cek kapasitas di UI
+    _, plaintext = compress_payload(message.encode('utf-8'))
+    return STEGO_OVERHEAD + len(plaintext)
+
 
-def hide_message_in_image(image_bytes: bytes, message: str, encryption_key: str) -> bytes:
+def hide_message_in_image(image_bytes: bytes, message: str, encryption_key: str,
+                          suite: Union[int, str, None] = None) -> bytes:
     from PIL import Image
     import io
     
-    # Enkripsi pesan dengan 3DES
-    encrypted_message = encrypt_3des(message, encryption_key)
+    if not message:
+        raise ValueError('Pesan tidak boleh kosong')
+    if not encryption_key:
+        raise ValueError('Kunci enkripsi tidak boleh kosong')
     
-    # Tambahkan delimiter untuk menandai akhir pesan
-    data_to_hide = encrypted_message + "<<<END>>>"
-    binary_message = ''.join(format(ord(char), '08b') for char in data_to_hide)
+    # Kompresi (jika menghemat) lalu enkripsi dengan AEAD (suite dari
+    # Settings.STEGO_CIPHER_SUITE); header magic + suite + flags + panjang payload
+    data_to_hide = _seal_stego_payload(message, encryption_key, _stego_suite_id(suite))
     
     # Load image
     image = Image.open(io.BytesIO(image_bytes))
@@ -405,11 +995,9 @@ def hide_message_in_image(image_bytes: bytes, message: str, encryption_key: str)
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
-    pixels = list(image.getdata())
-    
     # Calculate capacities
-    image_capacity_bits = len(pixels) * 3
-    message_size_bits = len(binary_message)
+    image_capacity_bits = image.width * image.height * 3
+    message_size_bits = len(data_to_hide) * 8
     image_capacity_kb = image_capacity_bits / 8 / 1024
     message_size_kb = message_size_bits / 8 / 1024
     
@@ -422,34 +1010,8 @@ def hide_message_in_image(image_bytes: bytes, message: str, encryption_key: str)
             f"Gunakan gambar lebih besar (minimal {int(message_size_kb * 1024 * 8 / 3 ** 0.5)}×{int(message_size_kb * 1024 * 8 / 3 ** 0.5)} px)"
         )
     
-    # Hide message in LSB
-    new_pixels = []
-    message_index = 0
-    
-    for pixel in pixels:
-        if message_index < len(binary_message):
-            # Modify each RGB channel
-            r, g, b = pixel
-            
-            if message_index < len(binary_message):
-                r = (r & 0xFE) | int(binary_message[message_index])
-                message_index += 1
-            
-            if message_index < len(binary_message):
-                g = (g & 0xFE) | int(binary_message[message_index])
-                message_index += 1
-            
-            if message_index < len(binary_message):
-                b = (b & 0xFE) | int(binary_message[message_index])
-                message_index += 1
-            
-            new_pixels.append((r, g, b))
-        else:
-            new_pixels.append(pixel)
-    
-    # Create new image
-    stego_image = Image.new(image.mode, image.size)
-    stego_image.putdata(new_pixels)
+    # Hide message in LSB (vectorized)
+    stego_image = _embed_lsb(image, data_to_hide)
     
     # Save to bytes
     output = io.BytesIO()
@@ -457,8 +1019,16 @@ def hide_message_in_image(image_bytes: bytes, message: str, encryption_key: str)
     return output.getvalue()
 
 
+def _extract_legacy_payload(flat) -> Optional[bytes]:
+    # Format lama: base64 3DES diakhiri "<<<END>>>"
+    data = _read_lsb_bytes(flat, 0, flat.size // 8)
+    end = data.find(_STEGO_LEGACY_DELIMITER)
+    return data[:end] if end >= 0 else None
+
+
 def extract_message_from_image(image_bytes: bytes, encryption_key: str) -> str:
     from PIL import Image
+    import numpy as np
     import io
     
     # Load image
@@ -467,74 +1037,359 @@ def extract_message_from_image(image_bytes: bytes, encryption_key: str) -> str:
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
-    pixels = list(image.getdata())
+    flat = np.asarray(image, dtype=np.uint8).reshape(-1)
+    capacity = flat.size // 8
     
-    # Extract binary message from LSB
-    binary_message = ""
+    header = _read_lsb_bytes(flat, 0, min(_STEGO_HEADER_SIZE, capacity))
     
-    for pixel in pixels:
-        r, g, b = pixel
-        binary_message += str(r & 1)
-        binary_message += str(g & 1)
-        binary_message += str(b & 1)
+    if header[:4] == _STEGO_MAGIC and len(header) >= _STEGO_HEADER_SIZE_3DES:
+        version, compression = header[4], COMPRESSION_NONE
+        if version == _STEGO_VERSION and len(header) == _STEGO_HEADER_SIZE:
+            suite, compression, header_size = header[5], header[6] & COMPRESSION_FLAG_MASK, _STEGO_HEADER_SIZE
+            length = int.from_bytes(header[7:11], 'big')
+        elif version == _STEGO_VERSION_AEAD:
+            suite, header_size = header[5], _STEGO_HEADER_SIZE_AEAD
+            length = int.from_bytes(header[6:10], 'big')
+        elif version == _STEGO_VERSION_3DES:
+            suite, header_size = None, _STEGO_HEADER_SIZE_3DES
+            length = int.from_bytes(header[5:9], 'big')
+        else:
+            raise ValueError(f"Versi payload steganografi tidak didukung: {version}")
+        
+        if header_size + length > capacity:
+            raise ValueError("Header steganografi tidak valid - gambar rusak")
+        
+        # Hanya bit payload yang dibaca
+        payload = _read_lsb_bytes(flat, header_size, length)
+        try:
+            if suite is None:
+                return decrypt_3des_bytes(payload, encryption_key)
+            aead = _stego_aead(suite, encryption_key)
+            plaintext = aead.decrypt(payload[:12], payload[12:], header[:header_size])
+            return decompress_payload(compression, plaintext).decode('utf-8')
+        except InvalidTag:
+            raise ValueError("Gagal mendekripsi pesan: kunci salah atau data rusak")
+        except Exception as e:
+            raise ValueError(f"Gagal mendekripsi pesan: {str(e)}")
+    
+    # Tanpa magic: format lama selalu diawali karakter base64, selain itu tolak
+    # langsung tanpa memindai seluruh gambar
+    if not header or not all(byte in _BASE64_ALPHABET for byte in header):
+        raise ValueError("Tidak ditemukan pesan tersembunyi atau kunci enkripsi salah")
     
-    # Convert binary to string
-    extracted_data = ""
-    for i in range(0, len(binary_message), 8):
-        byte = binary_message[i:i+8]
-        if len(byte) == 8:
-            extracted_data += chr(int(byte, 2))
-            
-            # Check for end delimiter
-            if extracted_data.endswith("<<<END>>>"):
-                encrypted_message = extracted_data[:-9]  # Remove delimiter
-                # Dekripsi pesan dengan 3DES
-                try:
-                    decrypted_message = decrypt_3des(encrypted_message, encryption_key)
-                    return decrypted_message
-                except Exception as e:
-                    raise ValueError(f"Gagal mendekripsi pesan: {str(e)}")
+    encrypted_message = _extract_legacy_payload(flat)
+    if encrypted_message is None:
+        raise ValueError("Tidak ditemukan pesan tersembunyi atau kunci enkripsi salah")
     
-    raise ValueError("Tidak ditemukan pesan tersembunyi atau kunci enkripsi salah")
+    # Dekripsi pesan dengan 3DES
+    try:
+        return decrypt_3des(encrypted_message.decode('latin-1'), encryption_key)
+    except Exception as e:
+        raise ValueError(f"Gagal mendekripsi pesan: {str(e)}")
 
 
 # ============================================================================
 # FILE ENCRYPTION (AES-256-GCM with User Key)
 # ============================================================================
 
-def encrypt_file_aes_gcm(file_bytes: bytes, encryption_key: str) -> str:
-    # Generate 256-bit key dari user key
-    key = _sha256_bytes(encryption_key)
+def encrypt_file_aes_gcm_bytes(file_bytes: bytes, encryption_key: str) -> bytes:
+    # AES-256-GCM object dari registry (key 256-bit dari user key)
+    aesgcm = _user_key_context(encryption_key).aesgcm
     
     # Generate random nonce (12 bytes untuk GCM)
     nonce = os.urandom(12)
     
-    # Encrypt dengan AES-256-GCM
-    aesgcm = AESGCM(key)
-    ciphertext = aesgcm.encrypt(nonce, file_bytes, None)
-    
     # Format: nonce(12) + ciphertext+tag
-    encrypted_data = nonce + ciphertext
-    
-    # Encode ke base64
-    return base64.b64encode(encrypted_data).decode('utf-8')
+    return nonce + aesgcm.encrypt(nonce, file_bytes, None)
 
 
-def decrypt_file_aes_gcm(encrypted_data: str, encryption_key: str) -> bytes:
-    # Decode dari base64
-    data = base64.b64decode(encrypted_data)
+def decrypt_file_aes_gcm_bytes(data: bytes, encryption_key: str) -> bytes:
+    if len(data) < 12 + 16:
+        raise ValueError('Data terenkripsi tidak valid')
     
     # Parse components
     nonce = data[:12]
     ciphertext = data[12:]
     
-    # Generate key
-    key = _sha256_bytes(encryption_key)
-    
     # Decrypt
-    aesgcm = AESGCM(key)
-    plaintext = aesgcm.decrypt(nonce, ciphertext, None)
-    
-    return plaintext
+    aesgcm = _user_key_context(encryption_key).aesgcm
+    return aesgcm.decrypt(nonce, ciphertext, None)
+
+
+def encrypt_file_aes_gcm(file_bytes: bytes, encryption_key: str) -> str:
+    # Encode ke base64 (format v1)
+    return base64.b64encode(encrypt_file_aes_gcm_bytes(file_bytes, encryption_key)).decode('utf-8')
+
+
+def decrypt_file_aes_gcm(encrypted_data: str, encryption_key: str) -> bytes:
+    # Decode dari base64 (format v1)
+    return decrypt_file_aes_gcm_bytes(base64.b64decode(encrypted_data), encryption_key)
+
+
+# ============================================================================
+# SEGMENTED STREAMING AEAD (LARGE FILES)
+# ============================================================================
+
+# Format stream:
+#   header: version(1) | chunk_size(4) | nonce_prefix(7)
+#   segmen: AEAD(chunk) untuk setiap chunk_size byte plaintext (+16 byte tag)
+# Nonce tiap segmen = nonce_prefix(7) | counter(4) | last_flag(1), header ikut
+# sebagai associated data. Flag segmen terakhir mencegah truncation/reordering,
+# dan memori yang dipakai hanya sebesar satu chunk berapapun ukuran file.
+_STREAM_VERSION = 1
+_STREAM_HEADER_SIZE = 12
+_STREAM_TAG_SIZE = 16
+# chunk_size di header belum terautentikasi saat dibaca: dibatasi sebelum
+# dipakai sebagai ukuran buffer segmen
+_STREAM_MAX_CHUNK = 16 * 1024 * 1024
+
+def iter_file_chunks(source: Union[bytes, BinaryIO], chunk_size: int = None) -> Iterator[bytes]:
+    chunk_size = chunk_size or Settings.STREAM_CHUNK_SIZE
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for i in range(0, len(view), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+        return
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def _rechunk(chunks: Iterable[bytes], size: int) -> Iterator[Tuple[bytes, bool]]:
+    # Potong ulang menjadi blok berukuran tepat `size`; yield (blok, is_last)
+    buffer = bytearray()
+    pending = None
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            if pending is not None:
+                yield pending, False
+            pending = bytes(buffer[:size])
+            del buffer[:size]
+    if pending is not None and buffer:
+        yield pending, False
+        pending = None
+    if pending is not None:
+        yield pending, True
+    else:
+        yield bytes(buffer), True
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    if counter > 0xFFFFFFFF:
+        raise ValueError('Stream terlalu panjang')
+    return prefix + counter.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+def encrypt_stream(aead, chunks: Iterable[bytes], chunk_size: int = None,
+                   associated_data: bytes = b'') -> Iterator[bytes]:
+    chunk_size = chunk_size or Settings.STREAM_CHUNK_SIZE
+    if not 0 < chunk_size <= _STREAM_MAX_CHUNK:
+        raise ValueError('Ukuran chunk stream tidak valid')
+    prefix = os.urandom(7)
+    header = bytes([_STREAM_VERSION]) + chunk_size.to_bytes(4, 'big') + prefix
+    aad = header + associated_data
+    yield header
+
+    for counter, (chunk, last) in enumerate(_rechunk(chunks, chunk_size)):
+        yield aead.encrypt(_stream_nonce(prefix, counter, last), chunk, aad)
+
+def decrypt_stream(aead, chunks: Iterable[bytes], associated_data: bytes = b'') -> Iterator[bytes]:
+    chunks = iter(chunks)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= _STREAM_HEADER_SIZE:
+            break
+    if len(buffer) < _STREAM_HEADER_SIZE or buffer[0] != _STREAM_VERSION:
+        raise ValueError('Header stream terenkripsi tidak valid')
+
+    header = bytes(buffer[:_STREAM_HEADER_SIZE])
+    del buffer[:_STREAM_HEADER_SIZE]
+    chunk_size = int.from_bytes(header[1:5], 'big')
+    if not 0 < chunk_size <= _STREAM_MAX_CHUNK:
+        raise ValueError('Header stream tidak valid - data mungkin telah diubah')
+    prefix = header[5:]
+    aad = header + associated_data
+    segment_size = chunk_size + _STREAM_TAG_SIZE
+
+    def _remaining():
+        yield bytes(buffer)
+        yield from chunks
+
+    for counter, (segment, last) in enumerate(_rechunk(_remaining(), segment_size)):
+        if len(segment) < _STREAM_TAG_SIZE:
+            raise ValueError('Stream terenkripsi terpotong')
+        yield aead.decrypt(_stream_nonce(prefix, counter, last), segment, aad)
+
+def encrypt_file_stream(chunks: Iterable[bytes], encryption_key: str, chunk_size: int = None) -> Iterator[bytes]:
+    # AES-256-GCM per segmen dengan key dari user key
+    return encrypt_stream(_user_key_context(encryption_key).aesgcm, chunks, chunk_size)
+
+def decrypt_file_stream(chunks: Iterable[bytes], encryption_key: str) -> Iterator[bytes]:
+    return decrypt_stream(_user_key_context(encryption_key).aesgcm, chunks)
+
+# ----------------------------------------------------------------------------
+# Envelope ENVELOPE_FILE_STREAM:
+#   version(1) | type(1) | flags(1) | meta_nonce(12) | meta_len(4) |
+#   ChaCha20-Poly1305(filename) | DB-stream(AES-GCM-stream(file))
+# Disimpan biner di object storage, atau '$' + base64 di kolom encrypted_content
+# (file kecil). Filename bisa dibaca tanpa mendekripsi isi file. Base64
+# dikerjakan per blok kelipatan 3/4 byte sehingga tetap streaming. Jika flags
+# menandai kompresi, isi file dikompresi (streaming) sebelum AES-GCM.
+# ----------------------------------------------------------------------------
+
+_B64_ENCODE_BLOCK = 3 * 16 * 1024
+_B64_DECODE_BLOCK = 4 * 16 * 1024
+
+def _b64_encode_stream(chunks: Iterable[bytes]) -> Iterator[str]:
+    for block, _ in _rechunk(chunks, _B64_ENCODE_BLOCK):
+        if block:
+            yield base64.b64encode(block).decode('ascii')
+
+def _b64_decode_stream(text: str, start: int = 0) -> Iterator[bytes]:
+    for i in range(start, len(text), _B64_DECODE_BLOCK):
+        yield base64.b64decode(text[i:i + _B64_DECODE_BLOCK])
+
+def b64_decode_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # Seperti _b64_decode_stream untuk teks base64 yang datang per chunk
+    for block, _ in _rechunk(chunks, _B64_DECODE_BLOCK):
+        if block:
+            yield base64.b64decode(block)
+
+def seal_file_stream(filename: str, chunks: Iterable[bytes], encryption_key: str, binding: bytes) -> Iterator[bytes]:
+    # Yield potongan envelope biner
+    if not binding:
+        raise ValueError('Metadata pesan tidak boleh kosong')
+
+    # Keputusan kompresi dari chunk pertama (ekstensi, magic, entropi)
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    compression = _compression_algorithm()
+    if not should_compress(first, filename):
+        compression = COMPRESSION_NONE
+
+    header = bytes([ENVELOPE_VERSION, ENVELOPE_FILE_STREAM, compression])
+    aad = header + binding
+    meta_nonce = os.urandom(12)
+    meta = _DATABASE_AEAD.encrypt(meta_nonce, filename.encode('utf-8'), aad)
+
+    yield header + meta_nonce + len(meta).to_bytes(4, 'big') + meta
+    # Layer 1: AES-256-GCM (user key), Layer 2: ChaCha20-Poly1305 (database)
+    plain = compress_stream(compression, chain([first], chunks), 'file')
+    inner = encrypt_file_stream(plain, encryption_key)
+    yield from encrypt_stream(_DATABASE_AEAD, inner, associated_data=aad)
+
+def seal_file_envelope(filename: str, source: Union[bytes, BinaryIO], encryption_key: str, binding: bytes) -> str:
+    # Teks envelope utuh, untuk kolom encrypted_content (file kecil)
+    body = seal_file_stream(filename, iter_file_chunks(source), encryption_key, binding)
+    return ENVELOPE_PREFIX + ''.join(_b64_encode_stream(body))
+
+def _open_file_stream_meta(data: Iterator[bytes], binding: Optional[bytes]) -> Tuple[str, Iterator[bytes]]:
+    buffer = bytearray()
+    for chunk in data:
+        buffer += chunk
+        if len(buffer) >= 3:
+            header_size = _envelope_header_size(buffer[0])
+            meta_start = header_size + 12 + 4
+            if len(buffer) >= meta_start:
+                meta_len = int.from_bytes(buffer[meta_start - 4:meta_start], 'big')
+                if len(buffer) >= meta_start + meta_len:
+                    break
+    if len(buffer) < 3 or len(buffer) < meta_start:
+        raise ValueError('Data terenkripsi tidak valid')
+
+    header = bytes(buffer[:header_size])
+    if header[1] != ENVELOPE_FILE_STREAM:
+        raise ValueError('Format envelope tidak valid')
+    aad = _envelope_aad(header, binding)
+
+    meta_nonce = bytes(buffer[header_size:header_size + 12])
+    meta_len = int.from_bytes(buffer[meta_start - 4:meta_start], 'big')
+    filename = _DATABASE_AEAD.decrypt(meta_nonce, bytes(buffer[meta_start:meta_start + meta_len]), aad).decode('utf-8')
+    del buffer[:meta_start + meta_len]
+
+    def _rest():
+        yield bytes(buffer)
+        yield from data
+
+    return filename, decrypt_stream(_DATABASE_AEAD, _rest(), associated_data=aad)
+
+def _file_stream_data(encrypted_content: Union[str, Iterable[bytes]]) -> Iterator[bytes]:
+    # Teks envelope didekode per blok; envelope biner (chunk dari object storage) apa adanya
+    if isinstance(encrypted_content, str):
+        envelope_info(encrypted_content)
+        return _b64_decode_stream(encrypted_content, len(ENVELOPE_PREFIX))
+
+    chunks = iter(encrypted_content)
+    first = next(chunks, b'')
+    if first:
+        _check_binary_version(first[0])
+    return chain([first], chunks)
+
+def read_file_stream_name(encrypted_content: Union[str, Iterable[bytes]], binding: Optional[bytes] = None) -> str:
+    # Hanya header + metadata yang didekode, isi file tidak disentuh
+    filename, _ = _open_file_stream_meta(_file_stream_data(encrypted_content), binding)
+    return filename
+
+def _verify_hmac_chunked(data: str, hmac_value: str) -> bool:
+    # Sama dengan verify_hmac, tapi tanpa meng-encode seluruh string sekaligus
+    mac = _HMAC_BASE.copy()
+    for i in range(0, len(data), _B64_DECODE_BLOCK):
+        mac.update(data[i:i + _B64_DECODE_BLOCK].encode('utf-8'))
+    return hmac.compare_digest(mac.hexdigest(), hmac_value)
+
+def open_file_stream(encrypted_content: Union[str, Iterable[bytes]], hmac_value: str,
+                     binding: Optional[bytes] = None) -> Tuple[str, Iterator[bytes]]:
+    # Return (filename, stream AES-GCM terenkripsi user key). encrypted_content:
+    # teks envelope, atau chunk envelope biner dari object storage
+    if isinstance(encrypted_content, str):
+        version, _ = envelope_info(encrypted_content)
+        if version == ENVELOPE_VERSION_HMAC and not _verify_hmac_chunked(encrypted_content, hmac_value or ''):
+            raise Exception('Verifikasi HMAC gagal - data mungkin telah diubah')
+    return _open_file_stream_meta(_file_stream_data(encrypted_content), binding)
+
+
+# ============================================================================
+# TESTING/DEBUG FUNCTIONS
+# ============================================================================
+
+if __name__ == '__main__':
+    # Test encrypt/decrypt field
+    print("Testing bagian Enkripsi (ChaCha20-Poly1305)...")
+    test_email = "test@example.com"
+    encrypted = encrypt_field(test_email)
+    print(f"Encrypted: {encrypted['encrypted'][:50]}...")
+    print(f"HMAC: {encrypted['hmac']}")
+
+    decrypted = decrypt_field(encrypted['encrypted'], encrypted['hmac'])
+    print(f"Decrypted: {decrypted}")
+    assert decrypted == test_email, "Tes enkripsi field gagal!"
+    print("✅ Field enkripsi OK\n")
+
+    # Test bcrypt
+    print("Testing Bcrypt Password Hashing...")
+    password = "MySecurePass123"
+    hashed = hash_password_bcrypt(password)
+    print(f"Hashed: {hashed}")
+
+    is_valid = verify_password_bcrypt(password, hashed)
+    print(f"Verification: {is_valid}")
+    assert is_valid, "Bcrypt tes gagal!"
+    print("✅ Bcrypt OK\n")
 
+    # Test text message encryption
+    print("Testing bagian Enkripsi Pesan Teks (AES-CTR-HMAC)...")
+    message = "Hello, this is a secret message!"
+    user_key = "MyEncryptionKey123"
+    encrypted_msg = encrypt_text_aes_ctr_hmac(message, user_key)
+    print(f"Encrypted: {encrypted_msg[:80]}...")
 
+    decrypted_msg = decrypt_text_aes_ctr_hmac(encrypted_msg, user_key)
+    print(f"Decrypted: {decrypted_msg}")
+    assert decrypted_msg == message, "Tes enkripsi pesan teks gagal!"
+    print("✅ Enkripsi pesan teks OK\n")
+
+    print("Semua tes berhasil! ✅")
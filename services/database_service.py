@@ -1,19 +1,183 @@
-from supabase import create_client, Client
-from config.settings import SUPABASE_URL, SUPABASE_KEY
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import httpx
+from supabase import create_client, Client, ClientOptions
+from config.settings import SUPABASE_URL, SUPABASE_KEY, Settings
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    _HTTP2 = True
+except ImportError:  # opsional, fallback ke HTTP/1.1 keep-alive
+    _HTTP2 = False
+
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_QUERY_POOL: Optional[ThreadPoolExecutor] = None
+_QUERY_CACHE: Optional['QueryCache'] = None
+_POOL_LOCK = threading.Lock()
+
+
+def http_client() -> httpx.Client:
+    # Satu connection pool per proses untuk semua sesi Streamlit: PostgREST,
+    # Storage, dan unduhan lampiran. httpx.Client aman dipakai banyak thread;
+    # dengan HTTP/2 query bersamaan berbagi satu koneksi (multiplexing)
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        with _POOL_LOCK:
+            if _HTTP_CLIENT is None:
+                _HTTP_CLIENT = httpx.Client(
+                    http2=_HTTP2 and Settings.DB_HTTP2,
+                    limits=httpx.Limits(
+                        max_connections=Settings.DB_POOL_MAX_CONNECTIONS,
+                        max_keepalive_connections=Settings.DB_POOL_MAX_KEEPALIVE,
+                        keepalive_expiry=Settings.DB_KEEPALIVE_EXPIRY_SECONDS,
+                    ),
+                    timeout=httpx.Timeout(Settings.DB_TIMEOUT_SECONDS, connect=10),
+                    follow_redirects=True,
+                )
+    return _HTTP_CLIENT
+
+
+def run_concurrently(*calls: Callable[[], Any]) -> List[Any]:
+    # Jalankan query yang saling independen bersamaan (satu render halaman):
+    # latency = query terlama, bukan jumlahnya. Urutan hasil = urutan calls;
+    # exception pertama diteruskan setelah semua selesai
+    global _QUERY_POOL
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    if _QUERY_POOL is None:
+        with _POOL_LOCK:
+            if _QUERY_POOL is None:
+                _QUERY_POOL = ThreadPoolExecutor(max_workers=Settings.DB_CONCURRENT_QUERIES, thread_name_prefix='db-query')
+
+    futures = [_QUERY_POOL.submit(call) for call in calls]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [future.result() for future in futures]
+
+
+def _copy(value):
+    # Baris hasil query boleh diubah pemanggil: setiap pemanggil dapat salinan
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class QueryCache:
+    # Lapisan query baca: query identik yang sedang berjalan digabung (satu
+    # round trip, pemanggil lain menunggu hasilnya), hasilnya disimpan selama
+    # ttl detik. Tulis ke sebuah tabel menghapus cache tabel itu; hasil query
+    # yang dimulai sebelum tulis tidak disimpan (generation per tabel).
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._inflight: Dict[Tuple, Future] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str, key: Tuple[Hashable, ...], fetch: Callable[[], Any]) -> Any:
+        key = (table,) + key
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return _copy(entry[1])
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                generation = self._generations.get(table, 0)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return _copy(future.result())
+
+        try:
+            value = fetch()
+        except BaseException as error:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_exception(error)
+            raise
+
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if self.ttl > 0 and self._generations.get(table, 0) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._evict()
+        future.set_result(value)
+        return _copy(value)
+
+    def invalidate(self, *tables: str):
+        # Dipanggil setelah tulis: query berikutnya ke tabel ini selalu ke database
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [key for key in self._entries if key[0] in tables]:
+                del self._entries[key]
+            for key in [key for key in self._inflight if key[0] in tables]:
+                del self._inflight[key]
+
+    def _evict(self):
+        if len(self._entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+def query_cache() -> QueryCache:
+    # Satu per proses: query identik dari sesi/rerun mana pun ikut digabung
+    global _QUERY_CACHE
+    if _QUERY_CACHE is None:
+        with _POOL_LOCK:
+            if _QUERY_CACHE is None:
+                _QUERY_CACHE = QueryCache(Settings.QUERY_CACHE_TTL_SECONDS, Settings.QUERY_CACHE_MAX_ENTRIES)
+    return _QUERY_CACHE
+
 
 class DatabaseService:
     _instance = None
     _client: Client = None
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseService, cls).__new__(cls)
-            cls._client = create_client(SUPABASE_URL, SUPABASE_KEY)
         return cls._instance
     
     @property
     def client(self) -> Client:
+        # Client dibuat saat pertama dipakai (backend lain tidak butuh kredensial Supabase)
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    client = create_client(SUPABASE_URL, SUPABASE_KEY, ClientOptions(httpx_client=http_client()))
+                    # Sub-client dibuat lazy oleh supabase-py tanpa lock: inisialisasi
+                    # di sini agar thread sesi tidak membuat salinan masing-masing
+                    client.postgrest
+                    client.storage
+                    DatabaseService._client = client
         return self._client
 
-# Global instance
-db = DatabaseService().client
+def __getattr__(name):
+    # Global instance `db` (lazy)
+    if name == 'db':
+        return DatabaseService().client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
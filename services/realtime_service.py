@@ -0,0 +1,257 @@
+import asyncio
+import json
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, urlencode
+
+import websockets
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from config.settings import Settings
+from services.database_service import query_cache
+
+# Subset protokol Phoenix (serializer JSON vsn 1.0.0) yang dipakai Supabase Realtime:
+# phx_join ke satu topic dengan filter postgres_changes, heartbeat berkala ke topic
+# "phoenix", lalu server mengirim event postgres_changes untuk tiap baris baru.
+
+
+def _frame(topic: str, event: str, payload: Dict, ref: Optional[str] = None) -> str:
+    return json.dumps({'topic': topic, 'event': event, 'payload': payload, 'ref': ref, 'join_ref': ref})
+
+
+def _insert_filter(table: str, column: str, value: str) -> Dict:
+    return {'event': 'INSERT', 'schema': 'public', 'table': table, 'filter': f'{column}=eq.{value}'}
+
+
+# ==================== CLIENT ====================
+
+class RealtimeSubscription:
+    # Mendengarkan INSERT pada `messages` untuk receiver_id = user_id di thread
+    # background. Baris baru masuk ke inbox (diambil thread UI lewat drain());
+    # `notify` dipanggil dari thread background setiap ada baris baru atau
+    # koneksi tersambung ulang (pesan selama terputus harus disinkronkan).
+
+    def __init__(self, user_id: str, notify: Callable[[], None] = None, url: str = None):
+        self.user_id = user_id
+        self.notify = notify
+        self.url = url
+        self.topic = f'realtime:messages:{user_id}'
+        self.connected = False
+        self.generation = 0  # Bertambah setiap join berhasil
+        self._inbox = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._stopped = threading.Event()
+        self._ref = 0
+
+    def start(self) -> 'RealtimeSubscription':
+        if self._thread is None:
+            self.url = self.url or realtime_url()
+            self._thread = threading.Thread(target=self._run, name=f'realtime-{self.user_id[:8]}', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._loop is not None and self._stopping is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass  # Loop sudah selesai
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def drain(self) -> List[Dict]:
+        rows = []
+        while True:
+            try:
+                rows.append(self._inbox.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _next_ref(self) -> str:
+        self._ref += 1
+        return str(self._ref)
+
+    def _notify(self):
+        if self.notify:
+            try:
+                self.notify()
+            except Exception:
+                pass
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        if self._stopped.is_set():
+            return
+
+        delay = 1
+        while not self._stopping.is_set():
+            try:
+                async with connect(self.url, open_timeout=10) as websocket:
+                    await self._join(websocket)
+                    self.connected = True
+                    self.generation += 1
+                    delay = 1
+                    if self.generation > 1:
+                        # Tulis selama terputus tidak terlihat dari proses ini
+                        query_cache().invalidate('messages', 'conversations')
+                        self._notify()
+                    await self._listen(websocket)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException, ValueError):
+                pass
+            finally:
+                self.connected = False
+
+            # Reconnect dengan exponential backoff, bisa dibatalkan stop()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                delay = min(delay * 2, Settings.REALTIME_RECONNECT_MAX_SECONDS)
+
+    async def _join(self, websocket):
+        ref = self._next_ref()
+        await websocket.send(_frame(self.topic, 'phx_join', {
+            'config': {'postgres_changes': [_insert_filter('messages', 'receiver_id', self.user_id)]},
+            'access_token': Settings.SUPABASE_KEY,
+        }, ref))
+        while True:
+            message = json.loads(await asyncio.wait_for(websocket.recv(), timeout=10))
+            if message.get('event') == 'phx_reply' and message.get('ref') == ref:
+                if message['payload'].get('status') != 'ok':
+                    raise ValueError(f"Join realtime ditolak: {message['payload']}")
+                return
+
+    async def _listen(self, websocket):
+        heartbeat = asyncio.create_task(self._heartbeat(websocket))
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            while True:
+                receive = asyncio.create_task(websocket.recv())
+                done, _ = await asyncio.wait({receive, stopping, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+                if receive not in done:
+                    receive.cancel()
+                    if heartbeat in done:
+                        heartbeat.result()  # Error heartbeat -> reconnect
+                    return
+                self._handle(json.loads(receive.result()))
+        finally:
+            heartbeat.cancel()
+            stopping.cancel()
+
+    async def _heartbeat(self, websocket):
+        while True:
+            await asyncio.sleep(Settings.REALTIME_HEARTBEAT_SECONDS)
+            await websocket.send(_frame('phoenix', 'heartbeat', {}, self._next_ref()))
+
+    def _handle(self, message: Dict):
+        if message.get('topic') != self.topic or message.get('event') != 'postgres_changes':
+            return
+        data = message['payload'].get('data') or {}
+        record = data.get('record')
+        if data.get('type') == 'INSERT' and record and record.get('receiver_id') == self.user_id:
+            # Pesan dari proses lain: hasil query yang di-cache sudah usang
+            query_cache().invalidate('messages', 'conversations')
+            self._inbox.put(record)
+            self._notify()
+
+
+def realtime_url() -> str:
+    if Settings.REALTIME_URL:
+        return Settings.REALTIME_URL
+    if Settings.STORAGE_BACKEND == 'sqlite':
+        return local_realtime_server().url
+
+    # wss://<project>.supabase.co/realtime/v1/websocket?apikey=...&vsn=1.0.0
+    parts = urlsplit(Settings.SUPABASE_URL)
+    scheme = 'wss' if parts.scheme == 'https' else 'ws'
+    query = urlencode({'apikey': Settings.SUPABASE_KEY, 'vsn': '1.0.0'})
+    return urlunsplit((scheme, parts.netloc, parts.path.rstrip('/') + '/realtime/v1/websocket', query, ''))
+
+
+# ==================== STAND-IN LOKAL ====================
+
+class LocalRealtimeServer:
+    # Server websocket lokal dengan protokol yang sama, untuk backend sqlite dan
+    # pengujian offline. publish() dipanggil (dari thread mana pun) untuk setiap
+    # baris baru; dikirim ke subscriber yang filter `kolom=eq.nilai`-nya cocok.
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self._subscriptions = {}  # websocket -> [(topic, table, column, value)]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f'ws://{self.host}:{self.port}/realtime/v1/websocket?vsn=1.0.0'
+
+    def start(self) -> 'LocalRealtimeServer':
+        threading.Thread(target=lambda: asyncio.run(self._serve()), name='realtime-local', daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def publish(self, table: str, record: Dict):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._broadcast(table, record), self._loop)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        async with serve(self._handler, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.Future()
+
+    async def _handler(self, websocket):
+        self._subscriptions[websocket] = []
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                topic, event, ref = message.get('topic'), message.get('event'), message.get('ref')
+                if event == 'phx_join':
+                    config = message.get('payload', {}).get('config', {})
+                    for change in config.get('postgres_changes', []):
+                        column, _, value = change.get('filter', '').partition('=eq.')
+                        self._subscriptions[websocket].append((topic, change.get('table'), column, value))
+                elif event == 'phx_leave':
+                    self._subscriptions[websocket] = [s for s in self._subscriptions[websocket] if s[0] != topic]
+                await websocket.send(_frame(topic, 'phx_reply', {'status': 'ok', 'response': {}}, ref))
+        except websockets.WebSocketException:
+            pass
+        finally:
+            self._subscriptions.pop(websocket, None)
+
+    async def _broadcast(self, table: str, record: Dict):
+        for websocket, subscriptions in list(self._subscriptions.items()):
+            for topic, subscribed_table, column, value in subscriptions:
+                if subscribed_table == table and (not column or str(record.get(column)) == value):
+                    payload = {'data': {'type': 'INSERT', 'schema': 'public', 'table': table, 'record': record}}
+                    try:
+                        await websocket.send(_frame(topic, 'postgres_changes', payload))
+                    except websockets.WebSocketException:
+                        pass
+
+
+_LOCAL_SERVER: Optional[LocalRealtimeServer] = None
+_LOCAL_SERVER_LOCK = threading.Lock()
+
+
+def local_realtime_server() -> LocalRealtimeServer:
+    # Satu per proses, terhubung ke insert database sqlite yang sedang dipakai
+    global _LOCAL_SERVER
+    with _LOCAL_SERVER_LOCK:
+        if _LOCAL_SERVER is None:
+            from services.repository import message_repository
+            _LOCAL_SERVER = LocalRealtimeServer().start()
+            message_repository().database.insert_listeners.append(_LOCAL_SERVER.publish)
+        return _LOCAL_SERVER
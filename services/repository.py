@@ -0,0 +1,204 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.settings import Settings
+
+# Posisi pesan dalam urutan percakapan: (created_at, id).
+# id None = batas inklusif mulai created_at (dipakai sinkronisasi dengan overlap)
+Cursor = Tuple[str, Optional[str]]
+
+
+def conversation_id(user1_id: str, user2_id: str) -> str:
+    # Id kanonik percakapan pribadi: pasangan peserta terurut (byte order, sama
+    # dengan COLLATE "C" di Postgres), sama untuk kedua arah. Pesan grup: NULL
+    return ':'.join(sorted((user1_id, user2_id)))
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    def find_by_email_hmac(self, email_hmac: str, columns: str = '*') -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def find_by_username_hmac(self, username_hmac: str, columns: str = '*') -> List[Dict]:
+        # Username tidak unik: bisa lebih dari satu user
+        ...
+
+    @abstractmethod
+    def find_by_id(self, user_id: str, columns: str = '*') -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def find_by_ids(self, user_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def insert(self, user: Dict) -> Dict:
+        ...
+
+    @abstractmethod
+    def update(self, user_id: str, fields: Dict):
+        ...
+
+    @abstractmethod
+    def list_all(self, columns: str = '*') -> List[Dict]:
+        ...
+
+
+class MessageRepository(ABC):
+    @abstractmethod
+    def insert(self, message: Dict) -> Dict:
+        ...
+
+    @abstractmethod
+    def insert_many(self, messages: List[Dict]) -> List[Dict]:
+        # Satu batch; id yang sudah ada dilewati (aman untuk retry).
+        # Return hanya baris yang benar-benar baru
+        ...
+
+    @abstractmethod
+    def backfill_conversation_ids(self, batch_size: int) -> int:
+        # Isi conversation_id maksimal `batch_size` baris lama (pesan pribadi tanpa
+        # conversation_id). Return jumlah baris yang diisi; 0 = selesai
+        ...
+
+    @abstractmethod
+    def get_content(self, message_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def get_contents(self, message_ids: Iterable[str]) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    def list_conversation(self, user1_id: str, user2_id: str) -> List[Dict]:
+        # Seluruh percakapan, urut lama -> baru. list_conversation/list_before/
+        # list_after hanya pesan pribadi, lewat conversation_id (lihat conversation_id())
+        ...
+
+    @abstractmethod
+    def list_before(self, user1_id: str, user2_id: str, before: Optional[Cursor],
+                    limit: int, columns: str = '*') -> List[Dict]:
+        # Maksimal `limit` pesan sebelum `before`, urut baru -> lama
+        ...
+
+    @abstractmethod
+    def list_after(self, user1_id: str, user2_id: str, after: Cursor,
+                   limit: int, columns: str = '*') -> List[Dict]:
+        # Maksimal `limit` pesan setelah `after`, urut lama -> baru
+        ...
+
+    @abstractmethod
+    def list_user_messages(self, user_id: str, before: Optional[Cursor],
+                           limit: int, columns: str = '*') -> List[Dict]:
+        # Pesan yang dikirim atau diterima user (semua percakapan), urut baru -> lama
+        ...
+
+    @abstractmethod
+    def list_group_before(self, group_id: str, user_id: str, before: Optional[Cursor],
+                          limit: int, columns: str = '*') -> List[Dict]:
+        # Pesan grup lewat salinan milik user (receiver_id = user), urut baru -> lama
+        ...
+
+    @abstractmethod
+    def list_group_after(self, group_id: str, user_id: str, after: Cursor,
+                         limit: int, columns: str = '*') -> List[Dict]:
+        # Pesan grup setelah `after`, urut lama -> baru
+        ...
+
+
+class ConversationRepository(ABC):
+    # Ringkasan percakapan: satu baris per (user_id, peer_id), jadi setiap peserta
+    # punya unread_count sendiri. Diperbarui setiap pesan terkirim.
+
+    @abstractmethod
+    def record_message(self, sender_id: str, receiver_id: str, message_type: str, created_at: str,
+                       group_id: str = None):
+        # message_count +1 untuk kedua peserta, unread_count +1 untuk penerima.
+        # Pesan grup (satu baris per anggota): hanya (receiver_id, group_id),
+        # unread jika penerima bukan pengirim
+        ...
+
+    @abstractmethod
+    def list_for_user(self, user_id: str, before: Optional[Tuple[str, str]], limit: int) -> List[Dict]:
+        # Maksimal `limit` percakapan sebelum (last_message_at, peer_id), terbaru dulu
+        ...
+
+    @abstractmethod
+    def get(self, user_id: str, peer_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def mark_read(self, user_id: str, peer_id: str):
+        ...
+
+
+class GroupRepository(ABC):
+    @abstractmethod
+    def insert(self, group: Dict) -> Dict:
+        ...
+
+    @abstractmethod
+    def add_members(self, group_id: str, user_ids: Iterable[str]):
+        ...
+
+    @abstractmethod
+    def list_members(self, group_id: str) -> List[str]:
+        # user_id anggota
+        ...
+
+    @abstractmethod
+    def find_by_ids(self, group_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        ...
+
+
+Repositories = Tuple[UserRepository, MessageRepository, ConversationRepository, GroupRepository]
+
+_REPOSITORIES: Optional[Repositories] = None
+_REPOSITORIES_LOCK = threading.Lock()
+
+
+def _create_repositories() -> Repositories:
+    backend = Settings.STORAGE_BACKEND
+    if backend == 'supabase':
+        from services.supabase_repository import (
+            SupabaseUserRepository, SupabaseMessageRepository, SupabaseConversationRepository,
+            SupabaseGroupRepository
+        )
+        return (SupabaseUserRepository(), SupabaseMessageRepository(), SupabaseConversationRepository(),
+                SupabaseGroupRepository())
+    if backend == 'sqlite':
+        from services.sqlite_repository import (
+            SQLiteDatabase, SQLiteUserRepository, SQLiteMessageRepository, SQLiteConversationRepository,
+            SQLiteGroupRepository
+        )
+        database = SQLiteDatabase(Settings.SQLITE_PATH)
+        return (SQLiteUserRepository(database), SQLiteMessageRepository(database),
+                SQLiteConversationRepository(database), SQLiteGroupRepository(database))
+    raise ValueError(f"STORAGE_BACKEND tidak dikenal: {backend}")
+
+
+def get_repositories() -> Repositories:
+    # Dibuat sekali per proses sesuai Settings.STORAGE_BACKEND
+    global _REPOSITORIES
+    if _REPOSITORIES is None:
+        with _REPOSITORIES_LOCK:
+            if _REPOSITORIES is None:
+                _REPOSITORIES = _create_repositories()
+    return _REPOSITORIES
+
+
+def user_repository() -> UserRepository:
+    return get_repositories()[0]
+
+
+def message_repository() -> MessageRepository:
+    return get_repositories()[1]
+
+
+def conversation_repository() -> ConversationRepository:
+    return get_repositories()[2]
+
+
+def group_repository() -> GroupRepository:
+    return get_repositories()[3]
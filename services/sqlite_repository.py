@@ -0,0 +1,477 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from services.repository import Cursor, conversation_id, UserRepository, MessageRepository, ConversationRepository, GroupRepository
+
+# Skema lokal setara migrations/*.sql, dengan index untuk query yang dipakai model:
+# lookup user per HMAC, percakapan per conversation_id urut (created_at, id),
+# semua pesan satu user (daftar kontak), dan pesan grup per anggota
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    email_hmac TEXT NOT NULL,
+    username TEXT NOT NULL,
+    username_hmac TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    password_hmac TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_hmac_idx ON users (email_hmac);
+CREATE INDEX IF NOT EXISTS users_username_hmac_idx ON users (username_hmac);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    sender_id TEXT NOT NULL,
+    receiver_id TEXT NOT NULL,
+    conversation_id TEXT,
+    message_type TEXT NOT NULL DEFAULT 'text',
+    encrypted_content TEXT NOT NULL,
+    encrypted_hmac TEXT,
+    content_size INTEGER,
+    encrypted_preview TEXT,
+    blob_ref TEXT,
+    blob_digest TEXT,
+    group_id TEXT,
+    encrypted_key TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_sender_idx ON messages (sender_id, created_at, id);
+CREATE INDEX IF NOT EXISTS messages_receiver_idx ON messages (receiver_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id TEXT NOT NULL,
+    peer_id TEXT NOT NULL,
+    last_message_at TEXT NOT NULL,
+    last_message_type TEXT NOT NULL,
+    last_sender_id TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, peer_id)
+);
+CREATE INDEX IF NOT EXISTS conversations_recent_idx ON conversations (user_id, last_message_at, peer_id);
+
+CREATE TABLE IF NOT EXISTS groups (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_hmac TEXT NOT NULL,
+    created_by TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (group_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS group_members_user_idx ON group_members (user_id);
+"""
+
+# Database lama tanpa ringkasan: bangun dari messages (unread dianggap 0).
+# Pesan grup: satu baris (anggota, grup) dari salinan milik anggota
+_BACKFILL_CONVERSATIONS = """
+INSERT INTO conversations (user_id, peer_id, last_message_at, last_message_type, last_sender_id, message_count, unread_count)
+SELECT user_id, peer_id, MAX(created_at), message_type, sender_id, COUNT(*), 0 FROM (
+    SELECT sender_id AS user_id, receiver_id AS peer_id, created_at, message_type, sender_id FROM messages
+    WHERE group_id IS NULL
+    UNION ALL
+    SELECT receiver_id, sender_id, created_at, message_type, sender_id FROM messages
+    WHERE receiver_id != sender_id AND group_id IS NULL
+    UNION ALL
+    SELECT receiver_id, group_id, created_at, message_type, sender_id FROM messages WHERE group_id IS NOT NULL
+) GROUP BY user_id, peer_id
+"""
+
+# Kolom yang ditambahkan setelah skema awal: (table, kolom, definisi)
+_ADDED_COLUMNS = [
+    ('messages', 'blob_ref', 'TEXT'),
+    ('messages', 'blob_digest', 'TEXT'),
+    ('messages', 'group_id', 'TEXT'),
+    ('messages', 'encrypted_key', 'TEXT'),
+    ('messages', 'conversation_id', 'TEXT'),
+]
+
+# Sama dengan conversation_id() di services/repository.py
+_CONVERSATION_ID = (
+    "CASE WHEN sender_id <= receiver_id THEN sender_id || ':' || receiver_id "
+    "ELSE receiver_id || ':' || sender_id END"
+)
+
+# Index di atas kolom tambahan, dibuat setelah kolomnya ada. Trigger mengisi
+# conversation_id untuk insert yang tidak menyertakannya (baris pesan pribadi)
+_ADDED_INDEXES = f"""
+CREATE INDEX IF NOT EXISTS messages_group_idx ON messages (group_id, receiver_id, created_at, id);
+CREATE INDEX IF NOT EXISTS messages_conversation_id_idx ON messages (conversation_id, created_at, id);
+DROP INDEX IF EXISTS messages_conversation_idx;
+CREATE TRIGGER IF NOT EXISTS messages_conversation_id_fill AFTER INSERT ON messages
+WHEN NEW.conversation_id IS NULL AND NEW.group_id IS NULL
+BEGIN
+    UPDATE messages SET conversation_id = {_CONVERSATION_ID} WHERE rowid = NEW.rowid;
+END;
+"""
+
+# Backfill baris lama per batch (lihat backfill_conversation_ids)
+_BACKFILL_CONVERSATION_IDS = f"""
+UPDATE messages SET conversation_id = {_CONVERSATION_ID}
+WHERE rowid IN (
+    SELECT rowid FROM messages WHERE conversation_id IS NULL AND group_id IS NULL LIMIT ?
+)
+"""
+
+
+def _now() -> str:
+    # Format sama dengan timestamptz dari PostgREST sehingga urutan string = urutan waktu
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+class SQLiteDatabase:
+    # Satu koneksi per proses (juga untuk ':memory:'), diserialisasi dengan lock
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        for table, column, definition in _ADDED_COLUMNS:
+            existing = [row['name'] for row in self._connection.execute(f'PRAGMA table_info({table})')]
+            if column not in existing:
+                self._connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        self._connection.executescript(_ADDED_INDEXES)
+        if not self._connection.execute('SELECT 1 FROM conversations LIMIT 1').fetchone():
+            self._connection.execute(_BACKFILL_CONVERSATIONS)
+            self._connection.commit()
+        while self.backfill_conversation_ids(5000) == 5000:
+            pass
+        # Dipanggil (table, row) setelah insert commit, mis. stand-in realtime lokal
+        self.insert_listeners: List[Callable[[str, Dict], None]] = []
+        self.columns = {
+            table: [row['name'] for row in self._connection.execute(f'PRAGMA table_info({table})')]
+            for table in ('users', 'messages', 'conversations', 'groups', 'group_members')
+        }
+
+    def backfill_conversation_ids(self, batch_size: int) -> int:
+        # Satu batch baris dari sebelum kolom conversation_id ada; return jumlah baris yang diisi
+        with self._lock:
+            updated = self._connection.execute(_BACKFILL_CONVERSATION_IDS, (batch_size,)).rowcount
+            self._connection.commit()
+        return updated
+
+    def query(self, sql: str, params: Sequence = ()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(sql, params)]
+
+    def execute(self, sql: str, params: Sequence = ()):
+        with self._lock:
+            self._connection.execute(sql, params)
+            self._connection.commit()
+
+    def select_list(self, table: str, columns: str) -> str:
+        # Kolom gaya PostgREST ('*' atau 'a,b,c'); hanya nama kolom yang dikenal
+        if columns == '*':
+            return '*'
+        names = [name.strip() for name in columns.split(',')]
+        unknown = [name for name in names if name not in self.columns[table]]
+        if unknown:
+            raise ValueError(f"Kolom tidak dikenal di {table}: {', '.join(unknown)}")
+        return ', '.join(names)
+
+    def insert(self, table: str, row: Dict) -> Dict:
+        row = dict(row)
+        row.setdefault('created_at', _now())
+        unknown = [name for name in row if name not in self.columns[table]]
+        if unknown:
+            raise ValueError(f"Kolom tidak dikenal di {table}: {', '.join(unknown)}")
+
+        names = list(row)
+        self.execute(
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+            [row[name] for name in names]
+        )
+        for listener in self.insert_listeners:
+            listener(table, row)
+        return row
+
+    def insert_many(self, table: str, rows: List[Dict]) -> List[Dict]:
+        # Satu transaksi; baris dengan primary key yang sudah ada dilewati
+        rows = [dict(row) for row in rows]
+        inserted = []
+        with self._lock:
+            try:
+                for row in rows:
+                    row.setdefault('created_at', _now())
+                    unknown = [name for name in row if name not in self.columns[table]]
+                    if unknown:
+                        raise ValueError(f"Kolom tidak dikenal di {table}: {', '.join(unknown)}")
+                    names = list(row)
+                    cursor = self._connection.execute(
+                        f"INSERT OR IGNORE INTO {table} ({', '.join(names)}) "
+                        f"VALUES ({', '.join('?' for _ in names)})",
+                        [row[name] for name in names]
+                    )
+                    if cursor.rowcount:
+                        inserted.append(row)
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+        for row in inserted:
+            for listener in self.insert_listeners:
+                listener(table, row)
+        return inserted
+
+
+class SQLiteUserRepository(UserRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def find_by_email_hmac(self, email_hmac: str, columns: str = '*') -> Optional[Dict]:
+        rows = self.database.query(
+            f"SELECT {self.database.select_list('users', columns)} FROM users WHERE email_hmac = ?",
+            (email_hmac,)
+        )
+        return rows[0] if rows else None
+
+    def find_by_username_hmac(self, username_hmac: str, columns: str = '*') -> List[Dict]:
+        return self.database.query(
+            f"SELECT {self.database.select_list('users', columns)} FROM users WHERE username_hmac = ?",
+            (username_hmac,)
+        )
+
+    def find_by_id(self, user_id: str, columns: str = '*') -> Optional[Dict]:
+        rows = self.database.query(
+            f"SELECT {self.database.select_list('users', columns)} FROM users WHERE id = ?",
+            (user_id,)
+        )
+        return rows[0] if rows else None
+
+    def find_by_ids(self, user_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return self.database.query(
+            f"SELECT {self.database.select_list('users', columns)} FROM users "
+            f"WHERE id IN ({', '.join('?' for _ in user_ids)})",
+            user_ids
+        )
+
+    def insert(self, user: Dict) -> Dict:
+        return self.database.insert('users', user)
+
+    def update(self, user_id: str, fields: Dict):
+        names = list(fields)
+        unknown = [name for name in names if name not in self.database.columns['users']]
+        if unknown:
+            raise ValueError(f"Kolom tidak dikenal di users: {', '.join(unknown)}")
+        self.database.execute(
+            f"UPDATE users SET {', '.join(f'{name} = ?' for name in names)} WHERE id = ?",
+            [fields[name] for name in names] + [user_id]
+        )
+
+    def list_all(self, columns: str = '*') -> List[Dict]:
+        return self.database.query(f"SELECT {self.database.select_list('users', columns)} FROM users")
+
+
+class SQLiteMessageRepository(MessageRepository):
+    # Kedua arah percakapan punya conversation_id yang sama: satu range scan di
+    # messages_conversation_id_idx. Pesan grup tidak punya conversation_id
+    _CONVERSATION = 'conversation_id = ?'
+
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def insert(self, message: Dict) -> Dict:
+        return self.database.insert('messages', message)
+
+    def insert_many(self, messages: List[Dict]) -> List[Dict]:
+        return self.database.insert_many('messages', messages)
+
+    def backfill_conversation_ids(self, batch_size: int) -> int:
+        return self.database.backfill_conversation_ids(batch_size)
+
+    def get_content(self, message_id: str) -> Optional[str]:
+        rows = self.database.query('SELECT encrypted_content FROM messages WHERE id = ?', (message_id,))
+        return rows[0]['encrypted_content'] if rows else None
+
+    def get_contents(self, message_ids: Iterable[str]) -> Dict[str, str]:
+        message_ids = list(message_ids)
+        if not message_ids:
+            return {}
+        rows = self.database.query(
+            f"SELECT id, encrypted_content FROM messages WHERE id IN ({', '.join('?' for _ in message_ids)})",
+            message_ids
+        )
+        return {row['id']: row['encrypted_content'] for row in rows}
+
+    def list_conversation(self, user1_id: str, user2_id: str) -> List[Dict]:
+        return self.database.query(
+            f"SELECT * FROM messages WHERE {self._CONVERSATION} ORDER BY created_at, id",
+            (conversation_id(user1_id, user2_id),)
+        )
+
+    def list_before(self, user1_id: str, user2_id: str, before: Optional[Cursor],
+                    limit: int, columns: str = '*') -> List[Dict]:
+        condition, params = '', []
+        if before:
+            created_at, message_id = before
+            condition = ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            params = [created_at, created_at, message_id]
+
+        return self.database.query(
+            f"SELECT {self.database.select_list('messages', columns)} FROM messages "
+            f"WHERE {self._CONVERSATION}{condition} ORDER BY created_at DESC, id DESC LIMIT ?",
+            [conversation_id(user1_id, user2_id)] + params + [limit]
+        )
+
+    def list_after(self, user1_id: str, user2_id: str, after: Cursor,
+                   limit: int, columns: str = '*') -> List[Dict]:
+        created_at, message_id = after
+        if message_id is None:
+            condition, params = ' AND created_at >= ?', [created_at]
+        else:
+            condition = ' AND (created_at > ? OR (created_at = ? AND id > ?))'
+            params = [created_at, created_at, message_id]
+
+        return self.database.query(
+            f"SELECT {self.database.select_list('messages', columns)} FROM messages "
+            f"WHERE {self._CONVERSATION}{condition} ORDER BY created_at, id LIMIT ?",
+            [conversation_id(user1_id, user2_id)] + params + [limit]
+        )
+
+    def list_user_messages(self, user_id: str, before: Optional[Cursor],
+                           limit: int, columns: str = '*') -> List[Dict]:
+        # Dua cabang terpisah agar masing-masing memakai index sender/receiver
+        # dengan ORDER BY + LIMIT, lalu digabung (pesan ke diri sendiri sekali saja)
+        condition, params = '', []
+        if before:
+            created_at, message_id = before
+            condition = ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            params = [created_at, created_at, message_id]
+
+        select = self.database.select_list('messages', columns)
+        order = 'ORDER BY created_at DESC, id DESC LIMIT ?'
+        if select != '*':
+            # Kolom urutan dibutuhkan di luar subquery
+            select = ', '.join(dict.fromkeys(select.split(', ') + ['created_at', 'id']))
+        return self.database.query(
+            f"SELECT * FROM (SELECT {select} FROM messages WHERE sender_id = ?{condition} {order}) "
+            f"UNION ALL "
+            f"SELECT * FROM (SELECT {select} FROM messages WHERE receiver_id = ? AND sender_id != ?{condition} {order}) "
+            f"{order}",
+            [user_id] + params + [limit, user_id, user_id] + params + [limit, limit]
+        )
+
+    def list_group_before(self, group_id: str, user_id: str, before: Optional[Cursor],
+                          limit: int, columns: str = '*') -> List[Dict]:
+        condition, params = '', []
+        if before:
+            created_at, message_id = before
+            condition = ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            params = [created_at, created_at, message_id]
+
+        return self.database.query(
+            f"SELECT {self.database.select_list('messages', columns)} FROM messages "
+            f"WHERE group_id = ? AND receiver_id = ?{condition} ORDER BY created_at DESC, id DESC LIMIT ?",
+            [group_id, user_id] + params + [limit]
+        )
+
+    def list_group_after(self, group_id: str, user_id: str, after: Cursor,
+                         limit: int, columns: str = '*') -> List[Dict]:
+        created_at, message_id = after
+        if message_id is None:
+            condition, params = ' AND created_at >= ?', [created_at]
+        else:
+            condition = ' AND (created_at > ? OR (created_at = ? AND id > ?))'
+            params = [created_at, created_at, message_id]
+
+        return self.database.query(
+            f"SELECT {self.database.select_list('messages', columns)} FROM messages "
+            f"WHERE group_id = ? AND receiver_id = ?{condition} ORDER BY created_at, id LIMIT ?",
+            [group_id, user_id] + params + [limit]
+        )
+
+
+class SQLiteConversationRepository(ConversationRepository):
+    _UPSERT = """
+        INSERT INTO conversations (user_id, peer_id, last_message_at, last_message_type, last_sender_id,
+                                   message_count, unread_count)
+        VALUES {values}
+        ON CONFLICT (user_id, peer_id) DO UPDATE SET
+            message_count = message_count + 1,
+            unread_count = unread_count + excluded.unread_count,
+            last_message_at = max(last_message_at, excluded.last_message_at),
+            last_message_type = CASE WHEN excluded.last_message_at >= last_message_at
+                                     THEN excluded.last_message_type ELSE last_message_type END,
+            last_sender_id = CASE WHEN excluded.last_message_at >= last_message_at
+                                  THEN excluded.last_sender_id ELSE last_sender_id END
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def record_message(self, sender_id: str, receiver_id: str, message_type: str, created_at: str,
+                       group_id: str = None):
+        # Satu statement untuk kedua peserta (pesan ke diri sendiri: satu baris, tidak unread)
+        if group_id:
+            rows = [(receiver_id, group_id, created_at, message_type, sender_id, 1, int(receiver_id != sender_id))]
+        else:
+            rows = [(sender_id, receiver_id, created_at, message_type, sender_id, 1, 0)]
+            if receiver_id != sender_id:
+                rows.append((receiver_id, sender_id, created_at, message_type, sender_id, 1, 1))
+        self.database.execute(
+            self._UPSERT.format(values=', '.join('(?, ?, ?, ?, ?, ?, ?)' for _ in rows)),
+            [value for row in rows for value in row]
+        )
+
+    def list_for_user(self, user_id: str, before: Optional[Tuple[str, str]], limit: int) -> List[Dict]:
+        condition, params = '', []
+        if before:
+            last_message_at, peer_id = before
+            condition = ' AND (last_message_at < ? OR (last_message_at = ? AND peer_id < ?))'
+            params = [last_message_at, last_message_at, peer_id]
+
+        return self.database.query(
+            f"SELECT * FROM conversations WHERE user_id = ?{condition} "
+            f"ORDER BY last_message_at DESC, peer_id DESC LIMIT ?",
+            [user_id] + params + [limit]
+        )
+
+    def get(self, user_id: str, peer_id: str) -> Optional[Dict]:
+        rows = self.database.query(
+            'SELECT * FROM conversations WHERE user_id = ? AND peer_id = ?', (user_id, peer_id)
+        )
+        return rows[0] if rows else None
+
+    def mark_read(self, user_id: str, peer_id: str):
+        self.database.execute(
+            'UPDATE conversations SET unread_count = 0 WHERE user_id = ? AND peer_id = ?', (user_id, peer_id)
+        )
+
+
+class SQLiteGroupRepository(GroupRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def insert(self, group: Dict) -> Dict:
+        return self.database.insert('groups', group)
+
+    def add_members(self, group_id: str, user_ids: Iterable[str]):
+        self.database.insert_many('group_members', [{'group_id': group_id, 'user_id': user_id} for user_id in user_ids])
+
+    def list_members(self, group_id: str) -> List[str]:
+        rows = self.database.query('SELECT user_id FROM group_members WHERE group_id = ?', (group_id,))
+        return [row['user_id'] for row in rows]
+
+    def find_by_ids(self, group_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        group_ids = list(group_ids)
+        if not group_ids:
+            return []
+        return self.database.query(
+            f"SELECT {self.database.select_list('groups', columns)} FROM groups "
+            f"WHERE id IN ({', '.join('?' for _ in group_ids)})",
+            group_ids
+        )
@@ -0,0 +1,229 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.database_service import DatabaseService, query_cache
+from services.repository import Cursor, conversation_id, UserRepository, MessageRepository, ConversationRepository, GroupRepository
+
+
+def _table(name: str):
+    return DatabaseService().client.from_(name)
+
+
+def _cached(table: str, key: Tuple, query) -> List[Dict]:
+    # Baca lewat query cache: `query()` membangun dan mengeksekusi query,
+    # `key` harus mencakup semua parameternya
+    return query_cache().get(table, key, lambda: query().execute().data or [])
+
+
+def _written(*tables: str):
+    query_cache().invalidate(*tables)
+
+
+class SupabaseUserRepository(UserRepository):
+    def find_by_email_hmac(self, email_hmac: str, columns: str = '*') -> Optional[Dict]:
+        rows = _cached('users', ('email_hmac', email_hmac, columns),
+                       lambda: _table('users').select(columns).eq('email_hmac', email_hmac))
+        return rows[0] if rows else None
+
+    def find_by_username_hmac(self, username_hmac: str, columns: str = '*') -> List[Dict]:
+        return _cached('users', ('username_hmac', username_hmac, columns),
+                       lambda: _table('users').select(columns).eq('username_hmac', username_hmac))
+
+    def find_by_id(self, user_id: str, columns: str = '*') -> Optional[Dict]:
+        rows = _cached('users', ('id', user_id, columns), lambda: _table('users').select(columns).eq('id', user_id))
+        return rows[0] if rows else None
+
+    def find_by_ids(self, user_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return _cached('users', ('ids', tuple(user_ids), columns),
+                       lambda: _table('users').select(columns).in_('id', user_ids))
+
+    def insert(self, user: Dict) -> Dict:
+        response = _table('users').insert(user).execute()
+        _written('users')
+        return response.data[0] if response.data else None
+
+    def update(self, user_id: str, fields: Dict):
+        _table('users').update(fields).eq('id', user_id).execute()
+        _written('users')
+
+    def list_all(self, columns: str = '*') -> List[Dict]:
+        return _cached('users', ('all', columns), lambda: _table('users').select(columns))
+
+
+class SupabaseMessageRepository(MessageRepository):
+    @staticmethod
+    def _conversation_query(user1_id: str, user2_id: str, columns: str):
+        # Kedua arah percakapan pribadi: satu range scan di messages_conversation_id_idx
+        return _table('messages').select(columns).eq('conversation_id', conversation_id(user1_id, user2_id))
+
+    @staticmethod
+    def _group_query(group_id: str, user_id: str, columns: str):
+        return _table('messages').select(columns).eq('group_id', group_id).eq('receiver_id', user_id)
+
+    def insert(self, message: Dict) -> Dict:
+        response = _table('messages').insert(message).execute()
+        _written('messages')
+        return response.data[0] if response.data else None
+
+    def insert_many(self, messages: List[Dict]) -> List[Dict]:
+        response = _table('messages').upsert(messages, on_conflict='id', ignore_duplicates=True).execute()
+        _written('messages')
+        return response.data if response.data else []
+
+    def backfill_conversation_ids(self, batch_size: int) -> int:
+        # Fungsi SQL backfill_conversation_ids (migrations/0002_conversation_id.sql)
+        response = DatabaseService().client.rpc('backfill_conversation_ids', {'p_batch': batch_size}).execute()
+        if response.data:
+            _written('messages')
+        return response.data or 0
+
+    def get_content(self, message_id: str) -> Optional[str]:
+        response = _table('messages').select('encrypted_content').eq('id', message_id).execute()
+        return response.data[0]['encrypted_content'] if response.data else None
+
+    def get_contents(self, message_ids: Iterable[str]) -> Dict[str, str]:
+        response = _table('messages').select('id,encrypted_content').in_('id', list(message_ids)).execute()
+        return {row['id']: row['encrypted_content'] for row in response.data or []}
+
+    def list_conversation(self, user1_id: str, user2_id: str) -> List[Dict]:
+        return _cached('messages', ('conversation', conversation_id(user1_id, user2_id)),
+                       lambda: self._conversation_query(user1_id, user2_id, '*').order('created_at', desc=False))
+
+    def list_before(self, user1_id: str, user2_id: str, before: Optional[Cursor],
+                    limit: int, columns: str = '*') -> List[Dict]:
+        def query():
+            query = self._conversation_query(user1_id, user2_id, columns)
+            if before:
+                created_at, message_id = before
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{message_id})'
+                )
+            return query.order('created_at', desc=True).order('id', desc=True).limit(limit)
+        return _cached('messages', ('before', conversation_id(user1_id, user2_id), before, limit, columns), query)
+
+    def list_after(self, user1_id: str, user2_id: str, after: Cursor,
+                   limit: int, columns: str = '*') -> List[Dict]:
+        def query():
+            query = self._conversation_query(user1_id, user2_id, columns)
+            created_at, message_id = after
+            if message_id is None:
+                query = query.gte('created_at', created_at)
+            else:
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.gt.{message_id})'
+                )
+            return query.order('created_at', desc=False).order('id', desc=False).limit(limit)
+        return _cached('messages', ('after', conversation_id(user1_id, user2_id), after, limit, columns), query)
+
+    def list_user_messages(self, user_id: str, before: Optional[Cursor],
+                           limit: int, columns: str = '*') -> List[Dict]:
+        condition = ''
+        if before:
+            created_at, message_id = before
+            condition = (
+                f',or(created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{message_id}))'
+            )
+
+        return _cached('messages', ('user', user_id, before, limit, columns),
+                       lambda: _table('messages').select(columns).or_(
+                           f'and(sender_id.eq.{user_id}{condition}),and(receiver_id.eq.{user_id}{condition})'
+                       ).order('created_at', desc=True).order('id', desc=True).limit(limit))
+
+    def list_group_before(self, group_id: str, user_id: str, before: Optional[Cursor],
+                          limit: int, columns: str = '*') -> List[Dict]:
+        def query():
+            query = self._group_query(group_id, user_id, columns)
+            if before:
+                created_at, message_id = before
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{message_id})'
+                )
+            return query.order('created_at', desc=True).order('id', desc=True).limit(limit)
+        return _cached('messages', ('group_before', group_id, user_id, before, limit, columns), query)
+
+    def list_group_after(self, group_id: str, user_id: str, after: Cursor,
+                         limit: int, columns: str = '*') -> List[Dict]:
+        def query():
+            query = self._group_query(group_id, user_id, columns)
+            created_at, message_id = after
+            if message_id is None:
+                query = query.gte('created_at', created_at)
+            else:
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.gt.{message_id})'
+                )
+            return query.order('created_at', desc=False).order('id', desc=False).limit(limit)
+        return _cached('messages', ('group_after', group_id, user_id, after, limit, columns), query)
+
+
+class SupabaseConversationRepository(ConversationRepository):
+    def record_message(self, sender_id: str, receiver_id: str, message_type: str, created_at: str,
+                       group_id: str = None):
+        # Increment atomik di fungsi SQL record_message / record_group_message (lihat README)
+        if group_id:
+            DatabaseService().client.rpc('record_group_message', {
+                'p_user': receiver_id,
+                'p_group': group_id,
+                'p_sender': sender_id,
+                'p_type': message_type,
+                'p_created_at': created_at,
+            }).execute()
+        else:
+            DatabaseService().client.rpc('record_message', {
+                'p_sender': sender_id,
+                'p_receiver': receiver_id,
+                'p_type': message_type,
+                'p_created_at': created_at,
+            }).execute()
+        _written('conversations')
+
+    def list_for_user(self, user_id: str, before: Optional[Tuple[str, str]], limit: int) -> List[Dict]:
+        def query():
+            query = _table('conversations').select('*').eq('user_id', user_id)
+            if before:
+                last_message_at, peer_id = before
+                query = query.or_(
+                    f'last_message_at.lt."{last_message_at}",'
+                    f'and(last_message_at.eq."{last_message_at}",peer_id.lt.{peer_id})'
+                )
+            return query.order('last_message_at', desc=True).order('peer_id', desc=True).limit(limit)
+        return _cached('conversations', ('user', user_id, before, limit), query)
+
+    def get(self, user_id: str, peer_id: str) -> Optional[Dict]:
+        rows = _cached('conversations', ('pair', user_id, peer_id),
+                       lambda: _table('conversations').select('*').eq('user_id', user_id).eq('peer_id', peer_id))
+        return rows[0] if rows else None
+
+    def mark_read(self, user_id: str, peer_id: str):
+        _table('conversations').update({'unread_count': 0}).eq('user_id', user_id).eq('peer_id', peer_id).execute()
+        _written('conversations')
+
+
+class SupabaseGroupRepository(GroupRepository):
+    def insert(self, group: Dict) -> Dict:
+        response = _table('groups').insert(group).execute()
+        _written('groups')
+        return response.data[0] if response.data else None
+
+    def add_members(self, group_id: str, user_ids: Iterable[str]):
+        rows = [{'group_id': group_id, 'user_id': user_id} for user_id in user_ids]
+        _table('group_members').upsert(rows, on_conflict='group_id,user_id', ignore_duplicates=True).execute()
+        _written('group_members')
+
+    def list_members(self, group_id: str) -> List[str]:
+        rows = _cached('group_members', ('group', group_id),
+                       lambda: _table('group_members').select('user_id').eq('group_id', group_id))
+        return [row['user_id'] for row in rows]
+
+    def find_by_ids(self, group_ids: Iterable[str], columns: str = '*') -> List[Dict]:
+        group_ids = list(group_ids)
+        if not group_ids:
+            return []
+        return _cached('groups', ('ids', tuple(group_ids), columns),
+                       lambda: _table('groups').select(columns).in_('id', group_ids))
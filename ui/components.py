@@ -2,18 +2,36 @@ import streamlit as st
 import base64
 import json
 import hashlib
-from datetime import datetime
-from models.user import User
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, List, Optional
 from models.message import Message
+from models.conversation_store import ConversationStore
+from models.user import User
+from models.contact_list import ContactList
+from models.group import Group
+from models.user_directory import user_directory
+from models.outbox import outbox, PENDING, FAILED
+from services.crypto_service import stego_payload_size, ENVELOPE_PREFIX
+from services.realtime_service import RealtimeSubscription
+from services.database_service import run_concurrently
+from config.settings import Settings
 
 # Initialize cache in session state
 if 'decrypted_cache' not in st.session_state:
     st.session_state.decrypted_cache = {}
+if 'conversation_stores' not in st.session_state:
+    st.session_state.conversation_stores = {}
 
-def get_cached_decrypt(message_id: str, encrypted_content: str, encrypted_hmac: str, key: str, decrypt_function) -> any:
-    # Generate unique cache key
+def _decrypt_cache_key(message_id: str, key: str) -> str:
     key_hash = hashlib.md5(key.encode()).hexdigest()
-    cache_key = f"{message_id}_{key_hash}"
+    return f"{message_id}_{key_hash}"
+
+def get_cached_decrypt(msg: dict, key: str, decrypt_function) -> any:
+    # Generate unique cache key
+    cache_key = _decrypt_cache_key(msg['id'], key)
     
     # Check cache
     if cache_key in st.session_state.decrypted_cache:
@@ -21,12 +39,188 @@ def get_cached_decrypt(message_id: str, encrypted_content: str, encrypted_hmac:
     
     # Decrypt pertama kali (cache miss)
     try:
-        decrypted = decrypt_function(encrypted_content, encrypted_hmac, key)
+        decrypted = decrypt_function(msg, key)
         st.session_state.decrypted_cache[cache_key] = decrypted
         return decrypted
     except Exception as e:
         raise e
 
+def prefetch_text_decrypts(messages: list, key: str):
+    # Dekripsi semua pesan teks yang belum ada di cache dalam satu batch paralel
+    pending = [
+        msg for msg in messages
+        if msg.get('message_type', 'text').lower() == 'text'
+        and _decrypt_cache_key(msg['id'], key) not in st.session_state.decrypted_cache
+    ]
+    if not pending:
+        return
+    
+    for msg, (decrypted, error) in zip(pending, Message.decrypt_many(pending, key)):
+        if error is None:
+            st.session_state.decrypted_cache[_decrypt_cache_key(msg['id'], key)] = decrypted
+
+class RerunSignal:
+    # Permintaan rerun dari thread background (realtime, outbox). Thread itu
+    # tidak menyentuh sesi Streamlit; mereka hanya menyalakan flag ini, dan
+    # rerun_watcher() memeriksanya setiap RERUN_POLL_SECONDS
+    def __init__(self):
+        self._requested = threading.Event()
+        self.polled_at = time.monotonic()
+    
+    def request(self):
+        self._requested.set()
+    
+    def take(self) -> bool:
+        self.polled_at = time.monotonic()
+        if not self._requested.is_set():
+            return False
+        self._requested.clear()
+        return True
+    
+    @property
+    def abandoned(self) -> bool:
+        # Browser tidak lagi menjalankan fragment (tab/sesi ditutup)
+        return time.monotonic() - self.polled_at > Settings.RERUN_WATCHER_TIMEOUT_SECONDS
+
+def _rerun_signal() -> RerunSignal:
+    if 'rerun_signal' not in st.session_state:
+        st.session_state.rerun_signal = RerunSignal()
+    return st.session_state.rerun_signal
+
+def _session_rerun(on_closed=None):
+    # Dipanggil dari thread background: minta rerun sesi ini (diproses paling
+    # lambat RERUN_POLL_SECONDS kemudian). Sesi sudah ditutup -> on_closed()
+    signal = _rerun_signal()
+    
+    def rerun():
+        if on_closed and signal.abandoned:
+            on_closed()
+            return
+        signal.request()
+    return rerun
+
+@st.fragment(run_every=Settings.RERUN_POLL_SECONDS)
+def rerun_watcher():
+    # Fragment kosong di halaman chat: setiap interval hanya fungsi ini yang
+    # dijalankan; rerun penuh hanya jika ada permintaan dari thread background
+    if _rerun_signal().take():
+        st.rerun()
+
+def sync_realtime():
+    # Dipanggil sekali per rerun halaman chat: pastikan subscription aktif lalu
+    # masukkan pesan yang diterima lewat realtime ke store percakapannya
+    if not Settings.REALTIME_ENABLED:
+        return
+    
+    user_id = st.session_state.user['id']
+    subscription = st.session_state.get('realtime')
+    if subscription is None or subscription.user_id != user_id or subscription.stopped:
+        if subscription:
+            subscription.stop()
+        subscription = RealtimeSubscription(user_id)
+        subscription.notify = _session_rerun(subscription.stop)
+        st.session_state.realtime = subscription.start()
+    
+    stores = st.session_state.conversation_stores
+    # Tersambung (ulang): pesan selama terputus diambil lewat sync biasa;
+    # daftar kontak dimuat ulang oleh load_chat_data (bersamaan dengan sync)
+    if subscription.generation != st.session_state.get('realtime_generation'):
+        st.session_state.realtime_generation = subscription.generation
+        for store in stores.values():
+            store.stale = True
+            store.rescan = True
+        if subscription.generation > 1:
+            st.session_state.contacts = None
+    
+    rows = subscription.drain()
+    for row in rows:
+        # Pesan grup masuk ke percakapan grup (termasuk salinan pesan sendiri)
+        store = stores.get(f"{user_id}:{row.get('group_id') or row['sender_id']}")
+        if store:
+            store.push([row])
+    
+    # Halaman kontak pertama belum dimuat: diterapkan setelah load_chat_data memuatnya
+    contacts = _loaded_contacts()
+    if contacts is None:
+        st.session_state.setdefault('pending_contact_rows', []).extend(rows)
+    else:
+        _touch_contacts(contacts, rows)
+
+def _touch_contacts(contacts: ContactList, rows: List[Dict], fresh: bool = False):
+    # fresh: halaman kontak dimuat setelah baris diterima; baris yang sudah
+    # tercatat di ringkasan (created_at <= last_message_at) tidak dihitung lagi
+    for row in rows:
+        peer_id = row.get('group_id') or row['sender_id']
+        # Pesan di percakapan yang sedang dibuka langsung dianggap dibaca
+        is_open = st.session_state.selected_user and st.session_state.selected_user['id'] == peer_id
+        received = row['sender_id'] != contacts.user_id
+        contact = contacts.get(peer_id) if fresh else None
+        if not contact or row['created_at'] > contact['last_message_at']:
+            contacts.touch(peer_id, row['created_at'], row.get('message_type', 'text'), unread=received and not is_open)
+        if is_open and received:
+            contacts.mark_read(peer_id, force=True)
+
+def realtime_live() -> bool:
+    subscription = st.session_state.get('realtime')
+    return bool(subscription and subscription.connected)
+
+def mark_conversation_stale(message_type: str):
+    # Pesan sendiri tidak lewat realtime (filter receiver_id): sync saat rerun berikutnya
+    key = f"{st.session_state.user['id']}:{st.session_state.selected_user['id']}"
+    if key in st.session_state.conversation_stores:
+        st.session_state.conversation_stores[key].stale = True
+    contact_list().touch(st.session_state.selected_user['id'], datetime.now(timezone.utc).isoformat(), message_type)
+
+def _outbox_notify():
+    # Setelah outbox menyimpan pesan: sync percakapan ini lalu rerun. Jika
+    # pesan gagal permanen (error), rerun saja agar statusnya tampil
+    store = ChatArea()._conversation_store()
+    rerun = _session_rerun()
+    
+    def notify(error: Optional[str] = None):
+        if error is None:
+            store.stale = True
+        rerun()
+    return notify
+
+def load_chat_data() -> Optional[List[Dict]]:
+    # Query independen satu render (halaman kontak pertama, sinkronisasi
+    # percakapan yang dibuka) dijalankan bersamaan. Return pesan baru
+    # percakapan yang dibuka, atau None jika tidak perlu sync
+    calls, contacts, store = [], None, None
+    if _loaded_contacts() is None:
+        contacts = ContactList(st.session_state.user['id'])
+        calls.append(contacts.load_more)
+    if st.session_state.selected_user:
+        store = ChatArea()._conversation_store()
+        # Dengan realtime tersambung, pesan baru sudah masuk lewat push: query hanya jika stale
+        if store.stale or not realtime_live():
+            calls.append(store.sync)
+        else:
+            store = None
+    
+    results = run_concurrently(*calls)
+    if contacts is not None:
+        st.session_state.contacts = contacts
+        _touch_contacts(contacts, st.session_state.pop('pending_contact_rows', []), fresh=True)
+    return results[-1] if store is not None else None
+
+def _loaded_contacts() -> Optional[ContactList]:
+    # Daftar kontak sesi ini, None jika halaman pertama belum dimuat (atau milik user lain)
+    contacts = st.session_state.get('contacts')
+    if contacts is None or contacts.user_id != st.session_state.user['id']:
+        return None
+    return contacts
+
+def contact_list() -> ContactList:
+    # Kontak user yang login (per sesi), halaman pertama dimuat saat dibuat
+    contacts = _loaded_contacts()
+    if contacts is None:
+        contacts = ContactList(st.session_state.user['id'])
+        contacts.load_more()
+        st.session_state.contacts = contacts
+    return contacts
+
 class Sidebar:
     def render(self):
         with st.sidebar:
@@ -49,38 +243,91 @@ class Sidebar:
             
             # Logout button
             if st.button("🚪 Logout", use_container_width=True):
+                if st.session_state.get('realtime'):
+                    st.session_state.realtime.stop()
+                    st.session_state.realtime = None
                 st.session_state.user = None
                 st.session_state.selected_user = None
+                st.session_state.conversation_stores = {}
+                st.session_state.contacts = None
+                st.session_state.pending_contact_rows = []
                 st.session_state.page = 'login'
                 st.rerun()
             
             st.markdown("<div style='margin: 24px 0; height: 1px; background: rgba(255,255,255,0.2);'></div>", unsafe_allow_html=True)
             
-            st.markdown("<h3 style='font-size: 18px; margin-bottom: 16px; font-weight: 600;'>👥 Pengguna Aktif</h3>", unsafe_allow_html=True)
+            # Cari user (exact match username/email lewat HMAC)
+            query = st.text_input(
+                "Cari pengguna",
+                placeholder="🔍 Username atau email...",
+                label_visibility="collapsed",
+                key="user_search"
+            )
+            if query:
+                results = [u for u in User.find(query) if u['id'] != st.session_state.user['id']]
+                for user in results:
+                    self._user_button(user, "search")
+                if not results:
+                    st.caption("Pengguna tidak ditemukan (username/email harus persis sama)")
             
-            # Load users
-            users = User.get_all()
+            st.markdown("<h3 style='font-size: 18px; margin-bottom: 16px; font-weight: 600;'>👥 Kontak</h3>", unsafe_allow_html=True)
             
-            # Filter out current user
-            other_users = [u for u in users if u['id'] != st.session_state.user['id']]
+            # Hanya orang yang pernah bertukar pesan, urut pesan terakhir
+            contacts = contact_list()
+            for user in contacts.contacts:
+                self._user_button(user, "user")
             
-            for user in other_users:
-                # User button
-                is_selected = st.session_state.selected_user and st.session_state.selected_user['id'] == user['id']
-                button_style = "primary" if is_selected else "secondary"
-                
-                if st.button(
-                    f"{'✅ ' if is_selected else ''}💬 {user['username']}",
-                    key=f"user_{user['id']}",
-                    use_container_width=True,
-                    type=button_style
-                ):
-                    st.session_state.selected_user = user
-                    st.rerun()
+            if not contacts.contacts:
+                st.caption("Belum ada percakapan. Cari pengguna untuk mulai chat.")
+            
+            if contacts.has_more and st.button("⬇️ Muat kontak lainnya", key="load_more_contacts", use_container_width=True):
+                contacts.load_more()
+                st.rerun()
+            
+            self._render_create_group(contacts)
+    
+    def _render_create_group(self, contacts):
+        # Anggota dipilih dari kontak (orang yang pernah bertukar pesan)
+        people = {user['id']: user['username'] for user in contacts.contacts if not user.get('is_group')}
+        with st.expander("➕ Buat grup", expanded=False):
+            if not people:
+                st.caption("Kirim pesan ke pengguna lain dulu untuk menambahkannya ke grup.")
+                return
+            with st.form("create_group_form", clear_on_submit=True):
+                name = st.text_input("Nama grup", placeholder="Nama grup...")
+                member_ids = st.multiselect("Anggota", list(people), format_func=people.get)
+                if st.form_submit_button("Buat grup", use_container_width=True):
+                    success, result = Group.create(st.session_state.user['id'], name, member_ids)
+                    if success:
+                        contacts.touch(result['id'], datetime.now(timezone.utc).isoformat(), 'group')
+                        st.session_state.selected_user = result
+                        st.rerun()
+                    else:
+                        st.error(f"❌ {result}")
+    
+    def _user_button(self, user, key_prefix):
+        is_selected = st.session_state.selected_user and st.session_state.selected_user['id'] == user['id']
+        button_style = "primary" if is_selected else "secondary"
+        
+        unread = user.get('unread_count', 0)
+        icon = "👥" if user.get('is_group') else "💬"
+        if st.button(
+            f"{'✅ ' if is_selected else ''}{icon} {user['username']}{f'  🔴 {unread}' if unread else ''}",
+            key=f"{key_prefix}_{user['id']}",
+            use_container_width=True,
+            type=button_style
+        ):
+            st.session_state.selected_user = {
+                'id': user['id'], 'username': user['username'], 'is_group': user.get('is_group', False)
+            }
+            contact_list().mark_read(user['id'])
+            st.rerun()
 
 
 class ChatArea:
-    def render(self):
+    def render(self, new_rows: Optional[List[Dict]] = None):
+        is_group = st.session_state.selected_user.get('is_group', False)
+        
         # Chat Header
         st.markdown(f"""
             <div style='
@@ -103,39 +350,135 @@ class ChatArea:
                         justify-content: center;
                         font-size: 24px;
                         box-shadow: 0 4px 12px rgba(59, 130, 246, 0.3);
-                    '>👤</div>
+                    '>{'👥' if is_group else '👤'}</div>
                     <div>
                         <h2 style='color: #f1f5f9; font-size: 22px; margin: 0; font-weight: 700;'>{st.session_state.selected_user['username']}</h2>
-                        <p style='color: #94a3b8; font-size: 13px; margin: 4px 0 0 0;'>End-to-end encrypted chat</p>
+                        <p style='color: #94a3b8; font-size: 13px; margin: 4px 0 0 0;'>{'End-to-end encrypted group chat' if is_group else 'End-to-end encrypted chat'}</p>
                     </div>
                 </div>
             </div>
         """, unsafe_allow_html=True)
         
-        # Messages container
-        messages = Message.get_messages(
-            st.session_state.user['id'],
-            st.session_state.selected_user['id']
-        )
+        # Messages container: store lokal, rerun hanya mengambil pesan setelah high-water mark
+        # (disinkronkan oleh load_chat_data, bersamaan dengan query sidebar)
+        store = self._conversation_store()
+        new_rows = new_rows or []
+        messages = store.messages
+        
+        # Percakapan terbuka = sudah dibaca (badge unread di sidebar)
+        peer_id = st.session_state.selected_user['id']
+        received = any(row['sender_id'] != st.session_state.user['id'] for row in new_rows)
+        contact_list().mark_read(peer_id, force=received)
         
-        if messages:
+        col_older, col_resync = st.columns([4, 1])
+        with col_older:
+            if store.has_older and st.button("⬆️ Muat pesan sebelumnya", key="load_older_messages", use_container_width=True):
+                store.load_older()
+                st.rerun()
+        with col_resync:
+            if st.button("🔄 Sinkronkan", key="resync_messages", use_container_width=True):
+                store.resync()
+                st.rerun()
+        
+        # Pesan sendiri yang masih di outbox (belum tersimpan di database)
+        loaded_ids = {m['id'] for m in messages}
+        pending = [
+            entry for entry in outbox().pending(st.session_state.user['id'], peer_id)
+            if entry['row']['id'] not in loaded_ids
+        ]
+        
+        if messages or pending:
+            # Listing hanya berisi metadata: isi pesan teks dan gambar kecil diambil
+            # sekaligus dalam satu query (sekali per pesan, tersimpan di store)
+            Message.load_contents([m for m in messages if self._load_eagerly(m)])
+            
+            # Pesan teks yang dikirim user sendiri langsung didekripsi (batch)
+            if st.session_state.encryption_key:
+                own_messages = [m for m in messages if m['sender_id'] == st.session_state.user['id']]
+                prefetch_text_decrypts(own_messages, st.session_state.encryption_key)
+            
+            if is_group:
+                # Nama pengirim pesan grup (satu lookup untuk semua pengirim)
+                senders = {user['id']: user['username'] for user in user_directory().get_users(
+                    list({m['sender_id'] for m in messages})
+                )}
             for msg in messages:
+                if is_group and msg['sender_id'] != st.session_state.user['id']:
+                    st.caption(f"👤 {senders.get(msg['sender_id'], 'Anggota')}")
                 self._render_message(msg)
+            
+            for entry in pending:
+                if entry['status'] == FAILED:
+                    self._render_message(entry['row'], status=f"❌ Gagal terkirim: {entry['error']}")
+                    if st.button("Tutup", key=f"dismiss_{entry['row']['id']}"):
+                        outbox().dismiss(entry['row']['id'])
+                        st.rerun()
+                    continue
+                status = "⏳ Mengirim..." if entry['status'] == PENDING else f"⚠️ Gagal, mencoba lagi ({entry['attempts']}x)"
+                self._render_message(entry['row'], status=status)
         else:
             st.info("💬 Belum ada pesan. Mulai percakapan!")
         
         st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)
     
-    def _render_message(self, msg):
+    def _conversation_store(self) -> ConversationStore:
+        # Satu store per percakapan, hidup selama sesi
+        key = f"{st.session_state.user['id']}:{st.session_state.selected_user['id']}"
+        if key not in st.session_state.conversation_stores:
+            st.session_state.conversation_stores[key] = ConversationStore(
+                st.session_state.user['id'],
+                st.session_state.selected_user['id'],
+                group=st.session_state.selected_user.get('is_group', False)
+            )
+        return st.session_state.conversation_stores[key]
+    
+    def _load_eagerly(self, msg) -> bool:
+        message_type = msg.get('message_type', 'text').lower()
+        if message_type == 'text':
+            return True
+        size = msg.get('content_size')
+        return message_type == 'image' and size is not None and size <= Settings.IMAGE_AUTOLOAD_BYTES
+    
+    @staticmethod
+    def _spool(chunks) -> BinaryIO:
+        # Isi file didekripsi per segmen ke file sementara (terhapus sendiri
+        # saat ditutup), bukan disatukan dari chunk di memori; error dekripsi
+        # muncul sebelum tombol download dibuat. st.download_button tetap
+        # menyalin isinya sekali ke media store Streamlit
+        handle = tempfile.TemporaryFile()
+        try:
+            for chunk in chunks:
+                handle.write(chunk)
+            handle.seek(0)
+        except BaseException:
+            handle.close()
+            raise
+        return handle
+    
+    def _image_loaded(self, msg) -> bool:
+        # Gambar besar (atau baris lama tanpa content_size) baru diambil saat diminta;
+        # baris di object storage punya encrypted_content kosong
+        if msg.get('encrypted_content'):
+            return True
+        size = msg.get('content_size')
+        label = f"🖼️ Tampilkan gambar ({size / 1024:.0f} KB)" if size else "🖼️ Tampilkan gambar"
+        if st.button(label, key=f"load_image_{msg['id']}"):
+            Message.load_content(msg)
+            return True
+        return False
+    
+    def _render_message(self, msg, status=None):
         is_sent = msg['sender_id'] == st.session_state.user['id']
         message_type = msg.get('message_type', 'text').lower()
         
-        # Format timestamp
+        # Format timestamp (pesan di outbox: status pengiriman)
         try:
             timestamp = datetime.fromisoformat(msg['created_at'].replace('Z', '+00:00'))
             time_str = timestamp.strftime("%H:%M")
         except:
             time_str = ""
+        if status:
+            time_str = status
         
         # Render based on message type
         if message_type == 'image':
@@ -152,9 +495,7 @@ class ChatArea:
                 # Cek apakah encryption_key tersedia
                 if st.session_state.encryption_key:
                     decrypted_text = get_cached_decrypt(
-                        msg['id'],
-                        msg['encrypted_content'],
-                        msg.get('encrypted_hmac', ''),
+                        msg,
                         st.session_state.encryption_key,
                         Message.decrypt_text
                     )
@@ -250,9 +591,13 @@ class ChatArea:
             # Tombol lihat pesan terenkripsi
             with st.expander("👁️ Lihat Pesan Terenkripsi", expanded=False):
                 st.info("🔐 Pesan ini dalam bentuk terenkripsi. Gunakan kunci enkripsi untuk membacanya.")
+                encrypted_content = Message.load_content(msg)
+                if isinstance(encrypted_content, bytes):
+                    # Envelope biner dari object storage: tampilkan sebagai teks envelope
+                    encrypted_content = ENVELOPE_PREFIX + base64.b64encode(encrypted_content[:375]).decode('ascii') + "..."
                 st.text_area(
                     "📋 Pesan Terenkripsi:",
-                    value=msg['encrypted_content'][:500] + "..." if len(msg['encrypted_content']) > 500 else msg['encrypted_content'],
+                    value=encrypted_content[:500] + "..." if len(encrypted_content) > 500 else encrypted_content,
                     height=150,
                     disabled=True,
                     key=f"encrypted_display_{msg['id']}"
@@ -271,9 +616,7 @@ class ChatArea:
                     if decrypt_key and decrypt_key.strip():
                         try:
                             decrypted_text = get_cached_decrypt(
-                                msg['id'],
-                                msg['encrypted_content'],
-                                msg.get('encrypted_hmac', ''),
+                                msg,
                                 decrypt_key,
                                 Message.decrypt_text
                             )
@@ -313,13 +656,11 @@ class ChatArea:
             )
             # Show image aligned right using columns
             try:
-                from services.crypto_service import decrypt_from_database
-                # Decrypt ChaCha20 layer first untuk display image
-                image_base64 = decrypt_from_database(msg['encrypted_content'], msg.get('encrypted_hmac', ''))
-                image_data = base64.b64decode(image_base64)
                 col1, col2 = st.columns([2, 1])
                 with col2:
-                    st.image(image_data)
+                    if self._image_loaded(msg):
+                        # Decrypt ChaCha20 layer first untuk display image
+                        st.image(Message.get_image_bytes(msg))
             except Exception as e:
                 st.error(f"Error menampilkan gambar: {str(e)}")
         else:
@@ -344,13 +685,13 @@ class ChatArea:
             )
             # Show image aligned left with decrypt form
             try:
-                from services.crypto_service import decrypt_from_database
-                # Decrypt ChaCha20 layer first untuk display image
-                image_base64 = decrypt_from_database(msg['encrypted_content'], msg.get('encrypted_hmac', ''))
-                image_data = base64.b64decode(image_base64)
                 col1, col2 = st.columns([1, 2])
                 with col1:
-                    st.image(image_data)
+                    if not self._image_loaded(msg):
+                        return
+                    
+                    # Decrypt ChaCha20 layer first untuk display image
+                    st.image(Message.get_image_bytes(msg))
                     
                     # Form untuk ekstrak pesan tersembunyi
                     with st.expander("🔓 Ekstrak Pesan Tersembunyi", expanded=False):
@@ -366,9 +707,7 @@ class ChatArea:
                                 try:
                                     # Use proper function reference for extraction
                                     hidden_message = get_cached_decrypt(
-                                        msg['id'],
-                                        msg['encrypted_content'],
-                                        msg.get('encrypted_hmac', ''),
+                                        msg,
                                         decrypt_key,
                                         Message.extract_from_image
                                     )
@@ -390,11 +729,8 @@ class ChatArea:
     
     def _render_file_message(self, msg, is_sent, time_str):
         try:
-            from services.crypto_service import decrypt_from_database
-            # Decrypt ChaCha20 layer to get file JSON
-            file_json = decrypt_from_database(msg['encrypted_content'], msg.get('encrypted_hmac', ''))
-            file_data = json.loads(file_json)
-            filename = file_data['filename']
+            # Cukup baca filename (file stream: hanya metadata yang didekripsi)
+            filename = Message.get_filename(msg)
             
             if is_sent:
                 st.markdown(
@@ -444,13 +780,16 @@ class ChatArea:
                 # Tombol download file terenkripsi
                 with st.expander("📥 Unduh File Terenkripsi", expanded=False):
                     st.warning("⚠️ File masih dalam bentuk terenkripsi. Gunakan kunci enkripsi untuk mendekripsi dan mengunduh file asli")
-                    st.download_button(
-                        label="📥 Download file terenkripsi",
-                        data=file_data['encrypted_content'],
-                        file_name=filename, 
-                        mime="application/octet-stream",
-                        key=f"download_encrypted_{msg['id']}"
-                    )
+                    # Layer database baru didekripsi saat diminta, bukan di setiap rerun
+                    if st.button("Siapkan file terenkripsi", key=f"prepare_encrypted_{msg['id']}"):
+                        with self._spool(Message.encrypted_file_chunks(msg)) as encrypted_file:
+                            st.download_button(
+                                label="📥 Download file terenkripsi",
+                                data=encrypted_file.read(),
+                                file_name=filename, 
+                                mime="application/octet-stream",
+                                key=f"download_encrypted_{msg['id']}"
+                            )
                 
                 # AES-GCM Decryption
                 with st.expander("🔓 Dekripsi & Unduh File", expanded=False):
@@ -464,31 +803,16 @@ class ChatArea:
                     if st.button(f"Dekripsi & Unduh", key=f"decrypt_btn_file_{msg['id']}"):
                         if decrypt_key and decrypt_key.strip():
                             try:
-                                from services.crypto_service import decrypt_file_aes_gcm, decrypt_from_database
-                                
-                                # Decrypt dengan caching (double decryption: ChaCha20 + AES-GCM)
-                                def decrypt_file_double(encrypted_content, encrypted_hmac, key):
-                                    # Layer 1: Decrypt ChaCha20 dari database
-                                    file_json = decrypt_from_database(encrypted_content, encrypted_hmac)
-                                    file_data_decrypted = json.loads(file_json)
-                                    # Layer 2: Decrypt AES-GCM
-                                    return decrypt_file_aes_gcm(file_data_decrypted['encrypted_content'], key)
-                                
-                                decrypted_file = get_cached_decrypt(
-                                    msg['id'],
-                                    msg['encrypted_content'],
-                                    msg.get('encrypted_hmac', ''),
-                                    decrypt_key,
-                                    decrypt_file_double
-                                )
-                                
-                                st.download_button(
-                                    label=f"💾 Simpan {filename}",
-                                    data=decrypted_file,
-                                    file_name=filename,
-                                    mime="application/octet-stream",
-                                    key=f"save_{msg['id']}"
-                                )
+                                # Double decryption (ChaCha20 + AES-GCM) per segmen langsung ke file
+                                # sementara; isi file tidak disimpan di session_state
+                                with self._spool(Message.decrypt_file_chunks(msg, decrypt_key)) as decrypted_file:
+                                    st.download_button(
+                                        label=f"💾 Simpan {filename}",
+                                        data=decrypted_file.read(),
+                                        file_name=filename,
+                                        mime="application/octet-stream",
+                                        key=f"save_{msg['id']}"
+                                    )
                                 st.success(f"✅ File berhasil didekripsi!")
                             except Exception as e:
                                 st.error(f"❌ Kunci enkripsi salah atau file rusak: {str(e)}")
@@ -499,6 +823,11 @@ class ChatArea:
 
 
 class MessageInput:
+    @staticmethod
+    def _send(direct, group):
+        # Grup: dienkripsi sekali untuk semua anggota (Message.send_group_*)
+        return group if st.session_state.selected_user.get('is_group') else direct
+    
     def render(self):
         tab1, tab2, tab3 = st.tabs(["✉️ Pesan Teks", "🖼️ Gambar + Steganografi", "📎 File"])
         
@@ -539,14 +868,16 @@ class MessageInput:
                 else:
                     with st.spinner("Mengirim..."):
                         st.session_state.encryption_key = encryption_key
-                        success, result = Message.send_text(
+                        success, result = self._send(Message.send_text, Message.send_group_text)(
                             st.session_state.user['id'],
                             st.session_state.selected_user['id'],
                             message,
-                            encryption_key
+                            encryption_key,
+                            notify=_outbox_notify()
                         )
                         
                         if success:
+                            mark_conversation_stale('text')
                             st.success(f"✅ {result}")
                             st.rerun()
                         else:
@@ -639,8 +970,8 @@ class MessageInput:
                         pixels = image.width * image.height
                         image_capacity_kb = (pixels * 3) / 8 / 1024
                         
-                        # Estimate encrypted message size (3DES adds overhead ~1.7x + delimiter)
-                        estimated_message_size_kb = (len(secret_message) * 1.7) / 1024
+                        # Ukuran payload setelah kompresi + header, nonce, tag
+                        estimated_message_size_kb = stego_payload_size(secret_message) / 1024
                         
                         if estimated_message_size_kb > image_capacity_kb:
                             st.error(
@@ -650,7 +981,7 @@ class MessageInput:
                                 f"💡 **Solusi:** Gunakan gambar lebih besar (minimal {int((estimated_message_size_kb * 1024 * 8 / 3) ** 0.5)}×{int((estimated_message_size_kb * 1024 * 8 / 3) ** 0.5)} px) atau kurangi panjang pesan."
                             )
                         else:
-                            with st.spinner("Menyembunyikan pesan dan mengirim... (proses dapat memakan waktu 5-30 detik)"):
+                            with st.spinner("Menyembunyikan pesan dan mengirim..."):
                                 st.session_state.encryption_key = encryption_key
                                 
                                 # Show progress info for long messages
@@ -660,15 +991,19 @@ class MessageInput:
                                         f"Mohon tunggu, proses enkripsi dan steganografi sedang berlangsung."
                                     )
                                 
-                                success, result = Message.send_image_steganography(
+                                success, result = self._send(
+                                    Message.send_image_steganography, Message.send_group_image_steganography
+                                )(
                                     st.session_state.user['id'],
                                     st.session_state.selected_user['id'],
                                     uploaded_image_bytes,
                                     secret_message,
-                                    encryption_key
+                                    encryption_key,
+                                    notify=_outbox_notify()
                                 )
                                 
                                 if success:
+                                    mark_conversation_stale('image')
                                     st.success(f"✅ {result}")
                                     st.rerun()
                                 else:
@@ -702,15 +1037,17 @@ class MessageInput:
                     st.error("❌ Harap masukkan kunci enkripsi!")
                 else:
                     with st.spinner("Mengenkripsi dan mengirim file..."):
-                        success, result = Message.send_file(
+                        success, result = self._send(Message.send_file, Message.send_group_file)(
                             st.session_state.user['id'],
                             st.session_state.selected_user['id'],
-                            uploaded_file.getvalue(),
+                            uploaded_file,
                             uploaded_file.name,
-                            encryption_key
+                            encryption_key,
+                            notify=_outbox_notify()
                         )
                         
                         if success:
+                            mark_conversation_stale('file')
                             st.success(f"✅ {result}")
                             st.rerun()
                         else:
@@ -112,20 +112,29 @@ class RegisterPage:
 class ChatPage:
     def render(self):
         # Import here to avoid circular import
-        from ui.components import Sidebar, ChatArea, MessageInput
+        from ui.components import Sidebar, ChatArea, MessageInput, sync_realtime, load_chat_data, rerun_watcher
         
         # Check if user is logged in
         if not st.session_state.user:
             st.session_state.page = 'login'
             st.rerun()
         
+        # Pesan baru dari realtime (push), sebelum store dirender
+        sync_realtime()
+        
+        # Rerun yang diminta thread background (realtime, outbox)
+        rerun_watcher()
+        
+        # Query sidebar dan percakapan dijalankan bersamaan sebelum render
+        new_rows = load_chat_data()
+        
         # Render sidebar
         Sidebar().render()
         
         # Main chat area
         if st.session_state.selected_user:
             # Render chat messages
-            ChatArea().render()
+            ChatArea().render(new_rows)
             
             # Render message input tabs
             MessageInput().render()